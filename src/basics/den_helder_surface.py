@@ -1,9 +1,11 @@
 from pxr import Usd, UsdGeom, UsdShade, Sdf, Gf
 import os
+import argparse
+from src.usd.stage import add_format_argument, create_stage
 
-def create_den_helder_surface():
+def create_den_helder_surface(fmt: str = None):
     # Create the stage
-    stage = Usd.Stage.CreateNew("output/den_helder_surface.usda")
+    stage = create_stage("output/den_helder_surface", fmt)
     
     # Create a mesh for the surface
     surface = UsdGeom.Mesh.Define(stage, "/World/Surface")
@@ -85,4 +87,6 @@ def create_den_helder_surface():
     stage.Save()
 
 if __name__ == "__main__":
-    create_den_helder_surface()
+    parser = argparse.ArgumentParser(description="Create the textured Den Helder surface")
+    add_format_argument(parser)
+    create_den_helder_surface(parser.parse_args().format)
@@ -10,7 +10,7 @@ from PIL import Image
 import math
 import requests
 from io import BytesIO
-from src.examples.map import deg2num
+from src.tiles.tilemath import tile_range
 
 class JsonHandler:
     def __init__(self):
@@ -575,8 +575,7 @@ class JsonHandler:
     def fetch_tiles(self, min_lat, max_lat, min_lon, max_lon, zoom=17):
         """Fetch all tiles for the given coordinate range"""
         # Calculate tile coordinates for bounds
-        min_xtile, max_ytile = deg2num(min_lat, min_lon, zoom)
-        max_xtile, min_ytile = deg2num(max_lat, max_lon, zoom)
+        min_xtile, max_xtile, min_ytile, max_ytile = tile_range(min_lat, max_lat, min_lon, max_lon, zoom)
         
         print(f"Tile coordinates: X({min_xtile}-{max_xtile}), Y({min_ytile}-{max_ytile})")
         
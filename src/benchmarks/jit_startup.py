@@ -0,0 +1,64 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+# Run in a fresh interpreter: import the geometry code and call every kernel once on a small batch
+STARTUP_SCRIPT = '''
+import json, time
+start = time.perf_counter()
+import numpy as np
+from src.geometry.csr import segment_bounds
+from src.geometry.extrude import extrude_footprints
+from src.geometry.ribbon import build_ribbons
+from src.geometry.triangulate import triangulate_polygons
+from src.osm.osm import resolve_refs
+imported = time.perf_counter()
+coords = np.array([[0, 0], [4, 0], [4, 3], [0, 3]], dtype=np.float64)
+offsets = np.array([0, 4], dtype=np.int64)
+segment_bounds(coords, offsets)
+resolve_refs(np.arange(10, dtype=np.int64), np.array([3, 11], dtype=np.int64))
+extrude_footprints(coords, offsets, np.array([10.0]), triangulate_polygons(coords, offsets))
+build_ribbons(coords, offsets, np.array([1.0]))
+done = time.perf_counter()
+print(json.dumps({'import_seconds': imported - start, 'first_call_seconds': done - imported,
+                  'total_seconds': done - start}))
+'''
+
+def run_startup(env_overrides: dict) -> dict:
+    """Time one fresh interpreter running ``STARTUP_SCRIPT`` with extra environment variables."""
+    root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    env = dict(os.environ, PYTHONPATH=root, **env_overrides)
+    output = subprocess.run([sys.executable, '-c', STARTUP_SCRIPT], env=env, cwd=root,
+                            check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def best(runs):
+    return min(runs, key=lambda run: run['total_seconds'])
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark cold and warm startup of the Numba geometry kernels")
+    parser.add_argument('--repeats', type=int, default=3, help="Runs per mode; the best time is reported")
+    parser.add_argument('--output', help="Optional JSON file for the results")
+    args = parser.parse_args()
+
+    results = [dict(mode='numpy', **best([run_startup({'OSM_NUMBA': '0'}) for _ in range(args.repeats)]))]
+    cold, warm = [], []
+    for _ in range(args.repeats):
+        # A fresh cache directory compiles every kernel; running again loads them from it
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cold.append(run_startup({'OSM_NUMBA': '1', 'NUMBA_CACHE_DIR': cache_dir}))
+            warm.append(run_startup({'OSM_NUMBA': '1', 'NUMBA_CACHE_DIR': cache_dir}))
+    results.append(dict(mode='numba-cold', **best(cold)))
+    results.append(dict(mode='numba-warm', **best(warm)))
+
+    report = json.dumps(results, indent=2)
+    print(report)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(report)
+
+if __name__ == "__main__":
+    main()
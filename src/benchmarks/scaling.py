@@ -0,0 +1,207 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+from functools import lru_cache
+from typing import Dict, List, NamedTuple
+from src.benchmarks.synthetic import SYNTHETIC_VERSION, SyntheticOSM, ensure_dataset
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+class Target(NamedTuple):
+    """A function under benchmark.
+
+    ``setup`` and ``run`` are source code run in a fresh interpreter with
+    the dataset at ``path`` and a scratch ``work_dir``: ``setup`` is not
+    measured, ``run`` is timed and profiled and sets ``counts``, a dict
+    reported next to the measurements. Scales above ``max_nodes`` are skipped
+    unless ``--max-nodes`` raises the limit.
+    """
+    fmt: str
+    setup: str
+    run: str
+    max_nodes: int
+
+def aoi_handler(bounds: str) -> str:
+    # The Den Helder area of interest of JsonHandler is replaced by the dataset bounds
+    return (f"handler = JsonHandler()\n"
+            f"handler.FETCH_GROUND_TEXTURE = False\n"
+            f"handler.min_lon, handler.min_lat, handler.max_lon, handler.max_lat = {bounds}\n")
+
+TARGETS: Dict[str, Target] = {
+    'OSM.from_xml': Target(
+        'xml', "from src.osm.osm import OSM\n",
+        "osm = OSM.from_xml(path)\n"
+        "counts = {'nodes': len(osm.nodes), 'ways': len(osm.ways)}\n",
+        10_000_000),
+    'JsonHandler.process_osm_file': Target(
+        'pbf', "from src.examples.parse_json import JsonHandler\n" + aoi_handler('bounds'),
+        "handler.process_osm_file(path)\n"
+        "counts = {'buildings': len(handler.ways), 'roads': len(handler.roads),\n"
+        "          'water': len(handler.water_features), 'land': len(handler.land_features)}\n",
+        10_000_000),
+    'JsonHandler.process_json': Target(
+        'json', "import json\nfrom src.examples.parse_json import JsonHandler\n" + aoi_handler('bounds'),
+        # Includes decoding the file, as every caller has to
+        "with open(path, 'r', encoding='utf-8') as f:\n"
+        "    handler.process_json(json.load(f))\n"
+        "counts = {'buildings': len(handler.ways), 'water': len(handler.water_features),\n"
+        "          'land': len(handler.land_features)}\n",
+        10_000_000),
+    'JsonHandler.export_to_usd': Target(
+        'pbf', "from src.examples.parse_json import JsonHandler\n" + aoi_handler('bounds') +
+        "handler.process_osm_file(path)\n"
+        "usd_path = os.path.join(work_dir, 'scene.usdc')\n",
+        "handler.export_to_usd(usd_path)\n"
+        "counts = {'usd_bytes': os.path.getsize(usd_path)}\n",
+        100_000),
+    'visualize_osm': Target(
+        'xml', "import matplotlib\nmatplotlib.use('Agg')\n"
+        "from src.examples.parse_osm import visualize_osm\nfrom src.osm.osm import OSM\n"
+        "osm = OSM.from_xml(path)\n",
+        # Rendering is where the cost of a plot is, so it is part of the measurement
+        "plt = visualize_osm(osm)\nplt.savefig(os.path.join(work_dir, 'osm.png'))\nplt.close('all')\n"
+        "counts = {}\n",
+        1_000_000),
+    'visualize_land': Target(
+        'xml', "import matplotlib\nmatplotlib.use('Agg')\n"
+        "from src.examples.parse_osm import visualize_land\nfrom src.osm.osm import OSM\n"
+        "osm = OSM.from_xml(path)\n",
+        "plt = visualize_land(osm)\nplt.savefig(os.path.join(work_dir, 'land.png'))\nplt.close('all')\n"
+        "counts = {}\n",
+        1_000_000),
+    'density_preview': Target(
+        'pbf', "from src.preview.density import density_preview\n",
+        "grid = density_preview(path, os.path.join(work_dir, 'density.png'), width=1024, per_class=True)\n"
+        "counts = {'binned': int(grid.counts.sum())}\n",
+        10_000_000),
+}
+
+# Run in a fresh interpreter, so every measurement starts from the same empty heap
+MEASURE_SCRIPT = '''
+import json, os, resource, sys, tempfile, time, tracemalloc
+path, bounds, trace = sys.argv[1], tuple(json.loads(sys.argv[2])), sys.argv[3] == '1'
+with tempfile.TemporaryDirectory() as work_dir:
+{setup}
+    if trace:
+        tracemalloc.start()
+    start = time.perf_counter()
+{run}
+    seconds = time.perf_counter() - start
+    result = {{'seconds': seconds, 'max_rss_bytes': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024}}
+    if trace:
+        result['traced_peak_bytes'] = tracemalloc.get_traced_memory()[1]
+    result['counts'] = counts
+print(json.dumps(result))
+'''
+
+def indent(source: str) -> str:
+    return ''.join(f'    {line}\n' for line in source.splitlines())
+
+def measure(target: Target, path: str, bounds, trace: bool) -> dict:
+    """Run ``target`` once on ``path`` in a fresh interpreter; with ``trace`` under tracemalloc."""
+    script = MEASURE_SCRIPT.format(setup=indent(target.setup), run=indent(target.run))
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    output = subprocess.run([sys.executable, '-c', script, path, json.dumps(list(bounds)), '1' if trace else '0'],
+                            env=env, cwd=ROOT, check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+@lru_cache(maxsize=None)
+def dataset_bounds(nodes: int, seed: int):
+    return SyntheticOSM(nodes, seed).bounds
+
+def benchmark(name: str, nodes: int, seed: int = 0, repeats: int = 1) -> dict:
+    """Time ``repeats`` runs of a target at one scale, then profile its memory in one more.
+
+    tracemalloc slows allocation-heavy code several times over, so timings
+    come from untraced runs and only the peak from the traced one. The
+    traced peak covers ``run`` alone; the peak RSS includes the setup.
+    """
+    target = TARGETS[name]
+    path = ensure_dataset(nodes, seed, target.fmt)
+    bounds = dataset_bounds(nodes, seed)
+    print(f"{name} at {nodes} nodes...", file=sys.stderr)
+    runs = [measure(target, path, bounds, trace=False) for _ in range(repeats)]
+    traced = measure(target, path, bounds, trace=True)
+    return {
+        'target': name,
+        'nodes': nodes,
+        'input_format': target.fmt,
+        'input_bytes': os.path.getsize(path),
+        'seconds': round(min(run['seconds'] for run in runs), 4),
+        'max_rss_bytes': max(run['max_rss_bytes'] for run in runs),
+        'traced_peak_bytes': traced['traced_peak_bytes'],
+        'counts': runs[0]['counts'],
+    }
+
+def environment() -> dict:
+    """Versions that explain differences between two reports."""
+    import numpy
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, check=True,
+                                capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'commit': commit,
+        'python': platform.python_version(),
+        'numpy': numpy.__version__,
+        'numba': os.environ.get('OSM_NUMBA', '1') != '0',
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+        'synthetic_version': SYNTHETIC_VERSION,
+    }
+
+def compare(old: dict, new: dict) -> List[str]:
+    """Describe the change of every measurement present in both reports, as ``new / old`` ratios."""
+    previous = {(r['target'], r['nodes']): r for r in old['results']}
+    lines = []
+    for result in new['results']:
+        before = previous.get((result['target'], result['nodes']))
+        if before is None:
+            continue
+        ratios = ', '.join(f"{key} x{result[key] / before[key]:.2f}"
+                           for key in ('seconds', 'traced_peak_bytes', 'max_rss_bytes') if before[key])
+        lines.append(f"{result['target']} @ {result['nodes']}: {ratios}")
+    return lines
+
+def parse_count(text: str) -> int:
+    """Parse a node count such as ``100000``, ``100k`` or ``10M``."""
+    multiplier = {'k': 1_000, 'm': 1_000_000}.get(text[-1:].lower(), 1)
+    return int(float(text[:-1] if multiplier > 1 else text) * multiplier)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark parsers, USD export and previews on synthetic data "
+                                                 "of growing size")
+    parser.add_argument('--scales', nargs='+', type=parse_count, default=[10_000, 100_000, 1_000_000],
+                        help="Node counts to run at, e.g. 10k 100k 1M 10M")
+    parser.add_argument('--targets', nargs='+', choices=list(TARGETS), default=list(TARGETS))
+    parser.add_argument('--max-nodes', type=parse_count,
+                        help="Run every target up to this scale instead of its own limit")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeats', type=int, default=1, help="Timed runs per measurement; the best is reported")
+    parser.add_argument('--output', help="Optional JSON file for the results")
+    parser.add_argument('--compare', metavar='JSON', help="An earlier --output report to compare against")
+    args = parser.parse_args()
+
+    results = []
+    for nodes in sorted(args.scales):
+        for name in args.targets:
+            if nodes > (args.max_nodes or TARGETS[name].max_nodes):
+                continue
+            results.append(benchmark(name, nodes, args.seed, args.repeats))
+    report = {'environment': environment(), 'results': results}
+
+    text = json.dumps(report, indent=2, sort_keys=True)
+    print(text)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            print('\n'.join(compare(json.load(f), report)))
+
+if __name__ == "__main__":
+    main()
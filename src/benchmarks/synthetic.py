@@ -0,0 +1,260 @@
+import argparse
+import json
+import math
+import os
+import sys
+from functools import cached_property
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+from xml.sax.saxutils import quoteattr
+import numpy as np
+
+# Part of generated file names; bump it when the generated data changes
+SYNTHETIC_VERSION = 1
+SYNTHETIC_FORMATS = ('xml', 'json', 'pbf')
+FORMAT_EXTENSIONS = {'xml': 'osm', 'json': 'json', 'pbf': 'osm.pbf'}
+
+# Blocks are laid out on a grid around Den Helder, about 130 m on a side
+DEFAULT_CENTER = (4.7915, 52.9578)
+BLOCK_DEGREES = (0.0019, 0.00115)
+# Generated datasets are cached here, outside version control
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                        'output', 'cache', 'synthetic')
+# Rough average nodes per block, to size the grid before generating
+NODES_PER_BLOCK = 50
+
+# Share of urban, water and green blocks
+BLOCK_KINDS = (('urban', 0.8), ('water', 0.08), ('green', 0.12))
+BUILDING_TYPES = (('house', 0.45), ('yes', 0.25), ('apartments', 0.15), ('commercial', 0.08), ('industrial', 0.07))
+HIGHWAY_TYPES = (('residential', 0.55), ('service', 0.2), ('footway', 0.1), ('secondary', 0.1), ('primary', 0.05))
+GREEN_TAGS = ({'leisure': 'park'}, {'landuse': 'grass'}, {'natural': 'wood'}, {'landuse': 'meadow'})
+WATER_TAGS = ({'natural': 'water', 'water': 'pond'}, {'natural': 'water', 'water': 'canal'}, {'natural': 'water'})
+STREET_FURNITURE = ({'highway': 'street_lamp'}, {'amenity': 'bench'}, {'amenity': 'waste_basket'},
+                    {'natural': 'tree'}, {'barrier': 'bollard'})
+
+Tags = Dict[str, str]
+
+class Block(NamedTuple):
+    """Elements of one grid block; way refs index ``coords``."""
+    coords: np.ndarray            # (n, 2) lon/lat
+    node_tags: Dict[int, Tags]    # node row -> tags of tagged nodes
+    ways: List[Tuple[List[int], Tags]]
+
+def choose(rng: np.random.Generator, weighted):
+    values, weights = zip(*weighted)
+    return values[rng.choice(len(values), p=np.array(weights) / sum(weights))]
+
+def ring(rng: np.random.Generator, center: np.ndarray, radius: np.ndarray, points: int) -> np.ndarray:
+    """Return a jittered, counter-clockwise ring of ``points`` around ``center``."""
+    angles = np.linspace(0, 2 * math.pi, points, endpoint=False)
+    scale = radius * rng.uniform(0.75, 1.0, points)[:, None]
+    return center + np.stack([np.cos(angles), np.sin(angles)], axis=1) * scale
+
+def urban_block(rng: np.random.Generator, origin: np.ndarray, size: np.ndarray) -> Block:
+    """A street along the south edge, a grid of building lots and some street furniture."""
+    street = origin + np.stack([np.linspace(0, size[0], 6), np.full(6, size[1] * 0.05)], axis=1)
+    highway = choose(rng, HIGHWAY_TYPES)
+    ways = [(list(range(6)), {'highway': highway, 'name': f'Synthetic {highway} {rng.integers(1000)}'})]
+    parts = [street]
+
+    # Rotated rectangles on a 4x4 lot grid, leaving every lot's edges as gaps
+    lots = rng.integers(8, 17)
+    cells = rng.choice(16, lots, replace=False)
+    lot_size = size * np.array([0.25, 0.2])
+    centers = origin + np.array([0.0, size[1] * 0.15]) + (np.stack([cells % 4, cells // 4], axis=1) + 0.5) * lot_size
+    half = lot_size * rng.uniform(0.25, 0.42, (lots, 2))
+    angle = rng.uniform(-0.3, 0.3, lots)
+    corners = np.array([[-1, -1], [1, -1], [1, 1], [-1, 1]], dtype=np.float64)
+    local = corners[None] * half[:, None]
+    cos, sin = np.cos(angle)[:, None], np.sin(angle)[:, None]
+    rotated = np.stack([local[..., 0] * cos - local[..., 1] * sin, local[..., 0] * sin + local[..., 1] * cos], axis=2)
+    buildings = (centers[:, None] + rotated).reshape(-1, 2)
+    for i in range(lots):
+        tags = {'building': choose(rng, BUILDING_TYPES)}
+        roll = rng.random()
+        if roll < 0.3:
+            tags['building:levels'] = str(int(rng.integers(1, 8)))
+        elif roll < 0.4:
+            tags['height'] = f'{rng.uniform(3, 25):.1f}'
+        first = 6 + 4 * i
+        # Closed ways repeat their first node
+        ways.append(([first, first + 1, first + 2, first + 3, first], tags))
+    parts.append(buildings)
+
+    furniture = rng.integers(0, 5)
+    start = 6 + 4 * lots
+    parts.append(origin + rng.random((furniture, 2)) * size * np.array([1.0, 0.12]))
+    node_tags = {start + i: dict(STREET_FURNITURE[rng.integers(len(STREET_FURNITURE))]) for i in range(furniture)}
+    return Block(np.concatenate(parts), node_tags, ways)
+
+def area_block(rng: np.random.Generator, origin: np.ndarray, size: np.ndarray, tags: Tags, trees: int) -> Block:
+    """One polygon filling most of the block, with trees scattered over it."""
+    points = int(rng.integers(10, 24))
+    outline = ring(rng, origin + size / 2, size * 0.45, points)
+    ways = [(list(range(points)) + [0], tags)]
+    parts = [outline]
+    node_tags = {}
+    if 'water' not in tags and 'natural' not in tags:
+        parts.append(origin + size * 0.2 + rng.random((trees, 2)) * size * 0.6)
+        node_tags = {points + i: {'natural': 'tree'} for i in range(trees)}
+    elif tags.get('water') == 'canal':
+        # A canal also gets its center line as a waterway
+        line = origin + np.stack([np.linspace(0, size[0], 5), np.full(5, size[1] / 2)], axis=1)
+        parts.append(line)
+        ways.append((list(range(points, points + 5)), {'waterway': 'canal'}))
+    return Block(np.concatenate(parts), node_tags, ways)
+
+class SyntheticOSM:
+    """Deterministic synthetic OSM data of about ``nodes`` nodes.
+
+    Data is a grid of city blocks: mostly streets and building lots with
+    street furniture, plus water and green areas. Every block is generated
+    from ``(seed, block index)``, so blocks can be produced again in a
+    second pass and files of any size are written with bounded memory.
+    """
+    def __init__(self, nodes: int, seed: int = 0, center: Tuple[float, float] = DEFAULT_CENTER):
+        self.nodes = nodes
+        self.seed = seed
+        self.columns = max(1, math.ceil(math.sqrt(nodes / NODES_PER_BLOCK)))
+        self.size = np.array(BLOCK_DEGREES)
+        # Rows fill from the south-west corner of a square around the center
+        self.origin = np.array(center) - self.size * self.columns / 2
+
+    @cached_property
+    def block_count(self) -> int:
+        """Number of blocks needed for ``nodes`` nodes; found by generating them once."""
+        total = count = 0
+        while total < self.nodes:
+            total += len(self.block(count).coords)
+            count += 1
+        return count
+
+    @property
+    def bounds(self) -> Tuple[float, float, float, float]:
+        """``(min_lon, min_lat, max_lon, max_lat)`` of the blocks, which the data never crosses."""
+        rows = math.ceil(self.block_count / self.columns)
+        return (*self.origin, *(self.origin + self.size * (self.columns, rows)))
+
+    def block(self, index: int) -> Block:
+        rng = np.random.default_rng([self.seed, index])
+        origin = self.origin + self.size * (index % self.columns, index // self.columns)
+        kind = choose(rng, BLOCK_KINDS)
+        if kind == 'urban':
+            return urban_block(rng, origin, self.size)
+        if kind == 'water':
+            return area_block(rng, origin, self.size, dict(WATER_TAGS[rng.integers(len(WATER_TAGS))]), 0)
+        return area_block(rng, origin, self.size, dict(GREEN_TAGS[rng.integers(len(GREEN_TAGS))]),
+                          int(rng.integers(4, 16)))
+
+    def blocks(self) -> Iterator[Tuple[int, int, Block]]:
+        """Yield ``(first node id, first way id, block)`` for every block."""
+        node_id = way_id = 1
+        for index in range(self.block_count):
+            block = self.block(index)
+            yield node_id, way_id, block
+            node_id += len(block.coords)
+            way_id += len(block.ways)
+
+    def write(self, path: str, fmt: str = 'xml') -> str:
+        """Write the data as OSM XML, Overpass JSON or PBF; returns ``path``."""
+        if fmt not in SYNTHETIC_FORMATS:
+            raise ValueError(f"Unknown format '{fmt}', expected one of {SYNTHETIC_FORMATS}")
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        # Write atomically so an interrupted run never leaves a truncated dataset behind
+        temp_path = f'{path}.{os.getpid()}.tmp'
+        if fmt == 'pbf':
+            temp_path += '.osm.pbf'
+        getattr(self, f'write_{fmt}')(temp_path)
+        os.replace(temp_path, path)
+        return path
+
+    def write_xml(self, path: str):
+        min_lon, min_lat, max_lon, max_lat = self.bounds
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write('<?xml version="1.0" encoding="UTF-8"?>\n<osm version="0.6" generator="osm-to-usd synthetic">\n')
+            f.write(f' <bounds minlat="{min_lat:.7f}" minlon="{min_lon:.7f}" '
+                    f'maxlat="{max_lat:.7f}" maxlon="{max_lon:.7f}"/>\n')
+            # Two passes so all nodes precede all ways, as readers expect
+            for first_node, _, block in self.blocks():
+                for row, (lon, lat) in enumerate(block.coords):
+                    attributes = f'id="{first_node + row}" visible="true" version="1" lat="{lat:.7f}" lon="{lon:.7f}"'
+                    tags = block.node_tags.get(row)
+                    if tags:
+                        f.write(f' <node {attributes}>\n{xml_tags(tags)} </node>\n')
+                    else:
+                        f.write(f' <node {attributes}/>\n')
+            for first_node, first_way, block in self.blocks():
+                for i, (refs, tags) in enumerate(block.ways):
+                    f.write(f' <way id="{first_way + i}" visible="true" version="1">\n')
+                    f.write(''.join(f'  <nd ref="{first_node + ref}"/>\n' for ref in refs))
+                    f.write(f'{xml_tags(tags)} </way>\n')
+            f.write('</osm>\n')
+
+    def write_json(self, path: str):
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write('{"version": 0.6, "generator": "osm-to-usd synthetic", "elements": [\n')
+            separator = ''
+            for first_node, _, block in self.blocks():
+                for row, (lon, lat) in enumerate(block.coords):
+                    element = {'type': 'node', 'id': first_node + row, 'lat': round(float(lat), 7),
+                               'lon': round(float(lon), 7)}
+                    if row in block.node_tags:
+                        element['tags'] = block.node_tags[row]
+                    f.write(separator + json.dumps(element))
+                    separator = ',\n'
+            for first_node, first_way, block in self.blocks():
+                for i, (refs, tags) in enumerate(block.ways):
+                    element = {'type': 'way', 'id': first_way + i, 'nodes': [first_node + ref for ref in refs],
+                               'tags': tags}
+                    f.write(separator + json.dumps(element))
+            f.write('\n]}\n')
+
+    def write_pbf(self, path: str):
+        import osmium
+        min_lon, min_lat, max_lon, max_lat = self.bounds
+        header = osmium.io.Header()
+        header.add_box(osmium.osm.Box(osmium.osm.Location(min_lon, min_lat), osmium.osm.Location(max_lon, max_lat)))
+        writer = osmium.SimpleWriter(path, header=header, overwrite=True)
+        try:
+            for first_node, _, block in self.blocks():
+                for row, (lon, lat) in enumerate(block.coords):
+                    # Rounded like the text formats, so every format holds the same data
+                    writer.add_node(osmium.osm.mutable.Node(
+                        id=first_node + row, version=1, location=(round(float(lon), 7), round(float(lat), 7)),
+                        tags=block.node_tags.get(row, {})))
+            for first_node, first_way, block in self.blocks():
+                for i, (refs, tags) in enumerate(block.ways):
+                    writer.add_way(osmium.osm.mutable.Way(id=first_way + i, version=1,
+                                                          nodes=[first_node + ref for ref in refs], tags=tags))
+        finally:
+            writer.close()
+
+def xml_tags(tags: Tags) -> str:
+    return ''.join(f'  <tag k={quoteattr(k)} v={quoteattr(v)}/>\n' for k, v in tags.items())
+
+def dataset_path(nodes: int, seed: int = 0, fmt: str = 'xml', data_dir: str = DATA_DIR) -> str:
+    return os.path.join(data_dir, f'synthetic-v{SYNTHETIC_VERSION}-{nodes}-{seed}.{FORMAT_EXTENSIONS[fmt]}')
+
+def ensure_dataset(nodes: int, seed: int = 0, fmt: str = 'xml', data_dir: str = DATA_DIR) -> str:
+    """Return the path of a generated dataset, generating it only if it does not exist yet."""
+    path = dataset_path(nodes, seed, fmt, data_dir)
+    if not os.path.exists(path):
+        # Progress goes to stderr, keeping stdout for reports such as the scaling JSON
+        print(f"Generating {nodes} nodes of synthetic {fmt} data...", file=sys.stderr)
+        SyntheticOSM(nodes, seed).write(path, fmt)
+    return path
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate deterministic synthetic OSM data")
+    parser.add_argument('--nodes', type=int, default=100000, help="Approximate number of nodes")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--format', choices=SYNTHETIC_FORMATS, default='xml',
+                        help="OSM XML, Overpass JSON or PBF (PBF needs pyosmium)")
+    parser.add_argument('-o', '--output', help="Output file (default: a file in output/cache/synthetic)")
+    args = parser.parse_args()
+
+    output = args.output or dataset_path(args.nodes, args.seed, args.format)
+    SyntheticOSM(args.nodes, args.seed).write(output, args.format)
+    print(f"Wrote {output}")
+
+if __name__ == "__main__":
+    main()
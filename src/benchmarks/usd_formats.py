@@ -0,0 +1,64 @@
+import argparse
+import json
+import os
+import tempfile
+import time
+from pxr import Usd
+from src.examples.parse_json import JsonHandler
+from src.usd.stage import USD_FORMATS
+
+def load_den_helder() -> JsonHandler:
+    """Load the Den Helder sample with the ground texture download disabled."""
+    current_dir = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+    json_path = os.path.join(current_dir, 'samples', 'export.json')
+    handler = JsonHandler()
+    handler.FETCH_GROUND_TEXTURE = False
+    with open(json_path, 'r', encoding='utf-8') as f:
+        handler.process_json(json.load(f))
+    return handler
+
+def benchmark_format(handler: JsonHandler, output_dir: str, fmt: str, repeats: int = 3) -> dict:
+    """Time writing and opening the Den Helder scene in one USD format."""
+    usd_path = os.path.join(output_dir, f'den_helder.{fmt}')
+    write_times, open_times = [], []
+    for _ in range(repeats):
+        if os.path.exists(usd_path):
+            os.remove(usd_path)
+        start = time.perf_counter()
+        handler.export_to_usd(usd_path)
+        write_times.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        stage = Usd.Stage.Open(usd_path)
+        prims = sum(1 for _ in stage.Traverse())
+        open_times.append(time.perf_counter() - start)
+        del stage
+
+    return {
+        'format': fmt,
+        'file_size_bytes': os.path.getsize(usd_path),
+        'write_seconds': min(write_times),
+        'open_seconds': min(open_times),
+        'prims': prims,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark usdc against usda on the Den Helder scene")
+    parser.add_argument('--repeats', type=int, default=3, help="Runs per format; the best time is reported")
+    parser.add_argument('--output', help="Optional JSON file for the results")
+    args = parser.parse_args()
+
+    handler = load_den_helder()
+    # Warm the triangulation cache so both formats time the same work
+    with tempfile.TemporaryDirectory() as output_dir:
+        handler.export_to_usd(os.path.join(output_dir, 'warmup.usdc'))
+        results = [benchmark_format(handler, output_dir, fmt, args.repeats) for fmt in USD_FORMATS]
+
+    report = json.dumps(results, indent=2)
+    print(report)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(report)
+
+if __name__ == "__main__":
+    main()
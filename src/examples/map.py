@@ -1,17 +1,12 @@
-import requests
 from PIL import Image
 from io import BytesIO
-import math
 from pxr import Usd, UsdGeom, Sdf, UsdShade, Gf
 import os
-
-def deg2num(lat_deg, lon_deg, zoom):
-    """Convert latitude/longitude to tile coordinates"""
-    lat_rad = math.radians(lat_deg)
-    n = 1 << zoom
-    xtile = int((lon_deg + 180.0) / 360.0 * n)
-    ytile = int((1.0 - math.asinh(math.tan(lat_rad)) / math.pi) / 2.0 * n)
-    return (xtile, ytile)
+import argparse
+from src.tiles.cache import TileCache
+from src.tiles.fetch import TileFetcher
+from src.tiles.tilemath import deg2num
+from src.usd.stage import add_format_argument, create_stage
 
 def create_background(stage, image_path):
     """Create a background in USD following official USD guidelines"""
@@ -74,7 +69,7 @@ def create_background(stage, image_path):
     # Bind material
     UsdShade.MaterialBindingAPI(background).Bind(material)
 
-def main():
+def main(fmt: str = None):
     # Den Helder coordinates
     lat = 52.95784
     lon = 4.79160
@@ -84,21 +79,20 @@ def main():
     xtile, ytile = deg2num(lat, lon, zoom)
     
     # Download the tile
-    url = f"https://tile.openstreetmap.org/{zoom}/{xtile}/{ytile}.png"
-    headers = {'User-Agent': 'Simple-OSM-USD-Example/1.0'}
-    
     print(f"Downloading tile for coordinates: {lat}, {lon}")
-    response = requests.get(url, headers=headers)
+    cache = TileCache(os.path.join('output', 'cache', 'tiles'))
+    with TileFetcher(user_agent='Simple-OSM-USD-Example/1.0', cache=cache) as fetcher:
+        content = fetcher.fetch(zoom, xtile, ytile)
     
-    if response.status_code == 200:
+    if content:
         # Save the tile
-        tile = Image.open(BytesIO(response.content))
+        tile = Image.open(BytesIO(content))
         image_path = "output/background_tile.png"
         os.makedirs("output", exist_ok=True)
         tile.save(image_path)
         
         # Create USD stage
-        stage = Usd.Stage.CreateNew("output/background.usda")
+        stage = create_stage("output/background", fmt)
         
         # Set up stage
         UsdGeom.SetStageMetersPerUnit(stage, 1.0)
@@ -112,4 +106,6 @@ def main():
         print("Created USD background!")
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Create a USD background from an OSM tile")
+    add_format_argument(parser)
+    main(parser.parse_args().format)
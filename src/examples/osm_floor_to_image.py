@@ -1,57 +1,25 @@
 import os
-import requests
-import math
-from PIL import Image
-from io import BytesIO
+import argparse
 from pxr import Usd, UsdGeom, Sdf, UsdShade, Gf
+from src.tiles.cache import TileCache
+from src.tiles.fetch import TileFetcher
+from src.tiles.mosaic import stream_mosaic
+from src.tiles.tilemath import tile_range
+from src.usd.stage import add_format_argument, create_stage, format_path
 
-def deg2num(lat_deg, lon_deg, zoom):
-    """Convert latitude/longitude to tile coordinates"""
-    lat_rad = math.radians(lat_deg)
-    n = 1 << zoom
-    xtile = int((lon_deg + 180.0) / 360.0 * n)
-    ytile = int((1.0 - math.asinh(math.tan(lat_rad)) / math.pi) / 2.0 * n)
-    return (xtile, ytile)
+def get_osm_image(min_lat, max_lat, min_lon, max_lon, output_path, zoom=17, tile_url=None):
+    """Download and stitch OSM tiles for the given area into a PNG at ``output_path``.
 
-def get_osm_image(min_lat, max_lat, min_lon, max_lon, zoom=17):
-    """Download and stitch OSM tiles for the given area"""
+    Tiles are streamed to disk one row at a time, so the area is not limited
+    by memory. Returns the number of tiles that could be fetched.
+    """
     # Calculate tile coordinates
-    min_xtile, max_ytile = deg2num(min_lat, min_lon, zoom)
-    max_xtile, min_ytile = deg2num(max_lat, max_lon, zoom)
-    
-    # Ensure we don't download too many tiles
-    if (max_xtile - min_xtile + 1) * (max_ytile - min_ytile + 1) > 25:
-        print("Warning: Large area might require too many tiles. Consider reducing zoom level.")
-        return None
-    
-    # Calculate total image size
-    tile_size = 256
-    width = (max_xtile - min_xtile + 1) * tile_size
-    height = (max_ytile - min_ytile + 1) * tile_size
-    
-    # Create new image
-    result = Image.new('RGB', (width, height))
-    
-    # Download and stitch tiles
-    for xtile in range(min_xtile, max_xtile + 1):
-        for ytile in range(min_ytile, max_ytile + 1):
-            url = f"https://tile.openstreetmap.org/{zoom}/{xtile}/{ytile}.png"
-            headers = {'User-Agent': 'OSM-to-USD-Converter/1.0'}
-            
-            try:
-                response = requests.get(url, headers=headers)
-                tile = Image.open(BytesIO(response.content))
-                
-                # Calculate position in final image
-                x = (xtile - min_xtile) * tile_size
-                y = (ytile - min_ytile) * tile_size
-                result.paste(tile, (x, y))
-                
-            except Exception as e:
-                print(f"Error downloading tile {xtile},{ytile}: {e}")
-                return None
-    
-    return result
+    min_xtile, max_xtile, min_ytile, max_ytile = tile_range(min_lat, max_lat, min_lon, max_lon, zoom)
+    
+    current_dir = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+    cache = TileCache(os.path.join(current_dir, 'output', 'cache', 'tiles'))
+    with TileFetcher(tile_url, cache=cache) as fetcher:
+        return stream_mosaic(fetcher, zoom, min_xtile, max_xtile, min_ytile, max_ytile, output_path)
 
 def create_textured_ground(stage, image_path, center_lon, center_lat, scale=2000):
     """Create a textured ground plane in USD aligned with the center coordinates"""
@@ -110,7 +78,7 @@ def create_textured_ground(stage, image_path, center_lon, center_lat, scale=2000
     # Bind material
     UsdShade.MaterialBindingAPI(ground).Bind(material)
 
-def main():
+def main(fmt: str = None):
     # Den Helder coordinates (matching parse_json.py)
     min_lat = 52.96
     max_lat = 52.96 + 0.005  # Matching the exact range from parse_json.py
@@ -130,17 +98,15 @@ def main():
     
     # Download OSM image
     print("Downloading OSM tiles...")
-    image = get_osm_image(min_lat, max_lat, min_lon, max_lon)
+    image_path = os.path.join(output_dir, 'den_helder_map.png')
+    fetched = get_osm_image(min_lat, max_lat, min_lon, max_lon, image_path)
     
-    if image:
-        # Save the image
-        image_path = os.path.join(output_dir, 'den_helder_map.png')
-        image.save(image_path)
+    if fetched > 0:
         print(f"Map image saved to: {image_path}")
         
         # Create USD stage with textured ground
-        usd_path = os.path.join(output_dir, 'den_helder_ground.usda')
-        stage = Usd.Stage.CreateNew(usd_path)
+        usd_path = format_path(os.path.join(output_dir, 'den_helder_ground'), fmt)
+        stage = create_stage(usd_path)
         UsdGeom.SetStageMetersPerUnit(stage, 1.0)
         
         # Add textured ground with center coordinates
@@ -150,7 +116,9 @@ def main():
         stage.Save()
         print(f"USD file saved to: {usd_path}")
     else:
-        print("Failed to download map image")
+        print("Failed to download map image: no tile could be fetched")
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Create a textured USD ground plane from OSM tiles")
+    add_format_argument(parser)
+    main(parser.parse_args().format)
@@ -1,16 +1,37 @@
+import argparse
+import copy
 import json
+import multiprocessing
 import os
 from typing import List, Dict, Set
 from collections import defaultdict
-from pxr import Usd, UsdGeom, Gf, Sdf, UsdShade
+from concurrent.futures import ProcessPoolExecutor
+from pxr import Usd, UsdGeom, Gf, Sdf, UsdShade, Tf, Vt
 import xml.etree.ElementTree as ET
 import osmium
 import shapely.wkb as wkblib
-from PIL import Image
 import math
-import requests
-from io import BytesIO
-from map import deg2num
+import numpy as np
+from src.geometry.canonical import canonicalize
+from src.geometry.csr import compress, item_ids, pack_polylines, segment_bounds
+from src.geometry.extrude import extrude_footprints
+from src.geometry.simplify import simplify_mask
+from src.geometry.ribbon import build_ribbons
+from src.geometry.triangulate import TriangulationCache, triangulate_polygons
+from src.osm.classify import LAND, WATER, TagTable, classify_tags
+from src.profiling import instrument
+from src.tiles.cache import TileCache
+from src.tiles.encode import TEXTURE_PRESETS, TextureEncoder, TextureOptions, add_texture_argument
+from src.tiles.fetch import TileFetcher
+from src.tiles.georef import geotexture_metadata, stream_georeferenced
+from src.tiles.quadtree import partition_quadtree
+from src.tiles.raster import METERS_PER_DEGREE_LAT, METERS_PER_DEGREE_LON, RasterLayer, rasterize_layers
+from src.tiles.texture import build_texture_pyramid
+from src.tiles.tilemath import deg2num, tile_bounds, tile_range
+from src.usd.attribute_table import FeatureTable
+from src.usd.mesh import UP_NORMAL, author_mesh
+from src.usd.point_instancer import author_point_instancer
+from src.usd.stage import add_format_argument, format_path, save_stage
 
 class JsonHandler:
     def __init__(self):
@@ -18,7 +39,9 @@ class JsonHandler:
         self.ways: List[tuple] = []  # [(way_id, tags, nodes)]
         self.water_features = []  # Store water features as (coords, tags)
         self.land_features = []   # Store land features as (coords, tags)
-        self.roads = []          # Store road features as (coords, tags, width)
+        self.area_candidates = [] # Ways awaiting land/water classification as (coords, tags)
+        self.roads = []          # Store road features as (coords, tags, width in meters)
+        self.point_features = [] # Store tagged nodes as (node_id, tags)
         
         # Define the area of interest with the new coordinates
         self.min_lat = 52.94853  # Updated
@@ -30,6 +53,125 @@ class JsonHandler:
         self.SCALE = 2000        # Base scale for the map
         self.HEIGHT_SCALE = 0.02 # Height scale for buildings
         
+        # Road ribbon settings
+        self.ROAD_JOIN = 'miter'       # 'miter' or 'bevel' corners
+        self.ROAD_MITER_LIMIT = 4.0    # Bevel corners sharper than this
+        self.MERGE_ROADS = False       # One mesh per road class instead of per road
+        
+        # Repeated footprints (rowhouses, parking spaces) are authored once and instanced
+        self.INSTANCE_REPEATS = True
+        self.INSTANCE_TOLERANCE = 0.05  # meters; footprints this close share a prototype
+        self.INSTANCE_MIN_COPIES = 2
+        
+        # Douglas-Peucker tolerances in meters, authored as the 'lod' variant set
+        self.LOD_TOLERANCES = {'lod0': 0.0, 'lod1': 1.0, 'lod2': 4.0}
+        self.lod_report = {}           # LOD name -> source vertex count
+        
+        # Tagged nodes authored as PointInstancers: (key, value) -> (instancer, prototype)
+        self.POINT_CLASSES = {
+            ('natural', 'tree'): ('trees', 'tree'),
+            ('power', 'pole'): ('poles', 'power_pole'),
+            ('power', 'tower'): ('poles', 'power_tower'),
+            ('man_made', 'utility_pole'): ('poles', 'power_pole'),
+            ('highway', 'street_lamp'): ('street_furniture', 'street_lamp'),
+            ('amenity', 'bench'): ('street_furniture', 'bench'),
+            ('amenity', 'waste_basket'): ('street_furniture', 'waste_basket'),
+            ('amenity', 'post_box'): ('street_furniture', 'post_box'),
+            ('barrier', 'bollard'): ('street_furniture', 'bollard'),
+        }
+        # Prototype -> (shape, default height m, radius m, color)
+        self.POINT_PROTOTYPES = {
+            'tree': ('tree', 8.0, 2.5, (0.2, 0.5, 0.2)),
+            'conifer': ('conifer', 10.0, 2.0, (0.15, 0.4, 0.2)),
+            'power_pole': ('cylinder', 9.0, 0.15, (0.45, 0.35, 0.25)),
+            'power_tower': ('cone', 30.0, 3.0, (0.6, 0.6, 0.6)),
+            'street_lamp': ('cylinder', 6.0, 0.1, (0.3, 0.3, 0.3)),
+            'bench': ('box', 0.5, 0.9, (0.5, 0.35, 0.2)),
+            'waste_basket': ('cylinder', 1.0, 0.25, (0.2, 0.3, 0.2)),
+            'post_box': ('box', 1.5, 0.3, (0.8, 0.1, 0.1)),
+            'bollard': ('cylinder', 1.0, 0.1, (0.4, 0.4, 0.4)),
+        }
+        
+        # Material colors of the authored features
+        self.MATERIAL_COLORS = {
+            'water': (0.1, 0.3, 0.8),      # Brighter blue
+            'building': (0.8, 0.8, 0.8),
+            'land': (0.4, 0.6, 0.4),       # Default green
+            'road': (0.5, 0.5, 0.5),       # Default gray
+        }
+        self.LAND_COLORS = {
+            'forest': (0.2, 0.5, 0.2),  # Dark green
+            'grass': (0.3, 0.6, 0.3),   # Medium green
+            'park': (0.4, 0.7, 0.4),    # Light green
+            'beach': (0.9, 0.9, 0.7),   # Sand color
+            'recreation_ground': (0.5, 0.7, 0.5)  # Pale green
+        }
+        self.ROAD_COLORS = {
+            'motorway': (0.3, 0.3, 0.3),  # Dark gray
+            'trunk': (0.35, 0.35, 0.35),
+            'primary': (0.4, 0.4, 0.4),
+            'secondary': (0.45, 0.45, 0.45),
+            'residential': (0.5, 0.5, 0.5),  # Light gray
+            'footway': (0.6, 0.6, 0.5),  # Tan
+            'path': (0.7, 0.7, 0.6),  # Light tan
+            'parking_space': (0.4, 0.4, 0.5),  # Bluish gray for parking
+        }
+        
+        # Categories written by export_to_usd, one layer each in export_layered_usd
+        self.EXPORT_CATEGORIES = ('land', 'water', 'buildings', 'roads', 'points')
+        
+        # Quadtree tiling for export_tiled_usd
+        self.TILE_MIN_ZOOM = 14
+        self.TILE_MAX_ZOOM = 18
+        self.MAX_FEATURES_PER_TILE = 500
+        
+        # Skip the tile download and use a plain ground plane when False
+        self.FETCH_GROUND_TEXTURE = True
+        self.GROUND_TEXTURE_ZOOM = 17
+        self.GROUND_TEXTURE_TILED = True   # per-tile textures with a mip pyramid instead of one stitched PNG
+        self.GROUND_TEXTURE_MIN_ZOOM = 14  # coarsest level of the pyramid
+        self.TILE_URL = None     # z/x/y URL template; None uses OSM_TILE_URL or the OSM servers
+        self.TILE_WORKERS = 2    # concurrent tile downloads
+        self.TILE_REQUESTS_PER_SECOND = 4.0  # per tile server
+        
+        # Downloaded tiles are kept on disk; TILE_OFFLINE serves only from there
+        self.TILE_CACHE_MAX_AGE = 7 * 24 * 3600   # seconds before a tile is revalidated
+        self.TILE_CACHE_MAX_BYTES = 512 * 2 ** 20  # LRU eviction above this size
+        self.TILE_OFFLINE = None                   # None follows OSM_TILE_OFFLINE
+        
+        # Texture encoding; single streamed textures are always PNG
+        self.TEXTURE_FORMAT = 'png'      # 'png', 'jpeg' or 'webp' for ground texture tiles
+        self.TEXTURE_COMPRESSION = 6     # PNG deflate level, 1 for fast iteration
+        self.TEXTURE_QUALITY = 90        # JPEG/WebP quality
+        self.TEXTURE_WORKERS = os.cpu_count() or 1
+        
+        # Ground texture drawn from the feature tables instead of downloaded tiles
+        self.GROUND_TEXTURE_SOURCE = None  # 'tiles' or 'raster'; None rasterizes when offline
+        self.RASTER_METERS_PER_PIXEL = 0.5
+        self.RASTER_TILE_SIZE = 1024       # pixels per side of the windows rendered in parallel
+        self.RASTER_WORKERS = os.cpu_count() or 1
+        self.RASTER_COLORS = {
+            'water': (170, 211, 223),
+            'building': (217, 208, 201),
+            'road': (255, 255, 255),
+            'land': (205, 235, 176),
+            'forest': (173, 209, 158),
+            'wood': (173, 209, 158),
+            'park': (200, 250, 204),
+            'beach': (255, 241, 186),
+            'heath': (214, 217, 159),
+            'scrub': (200, 215, 171),
+        }
+        
+        # Polygon triangulations are cached on disk by geometry hash
+        current_dir = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+        self.triangulation_cache = TriangulationCache(os.path.join(current_dir, 'output', 'cache', 'triangles'))
+        self.tile_cache_dir = os.path.join(current_dir, 'output', 'cache', 'tiles')
+        
+        # Ground textures are written here; texture_files lists those of the last ground plane
+        self.texture_dir = os.path.join(current_dir, 'output')
+        self.texture_files = []
+        
         # Store all coordinates to calculate center later
         self.all_coords = []
 
@@ -45,9 +187,15 @@ class JsonHandler:
             for lon, lat in coords
         ]
 
-    def process_json(self, json_data: dict):
-        """Process the JSON data."""
+    @instrument.timed('parse_json')
+    def process_json(self, json_data: dict, classify: bool = True):
+        """Process the JSON data.
+
+        With ``classify`` False land/water candidates are left in
+        ``area_candidates`` for a later ``classify_features``.
+        """
         print(f"Total elements in JSON: {len(json_data['elements'])}")
+        instrument.count('json.elements', len(json_data['elements']))
         
         # First pass: collect all nodes
         for element in json_data['elements']:
@@ -56,6 +204,8 @@ class JsonHandler:
                     coords = (element['lon'], element['lat'])
                     self.nodes[element['id']] = coords
                     self.add_coordinates([coords])
+                    if element.get('tags'):
+                        self.point_features.append((element['id'], element['tags']))
         
         # Second pass: collect all ways and classify them
         for element in json_data['elements']:
@@ -65,9 +215,11 @@ class JsonHandler:
                     self.process_way(element)
                 elif 'natural' in tags or 'water' in tags:
                     self.classify_feature(element)
+        if classify:
+            self.classify_features()
 
     def classify_feature(self, way: dict):
-        """Classify way as water or land feature."""
+        """Queue a way inside the area of interest for land/water classification."""
         # Get nodes from way
         coords = []
         nodes = way.get('nodes', [])
@@ -96,60 +248,106 @@ class JsonHandler:
         if isinstance(tags, (osmium.osm.TagList)):  # Handle osmium TagList objects
             tags = {tag.k: tag.v for tag in tags}
         
-        # Water features
-        is_water = False
-        if ('natural' in tags and tags['natural'] == 'water') or \
-           ('water' in tags) or \
-           ('waterway' in tags):
-            self.water_features.append((coords, tags))
-            is_water = True
-        
-        # Land features (if not water)
-        if not is_water:
-            land_types = {
-                'natural': ['wood', 'grassland', 'heath', 'scrub', 'forest', 'beach'],
-                'landuse': ['forest', 'grass', 'meadow', 'recreation_ground', 'park'],
-                'leisure': ['park', 'garden', 'nature_reserve'],
-            }
-            
-            for key, values in land_types.items():
-                if key in tags and tags[key] in values:
-                    self.land_features.append((coords, tags))
-                    break
+        # Classified in bulk by classify_features once all ways are collected
+        self.area_candidates.append((coords, tags))
+
+    @instrument.timed('classify')
+    def classify_features(self):
+        """Sort the pending candidate ways into water and land features.
+
+        Tags are dictionary-encoded once and the land and water rules of
+        ``src.osm.classify`` evaluated over all candidates together; water
+        takes precedence regardless of tag order.
+        """
+        if not self.area_candidates:
+            return
+        categories = classify_tags(TagTable.from_tags(tags for _, tags in self.area_candidates))
+        for feature, category in zip(self.area_candidates, categories):
+            if category == WATER:
+                self.water_features.append(feature)
+            elif category == LAND:
+                self.land_features.append(feature)
+        self.area_candidates = []
+
+    def in_area(self, polylines):
+        """Return a bool per lon/lat polyline: True when its bounds overlap the area of interest."""
+        coords, offsets = pack_polylines(polylines)
+        mins, maxs = segment_bounds(coords, offsets)
+        # Empty polylines have NaN bounds and never overlap
+        return ((mins[:, 0] <= self.max_lon) & (maxs[:, 0] >= self.min_lon) &
+                (mins[:, 1] <= self.max_lat) & (maxs[:, 1] >= self.min_lat))
 
+    @instrument.timed('crop')
+    def crop_to_area(self):
+        """Drop features outside the area of interest, for data loaded without an area.
+
+        Buildings, roads and land/water features are kept when their bounds
+        overlap the area, as the parsers do; tagged nodes and the
+        coordinates that define the center must lie inside it.
+        """
+        def way_count():
+            return sum(len(getattr(self, name)) for name in ('ways', 'roads', 'area_candidates',
+                                                               'water_features', 'land_features'))
+        before = way_count()
+        footprints = [[self.nodes[n] for n in nodes if n in self.nodes] for _, _, nodes in self.ways]
+        self.ways = [way for way, keep in zip(self.ways, self.in_area(footprints)) if keep]
+        self.roads = [road for road, keep in zip(self.roads, self.in_area([r[0] for r in self.roads])) if keep]
+        for name in ('area_candidates', 'water_features', 'land_features'):
+            features = getattr(self, name)
+            setattr(self, name, [f for f, keep in zip(features, self.in_area([f[0] for f in features])) if keep])
+        instrument.count('aoi.ways_dropped', before - way_count())
+        
+        points = [[self.nodes[node_id]] if node_id in self.nodes else [] for node_id, _ in self.point_features]
+        kept = self.in_area(points)
+        instrument.count('aoi.points_dropped', len(kept) - int(kept.sum()))
+        self.point_features = [p for p, keep in zip(self.point_features, kept) if keep]
+        self.all_coords = [c for c, keep in zip(self.all_coords, self.in_area([[c] for c in self.all_coords])) if keep]
+
+    @instrument.timed('ground')
     def create_ground_plane(self, stage, center_lon, center_lat):
         """Create a textured ground plane using OSM map tiles."""
+        raster = self.ground_texture_source() == 'raster'
+        self.texture_files = []
+        if self.FETCH_GROUND_TEXTURE and self.GROUND_TEXTURE_TILED and not raster:
+            if self.create_tiled_ground(stage, center_lon, center_lat):
+                return
+        
         ground = UsdGeom.Mesh.Define(stage, '/World/Ground')
         
         # Download map tiles for the area
-        print("Downloading map tiles for ground texture...")
-        print(f"Area bounds: lat({self.min_lat}, {self.max_lat}), lon({self.min_lon}, {self.max_lon})")
-        image = self.fetch_tiles(self.min_lat, self.max_lat, self.min_lon, self.max_lon, zoom=17)
-        
-        if image:
-            # Save the image
-            current_dir = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
-            output_dir = os.path.join(current_dir, 'output')
-            image_path = os.path.join(output_dir, 'ground_texture.png')
-            image.save(image_path)
+        texture = None
+        if self.FETCH_GROUND_TEXTURE:
+            print(f"Area bounds: lat({self.min_lat}, {self.max_lat}), lon({self.min_lon}, {self.max_lon})")
+            image_path = os.path.join(self.texture_dir, 'ground_texture.png')
+            if raster:
+                print("Rasterizing ground texture from OSM features...")
+                texture = self.rasterize_ground_texture(image_path)
+            else:
+                print("Downloading map tiles for ground texture...")
+                texture = self.fetch_ground_texture(image_path)
+        
+        if texture:
+            image_path = texture.path
             print(f"Ground texture saved to: {image_path}")
+            self.texture_files.append(image_path)
+            instrument.count('texture.bytes_written', os.path.getsize(image_path))
             
-            # Calculate the actual ground size based on coordinate ranges
-            lon_range = self.max_lon - self.min_lon
-            lat_range = self.max_lat - self.min_lat
-            max_range = max(lon_range, lat_range)
-            size = self.SCALE * max_range
+            # The texture covers exactly the area of interest on a lon/lat grid
+            west = (self.min_lon - center_lon) * self.SCALE
+            east = (self.max_lon - center_lon) * self.SCALE
+            south = (self.min_lat - center_lat) * self.SCALE
+            north = (self.max_lat - center_lat) * self.SCALE
             
-            # Create ground plane geometry centered at 0,0
+            # Create ground plane geometry over the area, wound to face up
             points = [
-                Gf.Vec3f(-size, -0.1, -size),  # Bottom-left
-                Gf.Vec3f(size, -0.1, -size),   # Bottom-right
-                Gf.Vec3f(size, -0.1, size),    # Top-right
-                Gf.Vec3f(-size, -0.1, size),   # Top-left
+                Gf.Vec3f(west, -0.1, south),  # Bottom-left
+                Gf.Vec3f(west, -0.1, north),  # Top-left
+                Gf.Vec3f(east, -0.1, north),  # Top-right
+                Gf.Vec3f(east, -0.1, south),  # Bottom-right
             ]
             
-            # Define UV coordinates (flipped vertically to match OSM orientation)
-            texCoords = [(0, 1), (1, 1), (1, 0), (0, 0)]
+            # The top image row lies north
+            texCoords = [(0, 0), (0, 1), (1, 1), (1, 0)]
             
             face_indices = [0, 1, 2, 3]
             vertex_counts = [4]
@@ -164,42 +362,30 @@ class JsonHandler:
                 'st', Sdf.ValueTypeNames.TexCoord2fArray, UsdGeom.Tokens.varying)
             texCoordPrimvar.Set(texCoords)
             
-            # Create material and shader
-            material = UsdShade.Material.Define(stage, '/World/Ground/material')
-            shader = UsdShade.Shader.Define(stage, '/World/Ground/material/PBRShader')
-            shader.CreateIdAttr('UsdPreviewSurface')
-            
-            # Create texture shader
-            stReader = UsdShade.Shader.Define(stage, '/World/Ground/material/stReader')
-            stReader.CreateIdAttr('UsdPrimvarReader_float2')
-            stReader.CreateInput('varname', Sdf.ValueTypeNames.Token).Set('st')
-            
-            # Create texture sampler
-            diffuseTextureSampler = UsdShade.Shader.Define(
-                stage, '/World/Ground/material/diffuseTexture')
-            diffuseTextureSampler.CreateIdAttr('UsdUVTexture')
-            diffuseTextureSampler.CreateInput('file', Sdf.ValueTypeNames.Asset).Set(image_path)
-            diffuseTextureSampler.CreateInput('st', Sdf.ValueTypeNames.Float2).ConnectToSource(
-                stReader.ConnectableAPI(), 'result')
-            
-            # Connect texture to shader
-            shader.CreateInput('diffuseColor', Sdf.ValueTypeNames.Color3f).ConnectToSource(
-                diffuseTextureSampler.ConnectableAPI(), 'rgb')
-            
-            # Add slight transparency to blend with other features
-            shader.CreateInput('opacity', Sdf.ValueTypeNames.Float).Set(0.95)
-            
-            # Bind material
+            material = self.define_texture_material(stage, '/World/Ground/material',
+                                                    self.texture_asset_path(stage, image_path))
             UsdShade.MaterialBindingAPI(ground).Bind(material)
+            
+            # Record the georeferencing so consumers can map pixels back to lon/lat
+            layer = stage.GetRootLayer()
+            data = dict(layer.customLayerData)
+            metadata = geotexture_metadata(texture, None if raster else self.GROUND_TEXTURE_ZOOM)
+            if raster:
+                metadata['metersPerPixel'] = self.RASTER_METERS_PER_PIXEL
+            metadata['geoTransform'] = Vt.DoubleArray(metadata['geoTransform'])
+            metadata['size'] = Vt.IntArray(metadata['size'])
+            metadata['localBounds'] = Vt.DoubleArray([west, south, east, north])
+            data['groundTexture'] = metadata
+            layer.customLayerData = data
         else:
             print("Failed to create ground texture, using default ground plane")
             # Create default ground plane with solid color
             size = self.SCALE * 1.5
             points = [
                 Gf.Vec3f(-size, -0.1, -size),
-                Gf.Vec3f(size, -0.1, -size),
-                Gf.Vec3f(size, -0.1, size),
                 Gf.Vec3f(-size, -0.1, size),
+                Gf.Vec3f(size, -0.1, size),
+                Gf.Vec3f(size, -0.1, -size),
             ]
             
             face_indices = [0, 1, 2, 3]
@@ -215,52 +401,195 @@ class JsonHandler:
             shader.CreateIdAttr('UsdPreviewSurface')
             shader.CreateInput('diffuseColor', Sdf.ValueTypeNames.Color3f).Set((0.4, 0.6, 0.3))
             UsdShade.MaterialBindingAPI(ground).Bind(material)
+        
+        # Either way the ground is one flat quad facing up
+        ground.CreateSubdivisionSchemeAttr(UsdGeom.Tokens.none)
+        ground.CreateExtentAttr(UsdGeom.PointBased.ComputeExtent(points))
+        ground.CreateNormalsAttr(Vt.Vec3fArray.FromNumpy(UP_NORMAL.astype(np.float32)))
+        ground.SetNormalsInterpolation(UsdGeom.Tokens.constant)
 
-    def create_water_feature(self, stage, coords, tags):
-        """Create a water feature mesh using transformed coordinates."""
-        water_path = f'/World/Water/water_{len(self.water_features)}'
-        water = UsdGeom.Mesh.Define(stage, water_path)
+    def define_texture_material(self, stage, material_path, texture_path, opacity=0.95):
+        """Define a preview surface material whose diffuse color reads a texture through ``st``."""
+        material = UsdShade.Material.Define(stage, material_path)
+        shader = UsdShade.Shader.Define(stage, f'{material_path}/PBRShader')
+        shader.CreateIdAttr('UsdPreviewSurface')
         
-        # Create points for water surface (slightly below ground)
-        points = []
-        for x, z in coords:
-            points.append(Gf.Vec3f(x, -0.05, z))
+        # Create texture shader
+        stReader = UsdShade.Shader.Define(stage, f'{material_path}/stReader')
+        stReader.CreateIdAttr('UsdPrimvarReader_float2')
+        stReader.CreateInput('varname', Sdf.ValueTypeNames.Token).Set('st')
+        
+        # Create texture sampler; clamping keeps neighbouring tiles from bleeding at the seams
+        diffuseTextureSampler = UsdShade.Shader.Define(stage, f'{material_path}/diffuseTexture')
+        diffuseTextureSampler.CreateIdAttr('UsdUVTexture')
+        diffuseTextureSampler.CreateInput('file', Sdf.ValueTypeNames.Asset).Set(texture_path)
+        diffuseTextureSampler.CreateInput('wrapS', Sdf.ValueTypeNames.Token).Set('clamp')
+        diffuseTextureSampler.CreateInput('wrapT', Sdf.ValueTypeNames.Token).Set('clamp')
+        diffuseTextureSampler.CreateInput('st', Sdf.ValueTypeNames.Float2).ConnectToSource(
+            stReader.ConnectableAPI(), 'result')
+        
+        # Connect texture to shader
+        shader.CreateInput('diffuseColor', Sdf.ValueTypeNames.Color3f).ConnectToSource(
+            diffuseTextureSampler.ConnectableAPI(), 'rgb')
+        
+        # Add slight transparency to blend with other features
+        shader.CreateInput('opacity', Sdf.ValueTypeNames.Float).Set(opacity)
+        return material
+
+    def texture_asset_path(self, stage, texture_path):
+        """Return ``texture_path`` relative to the stage's root layer when it lies below it."""
+        layer_path = stage.GetRootLayer().realPath
+        if not layer_path:
+            return texture_path
+        relative = os.path.relpath(texture_path, os.path.dirname(layer_path))
+        if relative.startswith('..'):
+            return texture_path
+        return './' + relative.replace(os.sep, '/')
+
+    def create_tiled_ground(self, stage, center_lon, center_lat):
+        """Create the ground as one textured quad per map tile with a mip pyramid.
+
+        Tiles of the AOI at ``GROUND_TEXTURE_ZOOM`` and their downsampled
+        parents down to ``GROUND_TEXTURE_MIN_ZOOM`` are written to
+        ``<texture_dir>/ground_tiles/<z>/<x>/<y>.<ext>`` in ``TEXTURE_FORMAT``. Every level is a
+        variant of the 'textureLod' variant set on /World/Ground, each tile quad covering
+        exactly its tile's bounds, so no single texture grows with the area.
+        Tiles that could not be fetched are left out; returns False when none
+        could, so the caller falls back to a single texture.
+        """
+        zoom = self.GROUND_TEXTURE_ZOOM
+        min_xtile, max_xtile, min_ytile, max_ytile = tile_range(self.min_lat, self.max_lat,
+                                                                self.min_lon, self.max_lon, zoom)
+        print(f"Building ground texture tiles: z{zoom} X({min_xtile}-{max_xtile}), Y({min_ytile}-{max_ytile})")
+        
+        output_dir = os.path.join(self.texture_dir, 'ground_tiles')
+        cache = TileCache(self.tile_cache_dir, self.TILE_CACHE_MAX_AGE, self.TILE_CACHE_MAX_BYTES)
+        with instrument.stage('fetch_tiles'), \
+                TileFetcher(self.TILE_URL, max_workers=self.TILE_WORKERS,
+                            requests_per_second=self.TILE_REQUESTS_PER_SECOND,
+                            cache=cache, offline=self.TILE_OFFLINE) as fetcher, \
+                TextureEncoder(output_dir, self.texture_options(), self.TEXTURE_WORKERS) as encoder:
+            levels = build_texture_pyramid(fetcher, zoom, min_xtile, max_xtile, min_ytile, max_ytile,
+                                           encoder, self.GROUND_TEXTURE_MIN_ZOOM)
+        print(f"Texture tiles: {encoder.encoded} encoded, {encoder.skipped} unchanged")
+        count_tiles(cache, fetcher)
+        instrument.count('texture.tiles_encoded', encoder.encoded)
+        
+        # Missing tiles are left out of the pyramid, so the ground has holes instead of blank quads
+        missing = (max_xtile - min_xtile + 1) * (max_ytile - min_ytile + 1) - len(levels[zoom])
+        instrument.count('tiles.missing', missing)
+        if not levels[zoom]:
+            print(f"None of the {missing} ground texture tiles could be fetched; using a single texture")
+            return False
+        if missing:
+            print(f"Skipped {missing} ground texture tile(s) that could not be fetched")
+        
+        ground = UsdGeom.Xform.Define(stage, '/World/Ground')
+        lod_set = ground.GetPrim().GetVariantSets().AddVariantSet('textureLod')
+        for level in sorted(levels, reverse=True):
+            name = f'z{level}'
+            lod_set.AddVariant(name)
+            lod_set.SetVariantSelection(name)
+            with lod_set.GetVariantEditContext():
+                for xtile, ytile, path in levels[level]:
+                    self.texture_files.append(path)
+                    self.create_ground_tile(stage, level, xtile, ytile, path, center_lon, center_lat)
+        lod_set.SetVariantSelection(f'z{zoom}')
+        print(f"Ground texture: {sum(len(tiles) for tiles in levels.values())} tiles over {len(levels)} levels")
+        return True
+
+    def texture_options(self):
+        """Return the encoding options of texture tiles."""
+        return TextureOptions(self.TEXTURE_FORMAT, self.TEXTURE_COMPRESSION, self.TEXTURE_QUALITY)
+
+    def use_texture_preset(self, name):
+        """Apply one of ``TEXTURE_PRESETS``, e.g. 'fast' while iterating or 'webp' for production."""
+        self.TEXTURE_FORMAT, self.TEXTURE_COMPRESSION, self.TEXTURE_QUALITY = TEXTURE_PRESETS[name]
+
+    def create_ground_tile(self, stage, zoom, xtile, ytile, texture_path, center_lon, center_lat):
+        """Create one ground quad spanning the exact bounds of a map tile."""
+        tile_path = f'/World/Ground/tile_{zoom}_{xtile}_{ytile}'
+        min_lon, min_lat, max_lon, max_lat = tile_bounds(zoom, xtile, ytile)
+        west, east = (min_lon - center_lon) * self.SCALE, (max_lon - center_lon) * self.SCALE
+        south, north = (min_lat - center_lat) * self.SCALE, (max_lat - center_lat) * self.SCALE
+        
+        # Clockwise in (x, z) so the quad faces up; the top image row lies north
+        points = np.array([[west, -0.1, south], [west, -0.1, north], [east, -0.1, north], [east, -0.1, south]])
+        tile = author_mesh(stage, tile_path, points, [4], [0, 1, 2, 3],
+                           extent=points[[0, 2]], normals=UP_NORMAL,
+                           normals_interpolation=UsdGeom.Tokens.constant)
+        UsdGeom.PrimvarsAPI(tile).CreatePrimvar(
+            'st', Sdf.ValueTypeNames.TexCoord2fArray, UsdGeom.Tokens.vertex).Set([(0, 0), (0, 1), (1, 1), (1, 0)])
+        
+        material = self.define_texture_material(stage, f'{tile_path}/material',
+                                                self.texture_asset_path(stage, texture_path), opacity=1.0)
+        UsdShade.MaterialBindingAPI(tile).Bind(material)
+
+    def surface_triangles(self, coords, triangles=None):
+        """Return upward-facing triangle indices for a flat polygon."""
+        if triangles is None:
+            triangles = self.triangulation_cache.triangulate(np.asarray(coords, dtype=np.float64))
+        # Triangles are counter-clockwise in lon/lat, which faces down in XZ
+        return triangles[:, ::-1]
+
+    def flat_points(self, coords, height):
+        """Lift (x, z) coordinates onto a plane at ``height``."""
+        coords = np.asarray(coords, dtype=np.float64).reshape(-1, 2)
+        points = np.empty((len(coords), 3))
+        points[:, 0] = coords[:, 0]
+        points[:, 1] = height
+        points[:, 2] = coords[:, 1]
+        return points
+
+    def flat_extent(self, bounds, height):
+        """Turn a 2D ``(mins, maxs)`` box in (x, z) into a 3D extent at ``height``."""
+        return self.flat_points(bounds, height)
+
+    def create_water_feature(self, stage, index, coords, tags, triangles=None, bounds=None):
+        """Create a water feature mesh using transformed coordinates.
+
+        ``bounds`` is the precomputed 2D ``(mins, maxs)`` box of ``coords``.
+        """
+        water_path = f'/World/Water/water_{index}'
         
-        # Create face indices for a single polygon
-        face_indices = list(range(len(points)))
-        vertex_counts = [len(points)]  # One face with all vertices
+        # Create points for water surface (slightly below ground)
+        points = self.flat_points(coords, -0.05)
+        if bounds is None:
+            bounds = (points[:, [0, 2]].min(axis=0), points[:, [0, 2]].max(axis=0))
         
-        water.CreatePointsAttr(points)
-        water.CreateFaceVertexIndicesAttr(face_indices)
-        water.CreateFaceVertexCountsAttr(vertex_counts)
+        # Triangulate the outline once instead of leaving it to the renderer
+        triangles = self.surface_triangles(coords, triangles)
+        water = author_mesh(stage, water_path, points, np.full(len(triangles), 3), triangles,
+                            extent=self.flat_extent(bounds, -0.05), normals=UP_NORMAL,
+                            normals_interpolation=UsdGeom.Tokens.constant)
         
         # Create blue material for water
         material = UsdShade.Material.Define(stage, f'{water_path}/material')
         shader = UsdShade.Shader.Define(stage, f'{water_path}/material/PBRShader')
         shader.CreateIdAttr('UsdPreviewSurface')
-        shader.CreateInput('diffuseColor', Sdf.ValueTypeNames.Color3f).Set((0.1, 0.3, 0.8))  # Brighter blue
+        shader.CreateInput('diffuseColor', Sdf.ValueTypeNames.Color3f).Set(self.MATERIAL_COLORS['water'])
         shader.CreateInput('opacity', Sdf.ValueTypeNames.Float).Set(0.9)  # More opaque
         shader.CreateInput('metallic', Sdf.ValueTypeNames.Float).Set(0.1)
         shader.CreateInput('roughness', Sdf.ValueTypeNames.Float).Set(0.2)  # Make it shiny
         UsdShade.MaterialBindingAPI(water).Bind(material)
 
-    def create_land_feature(self, stage, coords, tags):
-        """Create a land feature mesh using transformed coordinates."""
-        land_path = f'/World/Land/land_{len(self.land_features)}'
-        land = UsdGeom.Mesh.Define(stage, land_path)
+    def create_land_feature(self, stage, index, coords, tags, triangles=None, bounds=None):
+        """Create a land feature mesh using transformed coordinates.
+
+        ``bounds`` is the precomputed 2D ``(mins, maxs)`` box of ``coords``.
+        """
+        land_path = f'/World/Land/land_{index}'
         
         # Create points slightly above ground
-        points = []
-        for x, z in coords:
-            points.append(Gf.Vec3f(x, 0.02, z))
-        
-        # Create face indices for a single polygon
-        face_indices = list(range(len(points)))
-        vertex_counts = [len(points)]
+        points = self.flat_points(coords, 0.02)
+        if bounds is None:
+            bounds = (points[:, [0, 2]].min(axis=0), points[:, [0, 2]].max(axis=0))
         
-        land.CreatePointsAttr(points)
-        land.CreateFaceVertexIndicesAttr(face_indices)
-        land.CreateFaceVertexCountsAttr(vertex_counts)
+        # Triangulate the outline once instead of leaving it to the renderer
+        triangles = self.surface_triangles(coords, triangles)
+        land = author_mesh(stage, land_path, points, np.full(len(triangles), 3), triangles,
+                           extent=self.flat_extent(bounds, 0.02), normals=UP_NORMAL,
+                           normals_interpolation=UsdGeom.Tokens.constant)
         
         # Create material based on land type
         material = UsdShade.Material.Define(stage, f'{land_path}/material')
@@ -268,16 +597,8 @@ class JsonHandler:
         shader.CreateIdAttr('UsdPreviewSurface')
         
         # Different colors for different land types
-        land_colors = {
-            'forest': (0.2, 0.5, 0.2),  # Dark green
-            'grass': (0.3, 0.6, 0.3),   # Medium green
-            'park': (0.4, 0.7, 0.4),    # Light green
-            'beach': (0.9, 0.9, 0.7),   # Sand color
-            'recreation_ground': (0.5, 0.7, 0.5)  # Pale green
-        }
-        
         land_type = next((v for k, v in tags.items() if k in ['natural', 'landuse', 'leisure']), 'grass')
-        color = land_colors.get(land_type, (0.4, 0.6, 0.4))  # Default green
+        color = self.LAND_COLORS.get(land_type, self.MATERIAL_COLORS['land'])
         
         shader.CreateInput('diffuseColor', Sdf.ValueTypeNames.Color3f).Set(color)
         shader.CreateInput('roughness', Sdf.ValueTypeNames.Float).Set(0.8)
@@ -335,7 +656,7 @@ class JsonHandler:
         road_type = road['tags'].get('highway', 'unknown')
         amenity = road['tags'].get('amenity', '')
         
-        # Different widths for different road types
+        # Full carriageway width in meters for each road type
         road_widths = {
             'motorway': 8,
             'trunk': 7,
@@ -359,52 +680,127 @@ class JsonHandler:
         width = road_widths.get(road_type, 3)
         self.roads.append((road['nodes'], road['tags'], width))
 
-    def create_road(self, stage, coords, width, tags):
-        """Create a road mesh using transformed coordinates."""
-        road_path = f'/World/Roads/road_{len(self.roads)}'
-        road = UsdGeom.Mesh.Define(stage, road_path)
-        
-        height = 0.02 if tags.get('amenity') == 'parking_space' else 0.01
-        
-        # Create points using transformed coordinates
-        points = []
-        for x, z in coords:
-            points.append(Gf.Vec3f(x, height, z))
-        
-        # Create road surface with width
-        road_points = []
-        road_indices = []
-        vertex_counts = []
-        
-        # Create road segments
-        for i in range(len(points) - 1):
-            p1 = points[i]
-            p2 = points[i + 1]
+    def road_class(self, tags: dict) -> str:
+        """Return the road class used for widths, colors and merged meshes."""
+        if tags.get('amenity') == 'parking_space':
+            return 'parking_space'
+        return tags.get('highway', 'unknown')
+
+    def create_roads(self, stage, center_lon, center_lat, merge_by_class=False, tolerance=0.0):
+        """Create road meshes for all roads in one batched ribbon pass."""
+        UsdGeom.Scope.Define(stage, '/World/Roads')
+        if not self.roads:
+            return 0
+        
+        coords, offsets = pack_polylines([coords for coords, _, _ in self.roads])
+        coords, offsets = self.simplify_lonlat(coords, offsets, tolerance)
+        local = (coords - (center_lon, center_lat)) * self.SCALE
+        widths = np.array([width for _, _, width in self.roads], dtype=np.float64)
+        
+        ribbons = build_ribbons(local, offsets, self.ribbon_half_widths(widths), join=self.ROAD_JOIN,
+                                miter_limit=self.ROAD_MITER_LIMIT)
+        
+        # Bounds of every ribbon in one segmented min/max pass
+        bounds = ribbons.extents()
+        
+        if merge_by_class:
+            classes = defaultdict(list)
+            for i, (_, tags, _) in enumerate(self.roads):
+                classes[self.road_class(tags)].append(i)
+            for road_class, items in classes.items():
+                road_path = f'/World/Roads/{Tf.MakeValidIdentifier(road_class)}'
+                merged = (np.nanmin(bounds[items, 0], axis=0), np.nanmax(bounds[items, 1], axis=0))
+                self.create_road(stage, road_path, ribbons.merge(items), {'highway': road_class}, merged)
+        else:
+            instanced = self.create_road_instances(stage, local, offsets)
+            for i, ((_, tags, _), mesh) in enumerate(zip(self.roads, ribbons.meshes())):
+                if not instanced[i]:
+                    self.create_road(stage, f'/World/Roads/road_{i}', mesh, tags, bounds[i])
+        return len(coords)
+
+    def create_road_instances(self, stage, local, offsets):
+        """Instance repeated parking spaces; returns a mask of the roads handled."""
+        instanced = np.zeros(len(self.roads), dtype=bool)
+        items = [i for i, (_, tags, _) in enumerate(self.roads)
+                 if self.road_class(tags) == 'parking_space']
+        if not self.INSTANCE_REPEATS or len(items) < self.INSTANCE_MIN_COPIES:
+            return instanced
+        
+        sub_coords, sub_offsets = pack_polylines([local[offsets[i]:offsets[i + 1]] for i in items])
+        extra_keys = [(self.roads[i][2], self.roads[i][1].get('surface')) for i in items]
+        shapes = canonicalize(sub_coords, sub_offsets, self.instance_quantum(), extra_keys)
+        
+        for key, members in self.repeated_shapes(shapes).items():
+            first = items[members[0]]
+            proto_path = f'/World/Roads/Prototypes/shape_{key[:12]}'
+            self.define_prototype(stage, proto_path)
             
-            # Calculate perpendicular vector for width
-            dx = p2[0] - p1[0]
-            dz = p2[2] - p1[2]
-            length = (dx * dx + dz * dz) ** 0.5
-            if length > 0:
-                nx = -dz * width / length
-                nz = dx * width / length
-                
-                # Create four corners of road segment
-                road_points.extend([
-                    Gf.Vec3f(p1[0] - nx, height, p1[2] - nz),
-                    Gf.Vec3f(p1[0] + nx, height, p1[2] + nz),
-                    Gf.Vec3f(p2[0] + nx, height, p2[2] + nz),
-                    Gf.Vec3f(p2[0] - nx, height, p2[2] - nz)
-                ])
-                
-                # Create face indices
-                base = i * 4
-                road_indices.extend([base, base + 1, base + 2, base + 3])
-                vertex_counts.append(4)
+            # Canonical rings are open; close them again so the ribbon loops
+            outline = shapes.coords[shapes.offsets[members[0]]:shapes.offsets[members[0] + 1]]
+            outline = np.vstack([outline, outline[:1]])
+            half_width = self.ribbon_half_widths(self.roads[first][2])
+            ribbon = build_ribbons(outline, np.array([0, len(outline)]), half_width,
+                                   join=self.ROAD_JOIN, miter_limit=self.ROAD_MITER_LIMIT)
+            self.create_road(stage, f'{proto_path}/geom', ribbon.mesh(0), self.roads[first][1])
+            
+            for member in members:
+                self.create_instance(stage, f'/World/Roads/road_{items[member]}', proto_path,
+                                     shapes.translations[member], shapes.angles[member])
+                instanced[items[member]] = True
+        return instanced
+
+    def ribbon_half_widths(self, widths):
+        """Convert full road widths in meters to the ribbon half widths in local units."""
+        return np.asarray(widths, dtype=np.float64) / 2 * self.SCALE / METERS_PER_DEGREE_LAT
+
+    def instance_quantum(self):
+        """Return INSTANCE_TOLERANCE converted from meters to local units."""
+        return self.INSTANCE_TOLERANCE * self.SCALE / METERS_PER_DEGREE_LON
+
+    def repeated_shapes(self, shapes):
+        """Group canonical shapes by key, keeping groups with enough copies to instance."""
+        groups = defaultdict(list)
+        for i, key in enumerate(shapes.keys):
+            groups[key].append(i)
+        return {key: members for key, members in groups.items()
+                if len(members) >= self.INSTANCE_MIN_COPIES}
+
+    def define_prototype(self, stage, proto_path):
+        """Define a prototype Xform under an abstract (class) Prototypes prim."""
+        parent = proto_path.rsplit('/', 1)[0]
+        if not stage.GetPrimAtPath(parent):
+            stage.CreateClassPrim(parent)
+        return UsdGeom.Xform.Define(stage, proto_path)
+
+    def create_instance(self, stage, path, proto_path, translation, angle):
+        """Place an instanceable reference to a prototype in the XZ plane."""
+        instance = UsdGeom.Xform.Define(stage, path)
+        prim = instance.GetPrim()
+        prim.GetReferences().AddInternalReference(proto_path)
+        prim.SetInstanceable(True)
+        instance.AddTranslateOp().Set(Gf.Vec3d(translation[0], 0, translation[1]))
+        # A counter-clockwise turn in (x, z) is a negative rotation about Y
+        instance.AddRotateYOp().Set(-math.degrees(angle))
+        return instance
+
+    def create_road(self, stage, road_path, mesh, tags, bounds=None):
+        """Create a road mesh from a ribbon ``(points, counts, indices)`` triple.
+
+        ``bounds`` is the precomputed 2D ``(mins, maxs)`` box of the ribbon.
+        """
+        points_2d, vertex_counts, road_indices = mesh
+        if not len(vertex_counts):
+            return
+        
+        height = 0.02 if self.road_class(tags) == 'parking_space' else 0.01
         
-        road.CreatePointsAttr(road_points)
-        road.CreateFaceVertexIndicesAttr(road_indices)
-        road.CreateFaceVertexCountsAttr(vertex_counts)
+        # Lift the 2D ribbon onto the XZ plane
+        points = self.flat_points(points_2d, height)
+        if bounds is None:
+            bounds = (points_2d.min(axis=0), points_2d.max(axis=0))
+        road = author_mesh(stage, road_path, points, vertex_counts, road_indices,
+                           extent=self.flat_extent(bounds, height), normals=UP_NORMAL,
+                           normals_interpolation=UsdGeom.Tokens.constant)
         
         # Create material for road
         material = UsdShade.Material.Define(stage, f'{road_path}/material')
@@ -412,24 +808,7 @@ class JsonHandler:
         shader.CreateIdAttr('UsdPreviewSurface')
         
         # Different colors for different road types
-        road_type = tags.get('highway', 'unknown')
-        amenity = tags.get('amenity', '')
-        road_colors = {
-            'motorway': (0.3, 0.3, 0.3),  # Dark gray
-            'trunk': (0.35, 0.35, 0.35),
-            'primary': (0.4, 0.4, 0.4),
-            'secondary': (0.45, 0.45, 0.45),
-            'residential': (0.5, 0.5, 0.5),  # Light gray
-            'footway': (0.6, 0.6, 0.5),  # Tan
-            'path': (0.7, 0.7, 0.6),  # Light tan
-            'parking_space': (0.4, 0.4, 0.5),  # Bluish gray for parking
-        }
-        
-        # Use parking space color if it's a parking amenity
-        if amenity == 'parking_space':
-            color = road_colors['parking_space']
-        else:
-            color = road_colors.get(road_type, (0.5, 0.5, 0.5))
+        color = self.ROAD_COLORS.get(self.road_class(tags), self.MATERIAL_COLORS['road'])
         
         shader.CreateInput('diffuseColor', Sdf.ValueTypeNames.Color3f).Set(color)
         shader.CreateInput('roughness', Sdf.ValueTypeNames.Float).Set(0.8)
@@ -441,57 +820,27 @@ class JsonHandler:
         
         UsdShade.MaterialBindingAPI(road).Bind(material)
 
-    def create_building(self, stage, way_id, coords, tags):
-        """Create a building mesh using transformed coordinates."""
+    def create_building(self, stage, way_id, mesh, normals=None, extent=None):
+        """Create a building from an extruded ``(points, counts, indices)`` mesh."""
         building_path = f'/World/Buildings/building_{way_id}'
-        building = UsdGeom.Mesh.Define(stage, building_path)
-        
-        # Get building height
-        height = self.get_height(tags)
-        
-        # Create vertices with transformed coordinates
-        points = []
-        for x, z in coords:
-            points.extend([
-                Gf.Vec3f(x, 0, z),                        # bottom vertex
-                Gf.Vec3f(x, height * self.HEIGHT_SCALE, z)  # top vertex
-            ])
-        
-        # Create face indices
-        num_vertices = len(coords)
-        face_indices = []
-        vertex_counts = []
-        
-        # Bottom face
-        bottom_face = list(range(0, num_vertices * 2, 2))
-        face_indices.extend(bottom_face)
-        vertex_counts.append(len(bottom_face))
-        
-        # Top face
-        top_face = list(range(1, num_vertices * 2, 2))
-        face_indices.extend(top_face)
-        vertex_counts.append(len(top_face))
-        
-        # Side faces
-        for i in range(num_vertices):
-            next_i = (i + 1) % num_vertices
-            face_indices.extend([
-                i * 2, i * 2 + 1, next_i * 2 + 1, next_i * 2
-            ])
-            vertex_counts.append(4)
-        
-        # Set mesh attributes
-        building.CreatePointsAttr(points)
-        building.CreateFaceVertexIndicesAttr(face_indices)
-        building.CreateFaceVertexCountsAttr(vertex_counts)
-        
-        # Add metadata from tags using proper USD API
-        primvars_api = UsdGeom.PrimvarsAPI(building)
-        for key, value in tags.items():
-            safe_key = key.replace(":", "_")  # Replace invalid characters
-            primvar = primvars_api.CreatePrimvar(f'customData_{safe_key}', 
-                                               Sdf.ValueTypeNames.String)
-            primvar.Set(str(value))
+        building = self.define_building_mesh(stage, building_path, mesh, normals, extent)
+        
+        # Tags live in the columnar table on /World/Buildings; keep only the join key
+        building.GetPrim().CreateAttribute('osm:id', Sdf.ValueTypeNames.Int64).Set(way_id)
+
+    def extrude_buildings(self, local, offsets, heights, triangles):
+        """Extrude local footprints to ``heights`` meters and derive bounds and flat normals in bulk.
+
+        Returns the ``MeshBatch`` with its per-mesh extents and per-face normals.
+        """
+        batch = extrude_footprints(local, offsets, np.asarray(heights, dtype=np.float64) * self.HEIGHT_SCALE,
+                                   triangles)
+        return batch, batch.extents(), batch.face_normals()
+
+    def define_building_mesh(self, stage, building_path, mesh, normals=None, extent=None):
+        """Define an extruded footprint mesh with its material."""
+        points, counts, indices = mesh
+        building = author_mesh(stage, building_path, points, counts, indices, extent, normals)
         
         # Create a simple material
         material = UsdShade.Material.Define(stage, f'{building_path}/material')
@@ -499,15 +848,318 @@ class JsonHandler:
         shader.CreateIdAttr('UsdPreviewSurface')
         
         # Set material properties
-        shader.CreateInput('diffuseColor', Sdf.ValueTypeNames.Color3f).Set((0.8, 0.8, 0.8))
+        shader.CreateInput('diffuseColor', Sdf.ValueTypeNames.Color3f).Set(self.MATERIAL_COLORS['building'])
         shader.CreateInput('roughness', Sdf.ValueTypeNames.Float).Set(0.4)
         shader.CreateInput('metallic', Sdf.ValueTypeNames.Float).Set(0.0)
         
         # Bind material to mesh
         UsdShade.MaterialBindingAPI(building).Bind(material)
+        return building
+
+    def building_footprints(self):
+        """Return way ids, tags and lon/lat footprints of all buildings in CSR layout."""
+        way_ids, tags_list, footprints = [], [], []
+        for way_id, tags, nodes in self.ways:
+            coords = [self.nodes[node_id] for node_id in nodes if node_id in self.nodes]
+            if coords:
+                way_ids.append(way_id)
+                tags_list.append(tags)
+                footprints.append(coords)
+        coords, offsets = pack_polylines(footprints)
+        return way_ids, tags_list, coords, offsets
+
+    def simplify_lonlat(self, coords, offsets, tolerance):
+        """Simplify lon/lat polylines with a tolerance given in meters."""
+        if tolerance <= 0 or not len(coords):
+            return coords, offsets
+        # Local equirectangular projection to meters around the data
+        meters = np.empty_like(coords)
+        meters[:, 0] = coords[:, 0] * METERS_PER_DEGREE_LON * math.cos(math.radians(float(np.mean(coords[:, 1]))))
+        meters[:, 1] = coords[:, 1] * METERS_PER_DEGREE_LAT
+        return compress(coords, offsets, simplify_mask(meters, offsets, tolerance))
+
+    def create_buildings(self, stage, center_lon, center_lat, tolerance=0.0):
+        """Create all building meshes, simplified to ``tolerance`` meters."""
+        UsdGeom.Scope.Define(stage, '/World/Buildings')
+        way_ids, tags_list, coords, offsets = self.building_footprints()
+        coords, offsets = self.simplify_lonlat(coords, offsets, tolerance)
+        instanced = self.create_building_instances(stage, way_ids, tags_list, coords, offsets,
+                                                   center_lon, center_lat)
+        vertices = len(coords)
+        
+        # Extrude the remaining footprints as one batch
+        coords, offsets = compress(coords, offsets, ~instanced[item_ids(offsets)])
+        # Triangulate in lon/lat so cached results survive center changes
+        triangles = triangulate_polygons(coords, offsets, self.triangulation_cache)
+        local = (coords - (center_lon, center_lat)) * self.SCALE
+        heights = [self.get_height(tags) for tags in tags_list]
+        batch, extents, normals = self.extrude_buildings(local, offsets, heights, triangles)
+        
+        for i, mesh in enumerate(batch.meshes()):
+            if not instanced[i]:
+                face_range = slice(batch.face_offsets[i], batch.face_offsets[i + 1])
+                self.create_building(stage, way_ids[i], mesh, normals[face_range], extents[i])
+        return vertices
+
+    def create_building_instances(self, stage, way_ids, tags_list, coords, offsets, center_lon, center_lat):
+        """Instance buildings whose footprint and height repeat; returns a mask of those handled."""
+        instanced = np.zeros(len(way_ids), dtype=bool)
+        if not self.INSTANCE_REPEATS or len(way_ids) < self.INSTANCE_MIN_COPIES:
+            return instanced
+        
+        local = (coords - (center_lon, center_lat)) * self.SCALE
+        heights = [self.get_height(tags) for tags in tags_list]
+        shapes = canonicalize(local, offsets, self.instance_quantum(), heights)
+        
+        for key, members in self.repeated_shapes(shapes).items():
+            first = members[0]
+            proto_path = f'/World/Buildings/Prototypes/shape_{key[:12]}'
+            self.define_prototype(stage, proto_path)
+            footprint = shapes.coords[shapes.offsets[first]:shapes.offsets[first + 1]]
+            footprint_offsets = np.array([0, len(footprint)])
+            triangles = triangulate_polygons(footprint, footprint_offsets, self.triangulation_cache)
+            batch, extents, normals = self.extrude_buildings(footprint, footprint_offsets, heights[first:first + 1],
+                                                             triangles)
+            self.define_building_mesh(stage, f'{proto_path}/geom', next(batch.meshes()), normals, extents[0])
+            
+            for i in members:
+                instance = self.create_instance(stage, f'/World/Buildings/building_{way_ids[i]}', proto_path,
+                                                shapes.translations[i], shapes.angles[i])
+                instance.GetPrim().CreateAttribute('osm:id', Sdf.ValueTypeNames.Int64).Set(way_ids[i])
+                instanced[i] = True
+        return instanced
+
+    def create_building_table(self, stage):
+        """Author the tags of all buildings as one columnar table on /World/Buildings."""
+        table = FeatureTable()
+        for way_id, tags, _ in self.ways:
+            table.add(way_id, tags)
+        table.author(UsdGeom.Scope.Define(stage, '/World/Buildings').GetPrim())
+
+    def point_prototype(self, tags: dict):
+        """Return ``(instancer, prototype)`` for a tagged node, or None if it is not a point feature."""
+        for key, value in tags.items():
+            match = self.POINT_CLASSES.get((key, value))
+            if match:
+                if match[1] == 'tree' and tags.get('leaf_type') == 'needleleaved':
+                    return match[0], 'conifer'
+                return match
+        return None
+
+    def classify_points(self):
+        """Classify all tagged nodes inside the area of interest in one pass.
+
+        Returns ``{instancer: (rows, prototypes)}`` where ``rows`` index
+        ``point_features`` and ``prototypes`` name each row's prototype.
+        """
+        if not self.point_features:
+            return {}
+        coords = np.array([self.nodes.get(node_id, (np.nan, np.nan)) for node_id, _ in self.point_features])
+        inside = ((coords[:, 0] >= self.min_lon) & (coords[:, 0] <= self.max_lon) &
+                  (coords[:, 1] >= self.min_lat) & (coords[:, 1] <= self.max_lat))
+        
+        classes = defaultdict(lambda: ([], []))
+        for row in np.flatnonzero(inside):
+            match = self.point_prototype(self.point_features[row][1])
+            if match:
+                rows, prototypes = classes[match[0]]
+                rows.append(row)
+                prototypes.append(match[1])
+        return {name: (np.array(rows), prototypes) for name, (rows, prototypes) in sorted(classes.items())}
+
+    def parse_number(self, value):
+        """Parse a numeric tag value such as '12' or '12 m', or return NaN."""
+        try:
+            return float(str(value).replace('m', '').strip())
+        except ValueError:
+            return math.nan
+
+    def point_transforms(self, rows, prototypes, instancer):
+        """Return per-instance yaw angles (radians) and (N, 3) scales for point features."""
+        tags = [self.point_features[row][1] for row in rows]
+        ids = np.array([self.point_features[row][0] for row in rows], dtype=np.int64)
+        defaults = np.array([self.POINT_PROTOTYPES[name][1] for name in prototypes])
+        radii = np.array([self.POINT_PROTOTYPES[name][2] for name in prototypes])
+        
+        # Scale prototypes to the tagged height and crown diameter when present
+        heights = np.array([self.parse_number(t.get('height', 'nan')) for t in tags])
+        crowns = np.array([self.parse_number(t.get('diameter_crown', 'nan')) for t in tags])
+        vertical = np.where(np.isfinite(heights) & (heights > 0), heights / defaults, 1.0)
+        horizontal = np.where(np.isfinite(crowns) & (crowns > 0), crowns / (2 * radii), vertical)
+        scales = np.stack([horizontal, vertical, horizontal], axis=1)
+        
+        # Compass directions are clockwise from north (+Z), i.e. positive turns about +Y
+        directions = np.array([self.parse_number(t.get('direction', 'nan')) for t in tags])
+        angles = np.where(np.isfinite(directions), np.radians(directions), 0.0)
+        if instancer == 'trees':
+            # Deterministic yaw for untagged trees so rows of them don't look stamped
+            yaws = (ids * 0.6180339887498949 % 1.0) * 2 * math.pi
+            angles = np.where(np.isfinite(directions), angles, yaws)
+        return angles, scales
 
-    def export_to_usd(self, output_path: str):
-        """Export the data to USD format."""
+    def define_point_prototype(self, stage, proto_path, name):
+        """Define a simple gprim prototype standing on the ground at its origin."""
+        shape, height, radius, color = self.POINT_PROTOTYPES[name]
+        height *= self.HEIGHT_SCALE
+        radius *= self.SCALE / METERS_PER_DEGREE_LON
+        UsdGeom.Xform.Define(stage, proto_path)
+        
+        parts = []  # (gprim, translate y, scale, color)
+        if shape in ('tree', 'conifer'):
+            trunk_height = height * 0.4
+            trunk = UsdGeom.Cylinder.Define(stage, f'{proto_path}/trunk')
+            trunk.CreateRadiusAttr(radius * 0.15)
+            trunk.CreateHeightAttr(trunk_height)
+            parts.append((trunk, trunk_height / 2, None, (0.4, 0.3, 0.2)))
+            if shape == 'tree':
+                crown = UsdGeom.Sphere.Define(stage, f'{proto_path}/crown')
+                crown.CreateRadiusAttr(1.0)
+                crown_height = height - trunk_height
+                parts.append((crown, trunk_height + crown_height / 2,
+                              Gf.Vec3f(radius, crown_height / 2, radius), color))
+            else:
+                crown = UsdGeom.Cone.Define(stage, f'{proto_path}/crown')
+                crown.CreateRadiusAttr(radius)
+                crown.CreateHeightAttr(height - trunk_height * 0.5)
+                parts.append((crown, trunk_height * 0.5 + (height - trunk_height * 0.5) / 2, None, color))
+        elif shape == 'box':
+            box = UsdGeom.Cube.Define(stage, f'{proto_path}/geom')
+            box.CreateSizeAttr(1.0)
+            parts.append((box, height / 2, Gf.Vec3f(radius * 2, height, radius), color))
+        else:
+            gprim = (UsdGeom.Cone if shape == 'cone' else UsdGeom.Cylinder).Define(stage, f'{proto_path}/geom')
+            gprim.CreateRadiusAttr(radius)
+            gprim.CreateHeightAttr(height)
+            parts.append((gprim, height / 2, None, color))
+        
+        for gprim, offset, scale, part_color in parts:
+            if isinstance(gprim, (UsdGeom.Cylinder, UsdGeom.Cone)):
+                gprim.CreateAxisAttr(UsdGeom.Tokens.y)
+            gprim.AddTranslateOp().Set(Gf.Vec3d(0, offset, 0))
+            if scale is not None:
+                gprim.AddScaleOp().Set(scale)
+            gprim.CreateDisplayColorAttr([Gf.Vec3f(*part_color)])
+            gprim.CreateExtentAttr(UsdGeom.Boundable.ComputeExtentFromPlugins(gprim, Usd.TimeCode.Default()))
+        return proto_path
+
+    def create_point_features(self, stage, center_lon, center_lat):
+        """Author one PointInstancer per point feature class; returns the number of instances."""
+        UsdGeom.Scope.Define(stage, '/World/PointFeatures')
+        count = 0
+        for instancer, (rows, prototypes) in self.classify_points().items():
+            instancer_path = f'/World/PointFeatures/{instancer}'
+            names = sorted(set(prototypes))
+            UsdGeom.Scope.Define(stage, f'{instancer_path}/Prototypes')
+            proto_paths = [self.define_point_prototype(stage, f'{instancer_path}/Prototypes/{name}', name)
+                           for name in names]
+            
+            ids = np.array([self.point_features[row][0] for row in rows], dtype=np.int64)
+            lonlat = np.array([self.nodes[node_id] for node_id in ids])
+            positions = np.zeros((len(rows), 3))
+            positions[:, 0] = (lonlat[:, 0] - center_lon) * self.SCALE
+            positions[:, 2] = (lonlat[:, 1] - center_lat) * self.SCALE
+            angles, scales = self.point_transforms(rows, prototypes, instancer)
+            
+            point_instancer = author_point_instancer(
+                stage, instancer_path, proto_paths, positions,
+                np.searchsorted(names, prototypes), orientations=angles, scales=scales, ids=ids)
+            
+            # Tags share the columnar layout of the building table, joined on the instance ids
+            table = FeatureTable()
+            for row in rows:
+                table.add(*self.point_features[row])
+            table.author(point_instancer.GetPrim())
+            count += len(rows)
+        print(f"Created {count} point feature instances")
+        return count
+
+    def create_lod_geometry(self, stage, name, tolerance, center_lon, center_lat,
+                            categories=('buildings', 'roads')):
+        """Create buildings and/or roads for one level of detail and record its vertex count."""
+        print(f"Creating {' and '.join(categories)} for {name} (tolerance {tolerance} m)...")
+        vertices = 0
+        if 'buildings' in categories:
+            vertices += self.create_buildings(stage, center_lon, center_lat, tolerance)
+        if 'roads' in categories:
+            vertices += self.create_roads(stage, center_lon, center_lat,
+                                          merge_by_class=self.MERGE_ROADS, tolerance=tolerance)
+        self.lod_report[name] = vertices
+
+    def report_lod(self, stage):
+        """Print and store the vertex reduction achieved by each level of detail."""
+        full = max(self.lod_report.values()) or 1
+        report = {}
+        for name, vertices in self.lod_report.items():
+            reduction = 100.0 * (1 - vertices / full)
+            print(f"{name}: {vertices} source vertices ({reduction:.1f}% reduction)")
+            report[name] = {'vertices': vertices, 'reduction': round(reduction, 2)}
+        layer = stage.GetRootLayer()
+        data = dict(layer.customLayerData)
+        data['lod'] = report
+        layer.customLayerData = data
+
+    def compute_center(self):
+        """Return the mean (lon, lat) of all collected coordinates."""
+        center_lon = sum(c[0] for c in self.all_coords) / len(self.all_coords)
+        center_lat = sum(c[1] for c in self.all_coords) / len(self.all_coords)
+        return center_lon, center_lat
+
+    def create_area_features(self, stage, features, create, center_lon, center_lat):
+        """Author flat land or water polygons with ``create``, triangulated through the cache."""
+        coords, offsets = pack_polylines([coords for coords, _ in features])
+        local = (coords - (center_lon, center_lat)) * self.SCALE
+        mins, maxs = segment_bounds(local, offsets)
+        for i, (_, tags) in enumerate(features):
+            footprint = coords[offsets[i]:offsets[i + 1]]
+            triangles = self.triangulation_cache.triangulate(footprint)
+            create(stage, i, local[offsets[i]:offsets[i + 1]], tags, triangles, (mins[i], maxs[i]))
+
+    @instrument.timed('features')
+    def author_features(self, stage, root, center_lon, center_lat, categories=None):
+        """Author the given feature categories (default: all) below ``root``."""
+        categories = self.EXPORT_CATEGORIES if categories is None else categories
+        
+        if 'land' in categories:
+            UsdGeom.Scope.Define(stage, '/World/Land')
+            self.create_area_features(stage, self.land_features, self.create_land_feature, center_lon, center_lat)
+        
+        if 'water' in categories:
+            UsdGeom.Scope.Define(stage, '/World/Water')
+            self.create_area_features(stage, self.water_features, self.create_water_feature,
+                                      center_lon, center_lat)
+        
+        if 'buildings' in categories:
+            self.create_building_table(stage)
+        
+        if 'points' in categories:
+            self.create_point_features(stage, center_lon, center_lat)
+        
+        lod_categories = [c for c in categories if c in ('buildings', 'roads')]
+        if not lod_categories:
+            return
+        
+        # Buildings and roads are authored once per level of detail
+        if len(self.LOD_TOLERANCES) > 1:
+            lod_set = root.GetPrim().GetVariantSets().AddVariantSet('lod')
+            for name, tolerance in self.LOD_TOLERANCES.items():
+                lod_set.AddVariant(name)
+                lod_set.SetVariantSelection(name)
+                with lod_set.GetVariantEditContext():
+                    self.create_lod_geometry(stage, name, tolerance, center_lon, center_lat, lod_categories)
+            lod_set.SetVariantSelection(next(iter(self.LOD_TOLERANCES)))
+            self.report_lod(stage)
+        else:
+            name, tolerance = next(iter(self.LOD_TOLERANCES.items()))
+            self.create_lod_geometry(stage, name, tolerance, center_lon, center_lat, lod_categories)
+
+    @instrument.timed('export_usd')
+    def export_to_usd(self, output_path: str, fmt: str = None):
+        """Export the data to USD format.
+
+        ``fmt`` ('usdc' or 'usda') sets the extension of ``output_path``; ``None``
+        keeps it (usdc when there is none).
+        """
+        output_path = format_path(output_path, fmt)
         stage = Usd.Stage.CreateNew(output_path)
         UsdGeom.SetStageMetersPerUnit(stage, 1.0)
         
@@ -516,8 +1168,7 @@ class JsonHandler:
             print("No coordinates found")
             return
         
-        center_lon = sum(c[0] for c in self.all_coords) / len(self.all_coords)
-        center_lat = sum(c[1] for c in self.all_coords) / len(self.all_coords)
+        center_lon, center_lat = self.compute_center()
         
         print(f"Center coordinates: {center_lon}, {center_lat}")
         print(f"Total coordinates: {len(self.all_coords)}")
@@ -525,100 +1176,280 @@ class JsonHandler:
         
         # Create scopes for organization
         root = UsdGeom.Xform.Define(stage, '/World')
-        buildings = UsdGeom.Scope.Define(stage, '/World/Buildings')
-        water = UsdGeom.Scope.Define(stage, '/World/Water')
-        land = UsdGeom.Scope.Define(stage, '/World/Land')
         
         # Create ground plane first
         self.create_ground_plane(stage, center_lon, center_lat)
         
-        # Create buildings
-        print("Creating buildings...")
-        for way_id, tags, nodes in self.ways:
-            coords = []
-            for node_id in nodes:
-                if node_id in self.nodes:
-                    coords.append(self.nodes[node_id])
-            
-            if coords:
-                transformed_coords = self.transform_coordinates(coords, center_lon, center_lat)
-                self.create_building(stage, way_id, transformed_coords, tags)
+        self.author_features(stage, root, center_lon, center_lat)
         
-        # Create water features
-        for coords, tags in self.water_features:
-            transformed_coords = self.transform_coordinates(coords, center_lon, center_lat)
-            self.create_water_feature(stage, transformed_coords, tags)
-        
-        # Create roads
-        roads = UsdGeom.Scope.Define(stage, '/World/Roads')
-        for coords, tags, width in self.roads:
-            transformed_coords = self.transform_coordinates(coords, center_lon, center_lat)
-            self.create_road(stage, transformed_coords, width, tags)
-        
-        stage.Save()
+        save_stage(stage)
+        print(f"Triangulation cache: {self.triangulation_cache.hits} hits, "
+              f"{self.triangulation_cache.misses} misses")
         print(f"USD file saved to: {output_path}")
 
-    def process_osm_file(self, osm_path: str):
-        """Process OSM file using osmium."""
-        try:
-            handler = OsmHandler(self)
-            handler.apply_file(osm_path, locations=True)  # Enable locations
-        except Exception as e:
-            print(f"Error processing OSM file: {e}")
+    def feature_tiles(self):
+        """Assign every building, land and water feature, road and point feature to a quadtree tile.
 
-    def fetch_tiles(self, min_lat, max_lat, min_lon, max_lon, zoom=17):
-        """Fetch all tiles for the given coordinate range"""
-        # Calculate tile coordinates for bounds
-        min_xtile, max_ytile = deg2num(min_lat, min_lon, zoom)
-        max_xtile, min_ytile = deg2num(max_lat, max_lon, zoom)
-        
-        print(f"Tile coordinates: X({min_xtile}-{max_xtile}), Y({min_ytile}-{max_ytile})")
-        
-        # Calculate image dimensions
-        tile_size = 256
-        width = (max_xtile - min_xtile + 1) * tile_size
-        height = (max_ytile - min_ytile + 1) * tile_size
-        
-        # Create new image
-        result = Image.new('RGB', (width, height))
+        Features are placed by the tile of their first coordinate at
+        ``TILE_MAX_ZOOM`` (the ``deg2num`` scheme) and grouped by
+        ``partition_quadtree``. Returns ``{(z, x, y): groups}`` with one
+        feature list per handler attribute.
+        """
+        features = []  # (kind, feature, lon, lat)
+        for way in self.ways:
+            coords = [self.nodes[node_id] for node_id in way[2] if node_id in self.nodes]
+            if coords:
+                features.append(('ways', way, *coords[0]))
+        for name in ('land_features', 'water_features'):
+            for feature in getattr(self, name):
+                if feature[0]:
+                    features.append((name, feature, *feature[0][0]))
+        for road in self.roads:
+            if road[0]:
+                features.append(('roads', road, *road[0][0]))
+        for point in self.point_features:
+            if point[0] in self.nodes:
+                features.append(('point_features', point, *self.nodes[point[0]]))
+        
+        anchors = np.array([feature[2:] for feature in features], dtype=np.float64).reshape(-1, 2)
+        xtiles, ytiles = deg2num(anchors[:, 1], anchors[:, 0], self.TILE_MAX_ZOOM)
+        tiles = partition_quadtree(xtiles, ytiles, self.TILE_MAX_ZOOM,
+                                   self.TILE_MIN_ZOOM, self.MAX_FEATURES_PER_TILE)
+        
+        result = {}
+        for key in sorted(tiles):
+            groups = {'ways': [], 'land_features': [], 'water_features': [], 'roads': [], 'point_features': []}
+            for item in tiles[key]:
+                kind, feature = features[item][:2]
+                groups[kind].append(feature)
+            result[key] = groups
+        return result
+
+    def tile_handler(self, groups):
+        """Return a handler sharing this one's nodes and settings but only the given features."""
+        handler = copy.copy(self)
+        handler.ways = groups['ways']
+        handler.land_features = groups['land_features']
+        handler.water_features = groups['water_features']
+        handler.roads = groups['roads']
+        handler.point_features = groups['point_features']
+        handler.lod_report = {}
+        return handler
+
+    @instrument.timed('write_layer')
+    def write_layer(self, layer_path, groups, categories, center_lon, center_lat):
+        """Write one independent layer holding the given features and categories.
+
+        ``groups`` restricts the layer to a tile's features (see
+        ``feature_tiles``); ``None`` uses all features of this handler.
+        """
+        handler = self.tile_handler(groups) if groups is not None else self
+        stage = Usd.Stage.CreateNew(layer_path)
+        UsdGeom.SetStageMetersPerUnit(stage, 1.0)
+        root = UsdGeom.Xform.Define(stage, '/World')
+        stage.SetDefaultPrim(root.GetPrim())
+        handler.author_features(stage, root, center_lon, center_lat, categories)
+        save_stage(stage)
+        return layer_path
+
+    def write_layers(self, tasks, workers=1):
+        """Write ``write_layer`` tasks, in worker processes when ``workers`` > 1.
+
+        Workers are forked where the platform allows it, so they start from
+        this handler's node and feature tables without copying them. Every
+        layer depends only on its own task, so the output does not depend on
+        the number of workers.
+        """
+        if workers > 1 and len(tasks) > 1:
+            methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context('fork' if 'fork' in methods else None)
+            with ProcessPoolExecutor(max_workers=min(workers, len(tasks)), mp_context=context,
+                                     initializer=_init_layer_worker, initargs=(self,)) as pool:
+                return list(pool.map(_write_layer_task, tasks))
+        return [self.write_layer(*task) for task in tasks]
+
+    def create_root_stage(self, output_path, center_lon, center_lat):
+        """Create a root stage with the ground plane that composes other layers."""
+        stage = Usd.Stage.CreateNew(output_path)
+        UsdGeom.SetStageMetersPerUnit(stage, 1.0)
+        root = UsdGeom.Xform.Define(stage, '/World')
+        stage.SetDefaultPrim(root.GetPrim())
+        self.create_ground_plane(stage, center_lon, center_lat)
+        return stage
+
+    @instrument.timed('export_tiled_usd')
+    def export_tiled_usd(self, output_path: str, workers: int = 1, fmt: str = None):
+        """Export the data as a root stage with one payload per quadtree tile.
+
+        Tiles are written to ``tiles/<z>/<x>/<y>.<fmt>`` next to ``output_path``
+        and share the root stage's local frame. Open the root with
+        ``Usd.Stage.LoadNone`` and load tiles on demand to keep open time
+        independent of the covered area.
+        """
+        if not self.all_coords:
+            print("No coordinates found")
+            return
         
-        # Download and stitch tiles
-        for xtile in range(min_xtile, max_xtile + 1):
-            for ytile in range(min_ytile, max_ytile + 1):
-                url = f"https://tile.openstreetmap.org/{zoom}/{xtile}/{ytile}.png"
-                headers = {'User-Agent': 'OSM-to-USD-Converter/1.0'}
-                
-                try:
-                    response = requests.get(url, headers=headers)
-                    if response.status_code == 200:
-                        tile = Image.open(BytesIO(response.content))
-                        x = (xtile - min_xtile) * tile_size
-                        y = (ytile - min_ytile) * tile_size
-                        result.paste(tile, (x, y))
-                        print(f"Downloaded tile {xtile},{ytile}")
-                    else:
-                        print(f"Failed to download tile {xtile},{ytile}: {response.status_code}")
-                except Exception as e:
-                    print(f"Error downloading tile {xtile},{ytile}: {e}")
-                    return None
+        output_path = format_path(output_path, fmt)
+        center_lon, center_lat = self.compute_center()
+        output_dir = os.path.dirname(os.path.abspath(output_path))
+        extension = os.path.splitext(output_path)[1]
+        
+        stage = self.create_root_stage(output_path, center_lon, center_lat)
+        UsdGeom.Scope.Define(stage, '/World/Tiles')
+        
+        tiles = self.feature_tiles()
+        print(f"Writing {len(tiles)} tiles with {workers} worker(s)...")
+        tasks = []
+        for (zoom, xtile, ytile), groups in tiles.items():
+            tile_path = os.path.join(output_dir, f'tiles/{zoom}/{xtile}/{ytile}{extension}')
+            os.makedirs(os.path.dirname(tile_path), exist_ok=True)
+            tasks.append((tile_path, groups, None, center_lon, center_lat))
+        self.write_layers(tasks, workers)
+        
+        # Reference the tiles only once their layers exist
+        for zoom, xtile, ytile in tiles:
+            tile_prim = UsdGeom.Xform.Define(stage, f'/World/Tiles/tile_{zoom}_{xtile}_{ytile}').GetPrim()
+            tile_prim.GetPayloads().AddPayload(f'./tiles/{zoom}/{xtile}/{ytile}{extension}')
+            tile_prim.SetCustomDataByKey('tile', Gf.Vec3i(zoom, xtile, ytile))
+        
+        save_stage(stage)
+        print(f"Tiled USD root saved to: {output_path}")
+
+    @instrument.timed('export_layered_usd')
+    def export_layered_usd(self, output_path: str, workers: int = 1, fmt: str = None):
+        """Export each feature category to its own layer and sublayer them into a root stage.
+
+        Category layers are written to ``<name>_layers/<category>.<fmt>`` next
+        to ``output_path``, in parallel when ``workers`` > 1.
+        """
+        if not self.all_coords:
+            print("No coordinates found")
+            return
         
-        return result
+        output_path = format_path(output_path, fmt)
+        center_lon, center_lat = self.compute_center()
+        stem, extension = os.path.splitext(os.path.basename(output_path))
+        layer_dir = os.path.join(os.path.dirname(os.path.abspath(output_path)), f'{stem}_layers')
+        os.makedirs(layer_dir, exist_ok=True)
+        
+        stage = self.create_root_stage(output_path, center_lon, center_lat)
+        tasks = [(os.path.join(layer_dir, f'{category}{extension}'), None, (category,), center_lon, center_lat)
+                 for category in self.EXPORT_CATEGORIES]
+        print(f"Writing {len(tasks)} category layers with {workers} worker(s)...")
+        self.write_layers(tasks, workers)
+        
+        stage.GetRootLayer().subLayerPaths = [f'./{stem}_layers/{category}{extension}'
+                                              for category in self.EXPORT_CATEGORIES]
+        save_stage(stage)
+        print(f"Layered USD root saved to: {output_path}")
+
+    @instrument.timed('parse_osm')
+    def process_osm_file(self, osm_path: str, classify: bool = True):
+        """Process OSM file using osmium; ``classify`` as in ``process_json``.
+
+        Unreadable or corrupt files raise, rather than leaving an empty handler
+        that exports an empty scene.
+        """
+        handler = OsmHandler(self)
+        handler.apply_file(osm_path, locations=True)  # Enable locations
+        instrument.count('osm.nodes', handler.node_count)
+        instrument.count('osm.ways', handler.way_count)
+        instrument.count('aoi.ways_dropped', handler.outside_count)
+        if classify:
+            self.classify_features()
+
+    def ground_texture_source(self):
+        """Return where the ground texture comes from: 'tiles' or 'raster'."""
+        if self.GROUND_TEXTURE_SOURCE:
+            return self.GROUND_TEXTURE_SOURCE
+        offline = os.environ.get('OSM_TILE_OFFLINE') == '1' if self.TILE_OFFLINE is None else self.TILE_OFFLINE
+        return 'raster' if offline else 'tiles'
+
+    def raster_layers(self):
+        """Return the land, water, road and building tables as raster layers, bottom first."""
+        colors = self.RASTER_COLORS
+        land = defaultdict(list)
+        for coords, tags in self.land_features:
+            land_type = next((v for k, v in tags.items() if k in ['natural', 'landuse', 'leisure']), 'grass')
+            land[colors.get(land_type, colors['land'])].append(coords)
+        
+        layers = [RasterLayer(*pack_polylines(footprints), color) for color, footprints in land.items()]
+        layers.append(RasterLayer(*pack_polylines([coords for coords, _ in self.water_features]),
+                                  colors['water']))
+        # Road widths are full widths in meters already, as the raster takes them
+        coords, offsets = pack_polylines([coords for coords, _, _ in self.roads])
+        widths = np.array([width for _, _, width in self.roads], dtype=np.float64)
+        layers.append(RasterLayer(coords, offsets, colors['road'], widths))
+        _, _, coords, offsets = self.building_footprints()
+        layers.append(RasterLayer(coords, offsets, colors['building']))
+        return layers
+
+    @instrument.timed('rasterize')
+    def rasterize_ground_texture(self, output_path):
+        """Draw the feature tables into a ground texture covering the area of interest.
+
+        Needs no tile server; returns a ``GeoTexture`` on the same lon/lat grid
+        as ``fetch_ground_texture`` at ``RASTER_METERS_PER_PIXEL``.
+        """
+        return rasterize_layers(self.raster_layers(), self.min_lat, self.max_lat, self.min_lon, self.max_lon,
+                                self.RASTER_METERS_PER_PIXEL, output_path, tile_size=self.RASTER_TILE_SIZE,
+                                workers=self.RASTER_WORKERS, compression=self.TEXTURE_COMPRESSION)
+
+    @instrument.timed('fetch_tiles')
+    def fetch_ground_texture(self, output_path):
+        """Stream a ground texture covering exactly the area of interest into ``output_path``.
+
+        Returns a ``GeoTexture`` whose geotransform maps its pixels to lon/lat.
+        """
+        cache = TileCache(self.tile_cache_dir, self.TILE_CACHE_MAX_AGE, self.TILE_CACHE_MAX_BYTES)
+        with TileFetcher(self.TILE_URL, max_workers=self.TILE_WORKERS,
+                         requests_per_second=self.TILE_REQUESTS_PER_SECOND,
+                         cache=cache, offline=self.TILE_OFFLINE) as fetcher:
+            texture = stream_georeferenced(fetcher, self.GROUND_TEXTURE_ZOOM, self.min_lat, self.max_lat,
+                                           self.min_lon, self.max_lon, output_path,
+                                           compression=self.TEXTURE_COMPRESSION, workers=self.TEXTURE_WORKERS)
+        print(f"Tile cache: {cache.hits} hits, {cache.misses} misses, {fetcher.requests} requests")
+        count_tiles(cache, fetcher)
+        return texture
+
+def count_tiles(cache, fetcher):
+    instrument.count('tiles.cache_hits', cache.hits)
+    instrument.count('tiles.cache_misses', cache.misses)
+    instrument.count('tiles.requests', fetcher.requests)
+
+# Handler inherited by layer-writing worker processes
+_layer_handler = None
+
+def _init_layer_worker(handler):
+    global _layer_handler
+    _layer_handler = handler
+
+def _write_layer_task(task):
+    return _layer_handler.write_layer(*task)
 
 class OsmHandler(osmium.SimpleHandler):
     def __init__(self, json_handler):
         super(OsmHandler, self).__init__()
         self.json_handler = json_handler
         self.wkb_factory = osmium.geom.WKBFactory()
+        self.node_count = 0
+        self.way_count = 0
+        self.outside_count = 0  # ways skipped outside the area of interest
     
     def node(self, n):
         """Store node coordinates."""
+        self.node_count += 1
         try:
             self.json_handler.nodes[n.id] = (n.location.lon, n.location.lat)
+            if n.tags:
+                self.json_handler.point_features.append((n.id, {tag.k: tag.v for tag in n.tags}))
         except Exception as e:
             print(f"Error processing node {n.id}: {e}")
     
     def way(self, w):
         """Process way elements."""
+        self.way_count += 1
         try:
             # Skip ways without tags
             if not w.tags:
@@ -643,6 +1474,7 @@ class OsmHandler(osmium.SimpleHandler):
                     max(lons) >= self.json_handler.min_lon and
                     min(lats) <= self.json_handler.max_lat and 
                     max(lats) >= self.json_handler.min_lat):
+                self.outside_count += 1
                 return  # Skip if not in our area
             
             # Process different types of ways
@@ -668,11 +1500,11 @@ class OsmHandler(osmium.SimpleHandler):
         except Exception as e:
             print(f"Error processing way {w.id}: {e}")
 
-def main():
+def main(fmt: str = None, texture: str = None):
     current_dir = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
     json_path = os.path.join(current_dir, 'samples', 'export.json')
     osm_path = os.path.join(current_dir, 'samples', 'map.osm')
-    usd_path = os.path.join(current_dir, 'output', 'osm_buildings.usda')
+    usd_path = format_path(os.path.join(current_dir, 'output', 'osm_buildings'), fmt)
     
     # Ensure output directory exists
     os.makedirs(os.path.dirname(usd_path), exist_ok=True)
@@ -680,6 +1512,8 @@ def main():
     try:
         # Create handler
         handler = JsonHandler()
+        if texture:
+            handler.use_texture_preset(texture)
         
         # Process OSM file first (for base features)
         if os.path.exists(osm_path):
@@ -708,4 +1542,10 @@ def main():
         traceback.print_exc()
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Convert OSM data to USD")
+    add_format_argument(parser)
+    add_texture_argument(parser)
+    instrument.add_instrument_arguments(parser)
+    args = parser.parse_args()
+    with instrument.instrumented(args.metrics, args.trace, args.trace_memory):
+        main(args.format, args.texture)
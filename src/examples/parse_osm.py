@@ -1,152 +1,109 @@
 from src.osm.osm import OSM
+import argparse
 import os
 import matplotlib.pyplot as plt
 import numpy as np
-from numba import njit
-from typing import List, Tuple
+from collections import defaultdict
+from src.osm.classify import LAND, PREVIEW_LAND_TAGS, TagTable, classify_tags
+from src.preview.plot import MAX_ANNOTATIONS, add_lines, add_polygons, annotate_items, fit_view
 
-@njit
-def process_nodes(node_lons: np.ndarray, node_lats: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
-    """Process nodes using Numba for faster computation."""
-    return node_lons, node_lats
+# Ways are drawn as one collection per feature class: the first of these keys a way has
+PREVIEW_CLASSES = {
+    'building': 'saddlebrown',
+    'highway': 'dimgray',
+    'railway': 'black',
+    'waterway': 'royalblue',
+    'natural': 'forestgreen',
+    'landuse': 'olivedrab',
+    'leisure': 'limegreen',
+}
+OTHER_COLOR = 'red'
 
-@njit
-def find_node_by_id(node_ids: np.ndarray, node_lons: np.ndarray, 
-                    node_lats: np.ndarray, search_id: int) -> Tuple[float, float]:
-    """Find node coordinates by ID using Numba."""
-    idx = np.where(node_ids == search_id)[0]
-    if len(idx) > 0:
-        return node_lons[idx[0]], node_lats[idx[0]]
-    return np.nan, np.nan
+def way_class(way) -> str:
+    """Return the preview class of a way, 'other' if it has none of the class keys."""
+    keys = {tag.key for tag in way.tags}
+    return next((key for key in PREVIEW_CLASSES if key in keys), 'other')
 
-def process_way(way_node_refs: List[int], node_ids: np.ndarray, 
-               node_lons: np.ndarray, node_lats: np.ndarray) -> Tuple[List[float], List[float]]:
-    """Process a single way's nodes."""
-    way_lons = []
-    way_lats = []
-    
-    for node_ref in way_node_refs:
-        lon, lat = find_node_by_id(node_ids, node_lons, node_lats, node_ref)
-        if not np.isnan(lon):
-            way_lons.append(lon)
-            way_lats.append(lat)
-    
-    return way_lons, way_lats
+def visualize_osm(osm: OSM, annotate: bool = False, max_annotations: int = MAX_ANNOTATIONS):
+    """Create a simple 2D visualization of the OSM data.
 
-def visualize_osm(osm: OSM):
-    """Create a simple 2D visualization of the OSM data with Numba optimization."""
-    plt.figure(figsize=(12, 8))
+    Ways are resolved to coordinates in one vectorized lookup and drawn as
+    one ``LineCollection`` per feature class, so the number of artists does
+    not grow with the number of ways. ``annotate`` labels at most
+    ``max_annotations`` ways with their id.
+    """
+    fig, ax = plt.subplots(figsize=(12, 8))
     
     # Convert node data to numpy arrays for faster processing
-    visible_nodes = [node for node in osm.nodes if node.visible]
-    node_ids = np.array([node.id for node in visible_nodes])
-    node_lons = np.array([node.lon for node in visible_nodes])
-    node_lats = np.array([node.lat for node in visible_nodes])
-    
-    # Process nodes using Numba
-    node_lons, node_lats = process_nodes(node_lons, node_lats)
+    node_ids, node_coords = osm.node_arrays()
     
     # Plot nodes
-    plt.scatter(node_lons, node_lats, c='blue', s=10, alpha=0.6, label='Nodes')
+    ax.scatter(node_coords[:, 0], node_coords[:, 1], c='blue', s=10, alpha=0.6, label='Nodes')
     
-    # Process and plot ways
+    # Group visible ways by class and draw each class as one collection
     visible_ways = [way for way in osm.ways if way.visible]
+    classes = defaultdict(list)
     for way in visible_ways:
-        if way.nodes:
-            way_lons, way_lats = process_way(way.nodes, node_ids, node_lons, node_lats)
-            if way_lons and way_lats:
-                plt.plot(way_lons, way_lats, 'r-', linewidth=1, alpha=0.5)
+        classes[way_class(way)].append(way)
+    for name, ways in classes.items():
+        coords, offsets = osm.way_coordinates(ways, node_ids, node_coords)
+        add_lines(ax, coords, offsets, color=PREVIEW_CLASSES.get(name, OTHER_COLOR),
+                  linewidth=1, alpha=0.5, label=name)
+        if annotate:
+            max_annotations -= annotate_items(ax, coords, offsets, [f'Way {way.id}' for way in ways],
+                                              limit=max(max_annotations, 0))
     
     # Set labels and title
-    plt.xlabel('Longitude')
-    plt.ylabel('Latitude')
-    plt.title('OSM Data Visualization')
-    plt.legend()
-    plt.grid(True)
+    ax.set_xlabel('Longitude')
+    ax.set_ylabel('Latitude')
+    ax.set_title('OSM Data Visualization')
+    ax.legend(loc='upper right')
+    ax.grid(True)
     
     # Make the plot look more map-like with equal aspect ratio
-    plt.axis('equal')
+    fit_view(ax, node_coords)
     
     return plt
 
 def visualize_land(osm: OSM):
-    """Create a visualization of just the land boundaries."""
-    plt.figure(figsize=(12, 8))
-    
-    # Convert node data to numpy arrays for faster processing
-    visible_nodes = [node for node in osm.nodes if node.visible]
-    node_ids = np.array([node.id for node in visible_nodes])
-    node_lons = np.array([node.lon for node in visible_nodes])
-    node_lats = np.array([node.lat for node in visible_nodes])
+    """Create a visualization of just the land boundaries, drawn as one ``PolyCollection``."""
+    fig, ax = plt.subplots(figsize=(12, 8))
     
-    # Find ways that represent land
-    land_ways = []
-    for way in osm.ways:
-        if not way.visible:
-            continue
-            
-        is_land = False
-        for tag in way.tags:
-            # More specific land-related tags
-            if (
-                # Coastline is the most reliable indicator of land boundaries
-                (tag.key == 'natural' and tag.value == 'coastline') or
-                # Specific landuse tags that definitely indicate land
-                (tag.key == 'landuse' and tag.value in [
-                    'residential', 'forest', 'farmland', 'grass',
-                    'meadow', 'industrial', 'commercial'
-                ]) or
-                # Natural land features
-                (tag.key == 'natural' and tag.value in [
-                    'land', 'wood', 'scrub', 'heath', 'grassland'
-                ])
-            ):
-                is_land = True
-                break
-            
-            # Exclude water features explicitly
-            if (
-                (tag.key == 'natural' and tag.value in ['water', 'bay', 'strait']) or
-                (tag.key == 'waterway') or
-                (tag.key == 'water')
-            ):
-                is_land = False
-                break
-        
-        if is_land:
-            land_ways.append(way)
+    # Classify all visible ways in one pass over their dictionary-encoded tags
+    visible_ways = [way for way in osm.ways if way.visible]
+    table = TagTable.from_tags([(tag.key, tag.value) for tag in way.tags] for way in visible_ways)
+    categories = classify_tags(table, land=PREVIEW_LAND_TAGS)
+    land_ways = [way for way, category in zip(visible_ways, categories) if category == LAND]
     
-    # Plot land boundaries
-    for way in land_ways:
-        if way.nodes:
-            way_lons, way_lats = process_way(way.nodes, node_ids, node_lons, node_lats)
-            if way_lons and way_lats:
-                # Close the polygon if it's not closed
-                if way_lons[0] != way_lons[-1] or way_lats[0] != way_lats[-1]:
-                    way_lons.append(way_lons[0])
-                    way_lats.append(way_lats[0])
-                plt.fill(way_lons, way_lats, 'lightgreen', alpha=0.3, edgecolor='darkgreen', linewidth=0.5)
+    # Plot all land boundaries as one collection; rings are closed implicitly
+    coords, offsets = osm.way_coordinates(land_ways)
+    add_polygons(ax, coords, offsets, facecolor='lightgreen', alpha=0.3, edgecolor='darkgreen', linewidth=0.5)
     
     # Set labels and title
-    plt.xlabel('Longitude')
-    plt.ylabel('Latitude')
-    plt.title('OSM Land Areas')
-    plt.grid(True)
-    
-    # Make the plot look more map-like with equal aspect ratio
-    plt.axis('equal')
+    ax.set_xlabel('Longitude')
+    ax.set_ylabel('Latitude')
+    ax.set_title('OSM Land Areas')
+    ax.grid(True)
     
-    # If bounds exist, use them to set the plot limits
+    # Make the plot look more map-like with equal aspect ratio, within the bounds if they exist
+    bounds = None
     if osm.bounds:
-        plt.xlim(osm.bounds.minlon, osm.bounds.maxlon)
-        plt.ylim(osm.bounds.minlat, osm.bounds.maxlat)
+        bounds = (osm.bounds.minlon, osm.bounds.minlat, osm.bounds.maxlon, osm.bounds.maxlat)
+    fit_view(ax, coords, bounds)
     
     return plt
 
-def main():
+def main(density_path: str = None, osm_path: str = None, width: int = 2048, per_class: bool = False):
     # Get the absolute path to samples/map.osm
     current_dir = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
-    sample_path = os.path.join(current_dir, 'samples', 'map.osm')
+    sample_path = osm_path or os.path.join(current_dir, 'samples', 'map.osm')
+
+    if density_path:
+        # Headless: stream the file into a density raster instead of loading it
+        from src.preview.density import density_preview
+        density_preview(sample_path, density_path, width, per_class)
+        print(f"Wrote density preview to {density_path}")
+        return
     
     # Parse the OSM file
     osm = OSM.from_xml(sample_path)
@@ -156,4 +113,11 @@ def main():
     plt.show()
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Preview OSM data")
+    parser.add_argument('--osm', default=None, help="OSM file to preview (default: samples/map.osm)")
+    parser.add_argument('--density', metavar='PNG', default=None,
+                        help="Write a headless density raster preview to this PNG instead of plotting")
+    parser.add_argument('--width', type=int, default=2048, help="Width of the density preview in pixels")
+    parser.add_argument('--per-class', action='store_true', help="Color the density preview by feature class")
+    args = parser.parse_args()
+    main(args.density, args.osm, args.width, args.per_class)
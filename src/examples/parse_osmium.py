@@ -4,6 +4,8 @@ import matplotlib.pyplot as plt
 import numpy as np
 from typing import List, Dict, Set
 from collections import defaultdict
+from src.geometry.csr import pack_polylines
+from src.preview.plot import MAX_ANNOTATIONS, add_lines, annotate_items, fit_view
 
 class LandHandler(osmium.SimpleHandler):
     def __init__(self):
@@ -43,8 +45,13 @@ class LandHandler(osmium.SimpleHandler):
             nodes = [n.ref for n in w.nodes]
             self.crossing_ways.append((w.id, tags, nodes))
 
-def analyze_crossing_objects(osm_path: str):
-    """Analyze objects crossing the specified area."""
+def analyze_crossing_objects(osm_path: str, annotate: bool = True, max_annotations: int = MAX_ANNOTATIONS):
+    """Analyze objects crossing the specified area.
+
+    All crossing ways are drawn as one ``LineCollection``. ``annotate``
+    labels and prints the details of at most ``max_annotations`` ways, so
+    the plot stays readable and fast for large extracts.
+    """
     handler = LandHandler()
     handler.apply_file(osm_path)
     
@@ -52,61 +59,45 @@ def analyze_crossing_objects(osm_path: str):
     print(f"Area bounds: Lon({handler.min_lon}, {handler.max_lon}), Lat({handler.min_lat}, {handler.max_lat})")
     
     # Create the plot
-    plt.figure(figsize=(12, 8))
+    fig, ax = plt.subplots(figsize=(12, 8))
     
     # Plot the area of interest
-    plt.axvline(x=handler.min_lon, color='r', linestyle='--', alpha=0.5, label='Area of Interest')
-    plt.axvline(x=handler.max_lon, color='r', linestyle='--', alpha=0.5)
-    plt.axhline(y=handler.min_lat, color='r', linestyle='--', alpha=0.5)
-    plt.axhline(y=handler.max_lat, color='r', linestyle='--', alpha=0.5)
+    ax.axvline(x=handler.min_lon, color='r', linestyle='--', alpha=0.5, label='Area of Interest')
+    ax.axvline(x=handler.max_lon, color='r', linestyle='--', alpha=0.5)
+    ax.axhline(y=handler.min_lat, color='r', linestyle='--', alpha=0.5)
+    ax.axhline(y=handler.max_lat, color='r', linestyle='--', alpha=0.5)
     
-    # Plot crossing ways with different colors and annotations
-    colors = plt.cm.tab20(np.linspace(0, 1, len(handler.crossing_ways)))
+    # Plot all crossing ways as one collection with a color per way
+    coords, offsets = pack_polylines([[handler.nodes[node_id] for node_id in nodes if node_id in handler.nodes]
+                                      for _, _, nodes in handler.crossing_ways])
+    colors = plt.cm.tab20(np.linspace(0, 1, max(len(handler.crossing_ways), 1)))
+    add_lines(ax, coords, offsets, colors=colors[:len(handler.crossing_ways)], linewidth=2, alpha=0.7,
+              label=f'{len(handler.crossing_ways)} crossing ways')
     
-    for (way_id, tags, nodes), color in zip(handler.crossing_ways, colors):
-        coords = []
+    # Annotate and print the first ways only
+    shown = handler.crossing_ways[:max_annotations] if annotate else []
+    labels = [f"Way {way_id}\n" + ''.join(f"{k}={v}\n" for k, v in tags) for way_id, tags, _ in shown]
+    annotate_items(ax, coords, offsets[:len(shown) + 1], labels, limit=None)
+    
+    for way_id, tags, nodes in shown:
+        print(f"\nWay {way_id}:")
+        print("Properties:")
+        for k, v in tags:
+            print(f"  {k} = {v}")
+        print("Nodes:")
         for node_id in nodes:
             if node_id in handler.nodes:
-                coords.append(handler.nodes[node_id])
-        
-        if coords:
-            lons, lats = zip(*coords)
-            line = plt.plot(lons, lats, '-', linewidth=2, alpha=0.7, color=color, 
-                          label=f'Way {way_id}')[0]
-            
-            # Calculate center point for annotation
-            center_lon = np.mean(lons)
-            center_lat = np.mean(lats)
-            
-            # Create annotation text
-            annotation = f"Way {way_id}\n"
-            for k, v in tags:
-                annotation += f"{k}={v}\n"
-            
-            # Add annotation with arrow pointing to the line
-            plt.annotate(annotation, 
-                        xy=(center_lon, center_lat),
-                        xytext=(center_lon + 0.0005, center_lat + 0.0005),
-                        bbox=dict(boxstyle="round,pad=0.3", fc="white", ec="gray", alpha=0.8),
-                        arrowprops=dict(arrowstyle="->"))
-            
-            # Print detailed information
-            print(f"\nWay {way_id}:")
-            print("Properties:")
-            for k, v in tags:
-                print(f"  {k} = {v}")
-            print("Nodes:")
-            for node_id in nodes:
-                if node_id in handler.nodes:
-                    lon, lat = handler.nodes[node_id]
-                    print(f"  Node {node_id}: ({lon:.6f}, {lat:.6f})")
+                lon, lat = handler.nodes[node_id]
+                print(f"  Node {node_id}: ({lon:.6f}, {lat:.6f})")
+    if len(handler.crossing_ways) > len(shown):
+        print(f"\n... and {len(handler.crossing_ways) - len(shown)} more crossing ways")
     
-    plt.xlabel('Longitude')
-    plt.ylabel('Latitude')
-    plt.title('Objects Crossing Specified Area with Properties')
-    plt.grid(True)
-    plt.axis('equal')
-    plt.legend(bbox_to_anchor=(1.05, 1), loc='upper left')
+    ax.set_xlabel('Longitude')
+    ax.set_ylabel('Latitude')
+    ax.set_title('Objects Crossing Specified Area with Properties')
+    ax.grid(True)
+    fit_view(ax, coords)
+    ax.legend(bbox_to_anchor=(1.05, 1), loc='upper left')
     
     # Adjust layout to prevent annotation cutoff
     plt.tight_layout()
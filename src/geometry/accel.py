@@ -0,0 +1,94 @@
+import argparse
+import importlib
+import importlib.util
+import os
+import time
+from typing import Callable, Dict, Optional
+
+# Modules defining kernels; imported by ``warmup`` so every kernel gets registered
+KERNEL_MODULES = ('src.geometry.csr', 'src.geometry.extrude', 'src.geometry.ribbon', 'src.osm.osm')
+
+_numba = None
+_numba_checked = False
+
+def numba_module():
+    """Return the ``numba`` module, or None when it is missing or disabled with ``OSM_NUMBA=0``.
+
+    Numba is imported on first use, so runs that never reach a kernel do
+    not pay for the import.
+    """
+    global _numba, _numba_checked
+    if not _numba_checked:
+        _numba_checked = True
+        if os.environ.get('OSM_NUMBA', '1') != '0' and importlib.util.find_spec('numba') is not None:
+            import numba
+            _numba = numba
+    return _numba
+
+class Kernel:
+    """A loop kernel compiled with Numba on first use and cached on disk.
+
+    ``function`` is plain Python over NumPy arrays; callers check
+    ``available`` and fall back to their NumPy implementation otherwise.
+    ``example`` returns arguments of the production types, used by
+    ``warmup`` to compile ahead of time.
+    """
+    def __init__(self, function: Callable, example: Callable[[], tuple]):
+        self.function = function
+        self.example = example
+        self.name = f'{function.__module__}.{function.__name__}'
+        self._compiled = None
+
+    @property
+    def available(self) -> bool:
+        return numba_module() is not None
+
+    def compiled(self):
+        if self._compiled is None:
+            self._compiled = numba_module().njit(cache=True, nogil=True)(self.function)
+        return self._compiled
+
+    def __call__(self, *args):
+        return self.compiled()(*args)
+
+KERNELS: Dict[str, Kernel] = {}
+
+def kernel(example: Callable[[], tuple]) -> Callable[[Callable], Kernel]:
+    """Register a loop function as a ``Kernel`` compiled for the types of ``example()``."""
+    def register(function):
+        compiled = Kernel(function, example)
+        KERNELS[compiled.name] = compiled
+        return compiled
+    return register
+
+def warmup() -> Optional[Dict[str, float]]:
+    """Compile every kernel into the on-disk cache; returns seconds per kernel, None without Numba.
+
+    A kernel already in the cache only takes the time to load it.
+    """
+    if numba_module() is None:
+        return None
+    for module in KERNEL_MODULES:
+        importlib.import_module(module)
+    timings = {}
+    for name, compiled in KERNELS.items():
+        start = time.perf_counter()
+        compiled(*compiled.example())
+        timings[name] = time.perf_counter() - start
+    return timings
+
+def main():
+    parser = argparse.ArgumentParser(description="Compile the Numba geometry kernels ahead of time")
+    parser.parse_args()
+    timings = warmup()
+    if timings is None:
+        print("Numba is not available (or OSM_NUMBA=0); the NumPy implementations are used")
+        return
+    for name, seconds in timings.items():
+        print(f"{name}: {seconds:.3f}s")
+    cache_dir = numba_module().config.CACHE_DIR or "__pycache__ next to each module"
+    print(f"Compiled {len(timings)} kernel(s) into {cache_dir}")
+
+if __name__ == "__main__":
+    # Kernel modules register with the importable module, not with __main__
+    importlib.import_module('src.geometry.accel').main()
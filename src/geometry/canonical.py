@@ -0,0 +1,76 @@
+import hashlib
+import numpy as np
+from typing import List, NamedTuple, Optional, Sequence
+from .csr import closing_points, compress, item_ids, offsets_from_ids
+
+class CanonicalShapes(NamedTuple):
+    """Footprints with translation and rotation factored out.
+
+    Placing ``coords[offsets[i]:offsets[i + 1]]`` rotated by ``angles[i]``
+    (radians, counter-clockwise) and translated by ``translations[i]``
+    reproduces item ``i`` up to the quantization used for ``keys``.
+    """
+    keys: List[str]
+    coords: np.ndarray
+    offsets: np.ndarray
+    translations: np.ndarray
+    angles: np.ndarray
+
+def canonicalize(coords: np.ndarray, offsets: np.ndarray, quantum: float,
+                 extra_keys: Optional[Sequence] = None) -> CanonicalShapes:
+    """Normalize the position and orientation of many rings and hash their shape.
+
+    Each ring is moved to its vertex centroid, rotated so its longest edge
+    lies along +X and rolled to start at that edge. The canonical vertices
+    are quantized to ``quantum`` and hashed together with ``extra_keys[i]``
+    (e.g. a height), so items with equal keys can share one prototype.
+    Closing points are dropped from the canonical rings.
+    """
+    coords = np.asarray(coords, dtype=np.float64)
+    num_items = len(offsets) - 1
+
+    # Drop the closing point of closed rings
+    coords, offsets = compress(coords, offsets, ~closing_points(coords, offsets))
+
+    ids = item_ids(offsets)
+    counts = np.diff(offsets)
+    starts = offsets[:-1]
+    local = np.arange(len(coords)) - starts[ids]
+
+    # Centroid of the distinct vertices
+    sums = np.zeros((num_items, 2))
+    np.add.at(sums, ids, coords)
+    translations = sums / np.maximum(counts, 1)[:, None]
+
+    # Edge from every vertex to the next one around its ring
+    nxt = starts[ids] + (local + 1) % np.maximum(counts[ids], 1)
+    edges = coords[nxt] - coords
+    lengths = np.round(np.linalg.norm(edges, axis=1) / quantum)
+
+    # First longest edge per ring decides rotation and starting vertex
+    longest = np.zeros(num_items)
+    np.maximum.at(longest, ids, lengths)
+    candidates = np.flatnonzero(lengths == longest[ids])
+    _, pick = np.unique(ids[candidates], return_index=True)
+    first = np.zeros(num_items, dtype=np.int64)
+    first[np.unique(ids[candidates])] = local[candidates[pick]]
+    edge = edges[starts + first] if len(coords) else np.zeros((num_items, 2))
+    angles = np.arctan2(edge[:, 1], edge[:, 0]) if num_items else np.zeros(0)
+
+    # Roll, translate and rotate every ring into its canonical frame
+    source = starts[ids] + (local + first[ids]) % np.maximum(counts[ids], 1)
+    centered = coords[source] - translations[ids]
+    cos, sin = np.cos(-angles[ids]), np.sin(-angles[ids])
+    canonical = np.stack([centered[:, 0] * cos - centered[:, 1] * sin,
+                          centered[:, 0] * sin + centered[:, 1] * cos], axis=1)
+
+    quantized = np.round(canonical / quantum).astype(np.int64)
+    keys = []
+    for i in range(num_items):
+        digest = hashlib.sha1()
+        digest.update(np.int64(counts[i]).tobytes())
+        digest.update(quantized[offsets[i]:offsets[i + 1]].tobytes())
+        if extra_keys is not None:
+            digest.update(repr(extra_keys[i]).encode())
+        keys.append(digest.hexdigest())
+    return CanonicalShapes(keys, canonical, offsets_from_ids(ids, num_items), translations, angles)
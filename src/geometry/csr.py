@@ -0,0 +1,88 @@
+import numpy as np
+from typing import Sequence, Tuple
+from .accel import kernel
+
+def pack_polylines(polylines: Sequence[Sequence[Tuple[float, float]]]) -> Tuple[np.ndarray, np.ndarray]:
+    """Pack a list of coordinate lists into flat CSR arrays.
+
+    Returns ``(coords, offsets)`` where ``coords`` is an (N, 2) float array and
+    the points of polyline ``i`` are ``coords[offsets[i]:offsets[i + 1]]``.
+    """
+    counts = np.fromiter((len(p) for p in polylines), dtype=np.int64, count=len(polylines))
+    offsets = np.zeros(len(polylines) + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+
+    coords = np.empty((offsets[-1], 2), dtype=np.float64)
+    for i, polyline in enumerate(polylines):
+        if counts[i]:
+            coords[offsets[i]:offsets[i + 1]] = polyline
+    return coords, offsets
+
+def item_ids(offsets: np.ndarray) -> np.ndarray:
+    """Return the owning item index of every element in a CSR layout."""
+    return np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+
+def offsets_from_ids(ids: np.ndarray, num_items: int) -> np.ndarray:
+    """Build CSR offsets from a sorted array of item indices."""
+    offsets = np.zeros(num_items + 1, dtype=np.int64)
+    np.cumsum(np.bincount(ids, minlength=num_items), out=offsets[1:])
+    return offsets
+
+def compress(coords: np.ndarray, offsets: np.ndarray, keep: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Drop elements where ``keep`` is False and rebuild the offsets."""
+    ids = item_ids(offsets)
+    return coords[keep], offsets_from_ids(ids[keep], len(offsets) - 1)
+
+def drop_repeated_points(coords: np.ndarray, offsets: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Remove consecutive duplicate points within each item."""
+    keep = np.ones(len(coords), dtype=bool)
+    if len(coords) > 1:
+        keep[1:] = np.any(coords[1:] != coords[:-1], axis=1)
+    # The first point of every item is always kept
+    keep[offsets[:-1][np.diff(offsets) > 0]] = True
+    return compress(coords, offsets, keep)
+
+def closing_points(coords: np.ndarray, offsets: np.ndarray) -> np.ndarray:
+    """Return a mask of the closing (repeated first) point of every closed ring."""
+    counts = np.diff(offsets)
+    closed = counts >= 4
+    closed[closed] = np.all(coords[offsets[:-1][closed]] == coords[offsets[1:][closed] - 1], axis=1)
+    mask = np.zeros(len(coords), dtype=bool)
+    mask[offsets[1:][closed] - 1] = True
+    return mask
+
+@kernel(example=lambda: (np.zeros((3, 2)), np.array([0, 0, 3]), np.zeros((2, 2)), np.zeros((2, 2))))
+def _bounds_kernel(coords, offsets, mins, maxs):
+    for i in range(len(offsets) - 1):
+        start, end = offsets[i], offsets[i + 1]
+        if start == end:
+            continue
+        for axis in range(coords.shape[1]):
+            low = high = coords[start, axis]
+            for j in range(start + 1, end):
+                value = coords[j, axis]
+                if value < low:
+                    low = value
+                if value > high:
+                    high = value
+            mins[i, axis] = low
+            maxs[i, axis] = high
+
+def segment_bounds(coords: np.ndarray, offsets: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Return per-item ``(mins, maxs)`` of CSR coordinates; empty items get NaN."""
+    coords = np.asarray(coords)
+    num_items = len(offsets) - 1
+    mins = np.full((num_items,) + coords.shape[1:], np.nan)
+    maxs = np.full((num_items,) + coords.shape[1:], np.nan)
+    if _bounds_kernel.available and coords.ndim == 2:
+        # One pass over the points, without the reduceat temporaries
+        _bounds_kernel(np.ascontiguousarray(coords, dtype=np.float64),
+                       np.ascontiguousarray(offsets, dtype=np.int64), mins, maxs)
+        return mins, maxs
+    nonempty = np.diff(offsets) > 0
+    if nonempty.any():
+        # Empty items are skipped so every reduceat segment is one item's range
+        starts = offsets[:-1][nonempty]
+        mins[nonempty] = np.minimum.reduceat(coords, starts, axis=0)
+        maxs[nonempty] = np.maximum.reduceat(coords, starts, axis=0)
+    return mins, maxs
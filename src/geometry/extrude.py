@@ -0,0 +1,95 @@
+import numpy as np
+from .accel import kernel
+from .csr import closing_points, compress, item_ids, offsets_from_ids
+from .mesh import MeshBatch
+
+@kernel(example=lambda: (np.zeros((1, 3), dtype=np.int64), np.zeros((1, 3), dtype=np.int64),
+                          np.zeros((3, 4), dtype=np.int64), np.array([0, 1], dtype=np.int64), np.array([0, 3], dtype=np.int64),
+                          np.zeros(5, dtype=np.int64), np.zeros(18, dtype=np.int64)))
+def _prism_faces_kernel(floors, roofs, walls, tri_offsets, wall_offsets, face_counts, indices):
+    # Floor, roof and wall faces of every prism in turn
+    face = corner = 0
+    for item in range(len(tri_offsets) - 1):
+        for t in range(tri_offsets[item], tri_offsets[item + 1]):
+            face_counts[face] = 3
+            indices[corner:corner + 3] = floors[t]
+            face += 1
+            corner += 3
+        for t in range(tri_offsets[item], tri_offsets[item + 1]):
+            face_counts[face] = 3
+            indices[corner:corner + 3] = roofs[t]
+            face += 1
+            corner += 3
+        for w in range(wall_offsets[item], wall_offsets[item + 1]):
+            face_counts[face] = 4
+            indices[corner:corner + 4] = walls[w]
+            face += 1
+            corner += 4
+
+def extrude_footprints(coords: np.ndarray, offsets: np.ndarray, heights: np.ndarray,
+                       triangles: MeshBatch) -> MeshBatch:
+    """Extrude many footprints into closed prisms standing on the XZ plane.
+
+    ``coords`` are (x, z) ground coordinates in CSR layout and ``triangles``
+    their counter-clockwise triangulation (see ``triangulate_polygons``),
+    which becomes the floor; the reversed triangles become the roof at
+    ``heights[i]``. Point ``2 * j`` of the result is the ground vertex of
+    footprint point ``j`` and ``2 * j + 1`` the roof vertex above it. Faces
+    of every prism are ordered floor, roof, walls, and all face outward
+    whatever the winding of the footprint.
+    """
+    coords = np.asarray(coords, dtype=np.float64)
+    heights = np.asarray(heights, dtype=np.float64)
+    num_items = len(offsets) - 1
+
+    # Closing points would only add zero-area walls; triangles never use them
+    keep = ~closing_points(coords, offsets)
+    remap = np.cumsum(keep) - 1
+    tris = remap[triangles.face_vertex_indices].reshape(-1, 3)
+    tri_owner = item_ids(triangles.face_offsets)
+    coords, offsets = compress(coords, offsets, keep)
+    owner = item_ids(offsets)
+
+    points = np.zeros((2 * len(coords), 3))
+    points[0::2, 0] = coords[:, 0]
+    points[0::2, 2] = coords[:, 1]
+    points[1::2] = points[0::2]
+    points[1::2, 1] = heights[owner]
+
+    # One wall quad from every footprint point to the next one around its ring
+    counts = np.diff(offsets)
+    local = np.arange(len(coords)) - offsets[owner]
+    nxt = offsets[owner] + (local + 1) % np.maximum(counts[owner], 1)
+    j = np.arange(len(coords))
+    walls = np.stack([2 * j, 2 * j + 1, 2 * nxt + 1, 2 * nxt], axis=1)
+
+    # Walls of counter-clockwise rings face outward; flip those of clockwise rings
+    cross = coords[:, 0] * coords[nxt, 1] - coords[nxt, 0] * coords[:, 1]
+    clockwise = np.bincount(owner, weights=cross, minlength=num_items) < 0
+    walls[clockwise[owner]] = walls[clockwise[owner]][:, ::-1]
+    floors = tris * 2
+    roofs = tris[:, ::-1] * 2 + 1
+
+    # Gather the faces of each prism into one contiguous range
+    if _prism_faces_kernel.available:
+        face_counts = np.empty(2 * len(tris) + len(walls), dtype=np.int64)
+        indices = np.empty(6 * len(tris) + 4 * len(walls), dtype=np.int64)
+        tri_offsets = np.asarray(triangles.face_offsets, dtype=np.int64)
+        _prism_faces_kernel(np.ascontiguousarray(floors, dtype=np.int64), np.ascontiguousarray(roofs, dtype=np.int64),
+                            np.ascontiguousarray(walls, dtype=np.int64), tri_offsets,
+                            np.asarray(offsets, dtype=np.int64), face_counts, indices)
+        return MeshBatch(points, face_counts, indices, offsets * 2, 2 * tri_offsets + offsets)
+
+    flat = np.concatenate([floors.reshape(-1), roofs.reshape(-1), walls.reshape(-1)])
+    face_counts = np.concatenate([np.full(2 * len(tris), 3), np.full(len(walls), 4)]).astype(np.int64)
+    face_starts = np.zeros(len(face_counts), dtype=np.int64)
+    np.cumsum(face_counts[:-1], out=face_starts[1:])
+    face_owner = np.concatenate([tri_owner, tri_owner, owner])
+    kind = np.repeat([0, 1, 2], [len(tris), len(tris), len(walls)])
+    order = np.lexsort((kind, face_owner))
+
+    face_counts = face_counts[order]
+    first = np.repeat(face_starts[order], face_counts)
+    corner = np.arange(face_counts.sum()) - np.repeat(np.cumsum(face_counts) - face_counts, face_counts)
+    return MeshBatch(points, face_counts, flat[first + corner], offsets * 2,
+                     offsets_from_ids(face_owner[order], num_items))
@@ -0,0 +1,99 @@
+import numpy as np
+from typing import Iterator, NamedTuple, Sequence, Tuple
+from .csr import segment_bounds
+
+class MeshBatch(NamedTuple):
+    """Many meshes stored in shared flat arrays.
+
+    Mesh ``i`` owns ``points[point_offsets[i]:point_offsets[i + 1]]`` and faces
+    ``face_offsets[i]:face_offsets[i + 1]``. Face vertex indices are global
+    into ``points``.
+    """
+    points: np.ndarray
+    face_vertex_counts: np.ndarray
+    face_vertex_indices: np.ndarray
+    point_offsets: np.ndarray
+    face_offsets: np.ndarray
+
+    def __len__(self):
+        return len(self.point_offsets) - 1
+
+    def index_offsets(self) -> np.ndarray:
+        """Return CSR offsets of every face into ``face_vertex_indices``."""
+        offsets = np.zeros(len(self.face_vertex_counts) + 1, dtype=np.int64)
+        np.cumsum(self.face_vertex_counts, out=offsets[1:])
+        return offsets
+
+    def meshes(self) -> Iterator[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        """Yield ``(points, counts, indices)`` of every mesh with local indices.
+
+        Meshes own contiguous ranges, so this slices instead of gathering and
+        stays linear in the batch size.
+        """
+        index_offsets = self.index_offsets()
+        for i in range(len(self)):
+            first_face, last_face = self.face_offsets[i], self.face_offsets[i + 1]
+            indices = self.face_vertex_indices[index_offsets[first_face]:index_offsets[last_face]]
+            yield (self.points[self.point_offsets[i]:self.point_offsets[i + 1]],
+                   self.face_vertex_counts[first_face:last_face], indices - self.point_offsets[i])
+
+    def extents(self) -> np.ndarray:
+        """Return the (M, 2, dim) bounding box of every mesh."""
+        mins, maxs = segment_bounds(self.points, self.point_offsets)
+        return np.stack([mins, maxs], axis=1)
+
+    def face_normals(self) -> np.ndarray:
+        """Return unit normals of all faces, see ``face_normals``."""
+        return face_normals(self.points, self.face_vertex_counts, self.face_vertex_indices)
+
+    def mesh(self, i: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Return ``(points, counts, indices)`` of mesh ``i`` with local indices."""
+        return self.merge([i])
+
+    def merge(self, items: Sequence[int]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Combine the given meshes into one ``(points, counts, indices)`` triple."""
+        items = np.asarray(items, dtype=np.int64)
+        index_offsets = self.index_offsets()
+
+        point_ranges = [np.arange(self.point_offsets[i], self.point_offsets[i + 1]) for i in items]
+        face_ranges = [np.arange(self.face_offsets[i], self.face_offsets[i + 1]) for i in items]
+        point_sel = np.concatenate(point_ranges) if len(items) else np.zeros(0, dtype=np.int64)
+        face_sel = np.concatenate(face_ranges) if len(items) else np.zeros(0, dtype=np.int64)
+
+        # Gather face vertex indices of the selected faces
+        counts = self.face_vertex_counts[face_sel]
+        starts = index_offsets[face_sel]
+        local = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        indices = self.face_vertex_indices[np.repeat(starts, counts) + local]
+
+        # Remap global point indices to the compacted point array
+        remap = np.full(len(self.points), -1, dtype=np.int64)
+        remap[point_sel] = np.arange(len(point_sel))
+        return self.points[point_sel], counts, remap[indices]
+
+def face_normals(points: np.ndarray, counts: np.ndarray, indices: np.ndarray) -> np.ndarray:
+    """Return a unit normal per face using Newell's method.
+
+    Normals follow the right-hand rule around each face's vertex order, which
+    is USD's default ``rightHanded`` orientation. Degenerate faces get zero
+    normals.
+    """
+    counts = np.asarray(counts, dtype=np.int64)
+    starts = np.zeros(len(counts), dtype=np.int64)
+    np.cumsum(counts[:-1], out=starts[1:])
+    if not len(counts):
+        return np.zeros((0, 3))
+
+    # Pair every face corner with the next corner of the same face
+    owner = np.repeat(np.arange(len(counts)), counts)
+    local = np.arange(len(indices)) - starts[owner]
+    p = points[indices]
+    q = points[indices[starts[owner] + (local + 1) % counts[owner]]]
+    terms = np.stack([(p[:, 1] - q[:, 1]) * (p[:, 2] + q[:, 2]),
+                      (p[:, 2] - q[:, 2]) * (p[:, 0] + q[:, 0]),
+                      (p[:, 0] - q[:, 0]) * (p[:, 1] + q[:, 1])], axis=1)
+    normals = np.add.reduceat(terms, starts, axis=0)
+
+    lengths = np.linalg.norm(normals, axis=1)
+    np.divide(normals, lengths[:, None], out=normals, where=lengths[:, None] > 0)
+    return normals
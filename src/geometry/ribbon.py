@@ -0,0 +1,154 @@
+import numpy as np
+from .accel import kernel
+from .csr import drop_repeated_points, item_ids, offsets_from_ids
+from .mesh import MeshBatch
+
+@kernel(example=lambda: (np.zeros((1, 4), dtype=np.int64), np.zeros((1, 4), dtype=np.int64),
+                          np.array([True, False]), np.array([False, True]), np.zeros((2, 4), dtype=np.int64)))
+def _ribbon_faces_kernel(quads, tris, has_out, bevel, faces):
+    # Vertices are in path order: the corner triangle of a vertex, then its outgoing quad
+    quad = tri = face = 0
+    for vertex in range(len(has_out)):
+        if bevel[vertex]:
+            faces[face] = tris[tri]
+            tri += 1
+            face += 1
+        if has_out[vertex]:
+            faces[face] = quads[quad]
+            quad += 1
+            face += 1
+
+def build_ribbons(coords: np.ndarray, offsets: np.ndarray, half_widths: np.ndarray,
+                  join: str = 'miter', miter_limit: float = 4.0) -> MeshBatch:
+    """Turn many polylines into flat ribbon meshes in one vectorized pass.
+
+    ``coords``/``offsets`` hold the polylines in CSR layout and ``half_widths``
+    gives the offset of each side per polyline. Every polyline vertex gets one
+    welded left/right vertex pair, so adjacent segments share their edge.
+    With ``join='miter'`` corners are mitred until the miter would exceed
+    ``miter_limit`` half widths, after which they are bevelled; ``join='bevel'``
+    bevels every corner. Polylines whose first and last point coincide are
+    treated as closed loops. Returned points are 2D; empty or degenerate
+    polylines yield empty meshes.
+    """
+    if join not in ('miter', 'bevel'):
+        raise ValueError(f"Unknown join type: {join}")
+
+    num_lines = len(offsets) - 1
+    coords = np.asarray(coords, dtype=np.float64).reshape(-1, 2)
+    half_widths = np.broadcast_to(np.asarray(half_widths, dtype=np.float64), (num_lines,))
+    coords, offsets = drop_repeated_points(coords, offsets)
+
+    # Closed loops repeat their first point at the end; drop the duplicate
+    counts = np.diff(offsets)
+    starts, ends = offsets[:-1], offsets[1:] - 1
+    closed = counts >= 4
+    closed[closed] = np.all(coords[starts[closed]] == coords[ends[closed]], axis=1)
+    keep = np.ones(len(coords), dtype=bool)
+    keep[ends[closed]] = False
+    ids = item_ids(offsets)[keep]
+    coords = coords[keep]
+
+    # Lines that cannot form a segment produce no geometry
+    counts = np.bincount(ids, minlength=num_lines)
+    valid = counts >= 2
+    keep = valid[ids]
+    ids, coords = ids[keep], coords[keep]
+    offsets = offsets_from_ids(ids, num_lines)
+    starts, ends = offsets[:-1], offsets[1:] - 1
+
+    n = len(coords)
+    idx = np.arange(n)
+    is_first = np.zeros(n, dtype=bool)
+    is_last = np.zeros(n, dtype=bool)
+    is_first[starts[valid]] = True
+    is_last[ends[valid]] = True
+    loop = closed[ids]
+
+    # Neighbouring vertex of each vertex, wrapping around on closed loops
+    nxt = idx + 1
+    nxt[is_last] = np.where(loop[is_last], starts[ids[is_last]], -1)
+    prv = idx - 1
+    prv[is_first] = np.where(loop[is_first], ends[ids[is_first]], -1)
+
+    # Unit direction of the outgoing segment of every vertex
+    has_out = nxt >= 0
+    direction = np.zeros((n, 2))
+    direction[has_out] = coords[nxt[has_out]] - coords[has_out]
+    direction /= np.maximum(np.linalg.norm(direction, axis=1), 1e-12)[:, None]
+    d_out = np.where(has_out[:, None], direction, 0.0)
+    d_in = np.where((prv >= 0)[:, None], direction[np.maximum(prv, 0)], 0.0)
+    d_out[~has_out] = d_in[~has_out]
+    d_in[prv < 0] = d_out[prv < 0]
+
+    # Left normals of the incoming and outgoing segments
+    n_in = np.stack([-d_in[:, 1], d_in[:, 0]], axis=1)
+    n_out = np.stack([-d_out[:, 1], d_out[:, 0]], axis=1)
+    hw = half_widths[ids][:, None]
+
+    # Miter direction and the scale needed to keep the ribbon width constant
+    miter = n_in + n_out
+    miter_len = np.linalg.norm(miter, axis=1)
+    reversal = miter_len < 1e-9
+    miter[reversal] = n_out[reversal]
+    miter /= np.maximum(np.linalg.norm(miter, axis=1), 1e-12)[:, None]
+    cos_half = np.maximum(np.einsum('ij,ij->i', miter, n_out), 1e-9)
+    scale = 1.0 / cos_half
+
+    turn = d_in[:, 0] * d_out[:, 1] - d_in[:, 1] * d_out[:, 0]
+    corner = (np.abs(turn) > 1e-9) | reversal
+    if join == 'bevel':
+        bevel = corner
+    else:
+        bevel = corner & (scale > miter_limit)
+    scale = np.minimum(scale, miter_limit)
+
+    left = coords + miter * hw * scale[:, None]
+    right = coords - miter * hw * scale[:, None]
+
+    # Bevelled vertices get a third vertex on the outer side of the turn
+    left_turn = turn > 0
+    outer_right = bevel & left_turn
+    outer_left = bevel & ~left_turn
+    verts_per = 2 + bevel.astype(np.int64)
+    base = np.cumsum(verts_per) - verts_per
+    points = np.empty((verts_per.sum(), 2))
+    points[base] = np.where(outer_right[:, None], coords - n_in * hw, right)
+    points[base + 1] = np.where(outer_left[:, None], coords + n_in * hw, left)
+    points[base[bevel] + 2] = np.where(outer_right[bevel][:, None],
+                                       coords[bevel] - n_out[bevel] * hw[bevel],
+                                       coords[bevel] + n_out[bevel] * hw[bevel])
+
+    r_in, l_in = base, base + 1
+    r_out = np.where(outer_right, base + 2, base)
+    l_out = np.where(outer_left, base + 2, base + 1)
+
+    # One quad per segment, wound so the face normal points up in the XZ plane
+    seg = idx[has_out]
+    quads = np.stack([r_out[seg], l_out[seg], l_in[nxt[seg]], r_in[nxt[seg]]], axis=1)
+
+    # One triangle per bevelled corner between the inner and both outer vertices
+    bev = idx[bevel]
+    tris = np.where(outer_right[bev][:, None],
+                    np.stack([l_in[bev], r_out[bev], r_in[bev]], axis=1),
+                    np.stack([r_in[bev], l_in[bev], l_out[bev]], axis=1))
+    tris = np.concatenate([tris, np.full((len(bev), 1), -1)], axis=1)
+
+    # Keep faces grouped per polyline and in path order
+    if _ribbon_faces_kernel.available:
+        faces = np.empty((len(quads) + len(tris), 4), dtype=np.int64)
+        _ribbon_faces_kernel(np.ascontiguousarray(quads, dtype=np.int64), np.ascontiguousarray(tris, dtype=np.int64),
+                             has_out, bevel, faces)
+        face_owner = np.repeat(ids, has_out.astype(np.int64) + bevel)
+    else:
+        faces = np.concatenate([quads, tris])
+        face_owner = np.concatenate([ids[seg], ids[bev]])
+        face_order = np.lexsort((np.concatenate([seg * 2 + 1, bev * 2]), face_owner))
+        faces = faces[face_order]
+        face_owner = face_owner[face_order]
+
+    face_vertex_counts = np.where(faces[:, 3] >= 0, 4, 3)
+    face_vertex_indices = faces[faces >= 0]
+    point_offsets = offsets_from_ids(np.repeat(ids, verts_per), num_lines)
+    face_offsets = offsets_from_ids(face_owner, num_lines)
+    return MeshBatch(points, face_vertex_counts, face_vertex_indices, point_offsets, face_offsets)
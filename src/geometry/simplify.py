@@ -0,0 +1,60 @@
+import numpy as np
+from .csr import item_ids
+
+def _segment_distance(p: np.ndarray, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Distance of points ``p`` to the segments ``a-b`` (row-wise)."""
+    ab = b - a
+    length_sq = np.einsum('ij,ij->i', ab, ab)
+    t = np.einsum('ij,ij->i', p - a, ab) / np.where(length_sq > 0, length_sq, 1.0)
+    t = np.clip(np.where(length_sq > 0, t, 0.0), 0.0, 1.0)
+    return np.linalg.norm(p - (a + ab * t[:, None]), axis=1)
+
+def simplify_mask(coords: np.ndarray, offsets: np.ndarray, tolerance: float) -> np.ndarray:
+    """Douglas-Peucker over every item of a CSR layout at once.
+
+    All open split ranges of all items are processed together per pass, so
+    the Python loop runs once per recursion level rather than once per
+    segment. Returns a boolean mask of the points to keep. Closed rings keep
+    at least a triangle; rings that would collapse are left untouched.
+    """
+    coords = np.asarray(coords, dtype=np.float64)
+    counts = np.diff(offsets)
+    nonempty = counts > 0
+    keep = np.zeros(len(coords), dtype=bool)
+    keep[offsets[:-1][nonempty]] = True
+    keep[offsets[1:][nonempty] - 1] = True
+    if tolerance <= 0:
+        keep[:] = True
+        return keep
+
+    a = offsets[:-1][counts > 2]
+    b = offsets[1:][counts > 2] - 1
+    while len(a):
+        lengths = b - a - 1
+        # Interior point indices of every open range, grouped by range
+        rid = np.repeat(np.arange(len(a)), lengths)
+        idx = a[rid] + 1 + (np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths))
+        dist = _segment_distance(coords[idx], coords[a[rid]], coords[b[rid]])
+
+        # Farthest point per range; ties resolve to the first candidate
+        first = np.cumsum(lengths) - lengths
+        far_dist = np.maximum.reduceat(dist, first)
+        candidates = np.flatnonzero(dist == far_dist[rid])
+        _, pick = np.unique(rid[candidates], return_index=True)
+        far = idx[candidates[pick]]
+
+        split = far_dist > tolerance
+        keep[far[split]] = True
+        a, b, far = a[split], b[split], far[split]
+        a, b = np.concatenate([a, far]), np.concatenate([far, b])
+        open_ranges = b - a > 1
+        a, b = a[open_ranges], b[open_ranges]
+
+    # Closed rings need three distinct corners to stay a polygon
+    ids = item_ids(offsets)
+    closed = (counts >= 4) & nonempty
+    closed[closed] = np.all(coords[offsets[:-1][closed]] == coords[offsets[1:][closed] - 1], axis=1)
+    kept = np.bincount(ids[keep], minlength=len(counts))
+    collapsed = closed & (kept < 4)
+    keep[collapsed[ids]] = True
+    return keep
@@ -0,0 +1,185 @@
+import hashlib
+import os
+import numpy as np
+from typing import Dict, Optional
+from .mesh import MeshBatch
+
+def _signed_area(ring: np.ndarray) -> float:
+    x, y = ring[:, 0], ring[:, 1]
+    return 0.5 * float(np.sum(x * np.roll(y, -1) - np.roll(x, -1) * y))
+
+def _clean_ring(ring: np.ndarray) -> np.ndarray:
+    """Return indices of a ring without repeated or closing points."""
+    keep = np.ones(len(ring), dtype=bool)
+    keep[1:] = np.any(ring[1:] != ring[:-1], axis=1)
+    indices = np.flatnonzero(keep)
+    if len(indices) > 1 and np.all(ring[indices[-1]] == ring[indices[0]]):
+        indices = indices[:-1]
+    return indices
+
+def _ear_clip(points: np.ndarray, ring: np.ndarray) -> np.ndarray:
+    """Ear-clip a counter-clockwise ring, returning (T, 3) point indices."""
+    n = len(ring)
+    if n < 3:
+        return np.zeros((0, 3), dtype=np.int64)
+
+    pts = points[ring]
+    nxt = np.roll(np.arange(n), -1)
+    prv = np.roll(np.arange(n), 1)
+    active = np.ones(n, dtype=bool)
+
+    def cross(a, b, c):
+        return (pts[b, 0] - pts[a, 0]) * (pts[c, 1] - pts[a, 1]) - (pts[b, 1] - pts[a, 1]) * (pts[c, 0] - pts[a, 0])
+
+    # Vectorized convexity of the whole ring; reflex vertices are the only ones
+    # that can lie inside a candidate ear
+    ab = pts - pts[prv]
+    bc = pts[nxt] - pts
+    reflex = ab[:, 0] * bc[:, 1] - ab[:, 1] * bc[:, 0] <= 0
+
+    def is_ear(i):
+        a, b, c = prv[i], i, nxt[i]
+        if cross(a, b, c) <= 0:
+            return False
+        candidates = np.flatnonzero(active & reflex)
+        if not len(candidates):
+            return True
+        p = pts[candidates]
+        tri = pts[[a, b, c]]
+        # Points sharing a position with the ear (self-touching rings) do not block it
+        same = np.any(np.all(p[:, None, :] == tri[None, :, :], axis=2), axis=1)
+        p = p[~same]
+        if not len(p):
+            return True
+        s1 = (tri[1, 0] - tri[0, 0]) * (p[:, 1] - tri[0, 1]) - (tri[1, 1] - tri[0, 1]) * (p[:, 0] - tri[0, 0])
+        s2 = (tri[2, 0] - tri[1, 0]) * (p[:, 1] - tri[1, 1]) - (tri[2, 1] - tri[1, 1]) * (p[:, 0] - tri[1, 0])
+        s3 = (tri[0, 0] - tri[2, 0]) * (p[:, 1] - tri[2, 1]) - (tri[0, 1] - tri[2, 1]) * (p[:, 0] - tri[2, 0])
+        return not np.any((s1 >= 0) & (s2 >= 0) & (s3 >= 0))
+
+    def clip(i, emit=True):
+        a, c = prv[i], nxt[i]
+        if emit:
+            triangles.append((ring[a], ring[i], ring[c]))
+        nxt[a], prv[c] = c, a
+        active[i] = False
+        reflex[a] = cross(prv[a], a, c) <= 0
+        reflex[c] = cross(a, c, nxt[c]) <= 0
+
+    triangles = []
+    remaining = n
+    i = 0
+    stalled = 0
+    while remaining > 3:
+        if is_ear(i):
+            following = nxt[i]
+            clip(i)
+            remaining -= 1
+            i = following
+            stalled = 0
+            continue
+
+        i = nxt[i]
+        stalled += 1
+        if stalled < remaining:
+            continue
+
+        # No valid ear left (self-touching or self-intersecting input): drop a
+        # degenerate vertex if there is one, else force the first convex vertex
+        ring_order = [i]
+        while len(ring_order) < remaining:
+            ring_order.append(nxt[ring_order[-1]])
+        areas = np.array([cross(prv[j], j, nxt[j]) for j in ring_order])
+        degenerate = np.flatnonzero(np.abs(areas) <= 1e-18)
+        if len(degenerate):
+            clip(ring_order[degenerate[0]], emit=False)
+        else:
+            convex = np.flatnonzero(areas > 0)
+            clip(ring_order[convex[0] if len(convex) else 0])
+        remaining -= 1
+        stalled = 0
+
+    a = i
+    if cross(prv[a], a, nxt[a]) != 0:
+        triangles.append((ring[prv[a]], ring[a], ring[nxt[a]]))
+    return np.array(triangles, dtype=np.int64).reshape(-1, 3)
+
+def triangulate_polygon(outer: np.ndarray) -> np.ndarray:
+    """Triangulate a simple polygon by plain ear clipping.
+
+    Returns an (T, 3) array of indices into ``outer``; triangles are
+    counter-clockwise in the XY plane whichever way the ring winds.
+    Repeated points and closing points are ignored. Polygons are clipped
+    one at a time in O(n^2) of their vertex count, which is why results go
+    through ``TriangulationCache``.
+    """
+    points = np.asarray(outer, dtype=np.float64).reshape(-1, 2)
+    ring = _clean_ring(points)
+    if len(ring) < 3:
+        return np.zeros((0, 3), dtype=np.int64)
+    if _signed_area(points[ring]) < 0:
+        ring = ring[::-1]
+    return _ear_clip(points, ring)
+
+class TriangulationCache:
+    """Caches polygon triangulations by a hash of their geometry.
+
+    Results are kept in memory and, when ``cache_dir`` is given, stored as
+    ``.npy`` files so later exports skip triangulation entirely.
+    """
+    def __init__(self, cache_dir: Optional[str] = None):
+        self.cache_dir = cache_dir
+        self.memory: Dict[str, np.ndarray] = {}
+        self.hits = 0
+        self.misses = 0
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def key(outer: np.ndarray) -> str:
+        """Hash the exact ring coordinates of a polygon."""
+        digest = hashlib.sha1()
+        ring = np.ascontiguousarray(outer, dtype=np.float64)
+        digest.update(np.int64(len(ring)).tobytes())
+        digest.update(ring.tobytes())
+        return digest.hexdigest()
+
+    def triangulate(self, outer: np.ndarray) -> np.ndarray:
+        """Return the cached ``(T, 3)`` int64 triangulation of a polygon, computing it once."""
+        key = self.key(outer)
+        triangles = self.memory.get(key)
+        if triangles is not None:
+            self.hits += 1
+            return triangles
+
+        path = os.path.join(self.cache_dir, f'{key}.npy') if self.cache_dir else None
+        if path and os.path.exists(path):
+            # Stored as int32 to halve the files; returned as int64 either way
+            triangles = np.load(path).astype(np.int64)
+            self.hits += 1
+        else:
+            triangles = triangulate_polygon(outer).astype(np.int64, copy=False)
+            self.misses += 1
+            if path:
+                # Write atomically so concurrent exporters never read a partial file
+                temp_path = f'{path}.{os.getpid()}.tmp'
+                with open(temp_path, 'wb') as f:
+                    np.save(f, triangles.astype(np.int32))
+                os.replace(temp_path, path)
+        self.memory[key] = triangles
+        return triangles
+
+def triangulate_polygons(coords: np.ndarray, offsets: np.ndarray,
+                         cache: Optional[TriangulationCache] = None) -> MeshBatch:
+    """Triangulate many hole-free polygons stored in CSR layout, one ``triangulate_polygon`` each.
+
+    The returned batch shares ``coords`` as its points; triangles of polygon
+    ``i`` index into ``coords[offsets[i]:offsets[i + 1]]`` globally.
+    """
+    cache = cache or TriangulationCache()
+    triangles = [cache.triangulate(coords[offsets[i]:offsets[i + 1]]) + offsets[i]
+                 for i in range(len(offsets) - 1)]
+    face_offsets = np.zeros(len(triangles) + 1, dtype=np.int64)
+    np.cumsum([len(t) for t in triangles], out=face_offsets[1:])
+    indices = np.concatenate(triangles).reshape(-1) if triangles else np.zeros(0, dtype=np.int64)
+    counts = np.full(face_offsets[-1], 3, dtype=np.int64)
+    return MeshBatch(coords, counts, indices, np.asarray(offsets, dtype=np.int64), face_offsets)
@@ -0,0 +1,96 @@
+from typing import Dict, FrozenSet, Iterable, List, Mapping, Optional, Tuple, Union
+import numpy as np
+from src.geometry.csr import item_ids
+
+# Feature categories of ``classify_tags``
+OTHER, LAND, WATER = 0, 1, 2
+CATEGORY_NAMES = ('other', 'land', 'water')
+
+# Tag rules: key -> the values that match, or None for any value
+TagRules = Mapping[str, Optional[FrozenSet[str]]]
+
+WATER_TAGS: TagRules = {
+    'natural': frozenset({'water', 'bay', 'strait'}),
+    'water': None,
+    'waterway': None,
+}
+# Land authored as green surface meshes by the USD export
+LAND_TAGS: TagRules = {
+    'natural': frozenset({'wood', 'scrub', 'heath', 'grassland', 'forest', 'beach'}),
+    'landuse': frozenset({'forest', 'grass', 'meadow', 'recreation_ground', 'park'}),
+    'leisure': frozenset({'park', 'garden', 'nature_reserve'}),
+}
+# The land preview also outlines built-up and farmed land, which the export leaves to buildings and roads
+PREVIEW_LAND_TAGS: TagRules = {
+    **LAND_TAGS,
+    'natural': LAND_TAGS['natural'] | {'land'},
+    'landuse': LAND_TAGS['landuse'] | {'residential', 'farmland', 'industrial', 'commercial'},
+}
+
+Tags = Union[Mapping[str, str], Iterable[Tuple[str, str]]]
+
+class TagTable:
+    """Tags of many elements, dictionary-encoded once into integer codes.
+
+    Item ``i`` owns the tags ``key_codes[offsets[i]:offsets[i + 1]]`` and
+    ``value_codes[...]``; codes index ``keys`` and ``values``. Predicates
+    over tags then become array operations over all items at once.
+    """
+    def __init__(self, keys: List[str], values: List[str], key_codes: np.ndarray,
+                 value_codes: np.ndarray, offsets: np.ndarray):
+        self.keys = keys
+        self.values = values
+        self.key_codes = key_codes
+        self.value_codes = value_codes
+        self.offsets = offsets
+        self.key_index = {key: code for code, key in enumerate(keys)}
+        self.value_index = {value: code for code, value in enumerate(values)}
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    @classmethod
+    def from_tags(cls, items: Iterable[Tags]) -> 'TagTable':
+        """Encode one tag mapping (or sequence of ``(key, value)`` pairs) per item."""
+        keys: Dict[str, int] = {}
+        values: Dict[str, int] = {}
+        key_codes, value_codes, counts = [], [], []
+        for tags in items:
+            pairs = tags.items() if isinstance(tags, Mapping) else tags
+            count = 0
+            for key, value in pairs:
+                key_codes.append(keys.setdefault(key, len(keys)))
+                value_codes.append(values.setdefault(value, len(values)))
+                count += 1
+            counts.append(count)
+        offsets = np.zeros(len(counts) + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+        return cls(list(keys), list(values), np.array(key_codes, dtype=np.int32),
+                   np.array(value_codes, dtype=np.int32), offsets)
+
+    def match(self, rules: TagRules) -> np.ndarray:
+        """Return a bool per item: True when any of its tags matches ``rules``."""
+        hits = np.zeros(len(self.key_codes), dtype=bool)
+        for key, accepted in rules.items():
+            key_code = self.key_index.get(key)
+            if key_code is None:
+                continue
+            has_key = self.key_codes == key_code
+            if accepted is None:
+                hits |= has_key
+            else:
+                value_codes = [self.value_index[v] for v in accepted if v in self.value_index]
+                hits |= has_key & np.isin(self.value_codes, value_codes)
+        matched = np.zeros(len(self), dtype=bool)
+        matched[item_ids(self.offsets)[hits]] = True
+        return matched
+
+def classify_tags(table: TagTable, land: TagRules = LAND_TAGS, water: TagRules = WATER_TAGS) -> np.ndarray:
+    """Return the category (``OTHER``, ``LAND`` or ``WATER``) of every item of a tag table.
+
+    Water takes precedence over land, whatever order the tags come in.
+    """
+    categories = np.full(len(table), OTHER, dtype=np.uint8)
+    categories[table.match(land)] = LAND
+    categories[table.match(water)] = WATER
+    return categories
@@ -1,5 +1,10 @@
-from typing import List
+from itertools import chain
+from typing import List, Sequence, Tuple
 import xml.etree.ElementTree as ET
+import numpy as np
+from src.geometry.accel import kernel
+from src.geometry.csr import compress
+from src.profiling import instrument
 from .bounds import Bounds
 from .node import Node
 from .way import Way
@@ -7,6 +12,32 @@ from .relation import Relation
 from .tag import Tag
 from .member import Member
 
+@kernel(example=lambda: (np.array([1, 5, 9], dtype=np.int64), np.array([5, 7], dtype=np.int64),
+                          np.zeros(2, dtype=np.int64)))
+def _resolve_kernel(node_ids, refs, positions):
+    # Binary search of every reference, -1 when it is missing
+    for i in range(len(refs)):
+        low, high = 0, len(node_ids)
+        while low < high:
+            middle = (low + high) // 2
+            if node_ids[middle] < refs[i]:
+                low = middle + 1
+            else:
+                high = middle
+        positions[i] = low if low < len(node_ids) and node_ids[low] == refs[i] else -1
+
+def resolve_refs(node_ids: np.ndarray, refs: np.ndarray) -> np.ndarray:
+    """Return the index of every reference in sorted ``node_ids``, or -1 when it is missing."""
+    if _resolve_kernel.available:
+        positions = np.empty(len(refs), dtype=np.int64)
+        _resolve_kernel(np.ascontiguousarray(node_ids, dtype=np.int64),
+                        np.ascontiguousarray(refs, dtype=np.int64), positions)
+        return positions
+    if not len(node_ids):
+        return np.full(len(refs), -1, dtype=np.int64)
+    position = np.minimum(np.searchsorted(node_ids, refs), len(node_ids) - 1)
+    return np.where(node_ids[position] == refs, position, -1)
+
 class OSM:
     """Main class for handling OpenStreetMap data."""
     def __init__(self, version: str = "0.6", generator: str = None):
@@ -17,7 +48,36 @@ class OSM:
         self.ways: List[Way] = []
         self.relations: List[Relation] = []
     
+    def node_arrays(self, visible_only: bool = True) -> Tuple[np.ndarray, np.ndarray]:
+        """Return node ids sorted ascending and their ``(lon, lat)`` as an (N, 2) array."""
+        nodes = [node for node in self.nodes if node.visible or not visible_only]
+        ids = np.fromiter((node.id for node in nodes), dtype=np.int64, count=len(nodes))
+        coords = np.array([(node.lon, node.lat) for node in nodes], dtype=np.float64).reshape(-1, 2)
+        order = np.argsort(ids, kind='stable')
+        return ids[order], coords[order]
+
+    def way_coordinates(self, ways: Sequence[Way], node_ids: np.ndarray = None,
+                        node_coords: np.ndarray = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Resolve the node references of ``ways`` to ``(lon, lat)`` in CSR layout.
+
+        All references are looked up in one ``resolve_refs`` pass over the sorted
+        node ids (``node_arrays`` by default); references to unknown nodes
+        are dropped. Returns ``(coords, offsets)`` with one item per way.
+        """
+        if node_ids is None:
+            node_ids, node_coords = self.node_arrays()
+        counts = np.fromiter((len(way.nodes) for way in ways), dtype=np.int64, count=len(ways))
+        offsets = np.zeros(len(ways) + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+        refs = np.fromiter(chain.from_iterable(way.nodes for way in ways), dtype=np.int64, count=offsets[-1])
+        position = resolve_refs(node_ids, refs)
+        found = position >= 0
+        if not len(node_ids):
+            return compress(np.zeros((len(refs), 2)), offsets, found)
+        return compress(node_coords[np.maximum(position, 0)], offsets, found)
+
     @classmethod
+    @instrument.timed('parse_xml')
     def from_xml(cls, xml_path: str) -> 'OSM':
         """Create an OSM object from an XML file."""
         try:
@@ -109,6 +169,9 @@ class OSM:
                 
                 osm.relations.append(relation)
             
+            instrument.count('osm.nodes', len(osm.nodes))
+            instrument.count('osm.ways', len(osm.ways))
+            instrument.count('osm.relations', len(osm.relations))
             return osm
         except ET.ParseError as e:
             raise ValueError(f"Invalid XML file: {str(e)}")
@@ -0,0 +1,308 @@
+import argparse
+import hashlib
+import json
+import os
+import pickle
+import time
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+from src.examples.parse_json import JsonHandler
+from src.osm.classify import LAND_TAGS, WATER_TAGS
+from src.profiling import instrument
+from src.tiles.encode import add_texture_argument
+from src.usd.stage import add_format_argument, format_path, output_format_path, save_stage
+
+# Part of every stage key; bump it when what a stage computes changes
+PIPELINE_VERSION = 3
+
+# Handler attributes that make up the feature state passed between stages
+STATE_ATTRIBUTES = ('nodes', 'ways', 'water_features', 'land_features', 'area_candidates',
+                    'roads', 'point_features', 'all_coords')
+
+class Stage(NamedTuple):
+    """One pipeline step.
+
+    ``after`` is the stage whose output this one consumes, ``settings`` the
+    handler attributes it reads, and ``state`` whether it changes the
+    feature state (which is then cached for the stages after it).
+    """
+    name: str
+    after: Optional[str]
+    settings: Tuple[str, ...]
+    state: bool
+
+STAGES = (
+    Stage('ingest', None, (), True),
+    Stage('filter', 'ingest', ('min_lat', 'max_lat', 'min_lon', 'max_lon'), True),
+    Stage('classify', 'filter', (), True),
+    Stage('project', 'classify', ('SCALE',), True),
+    Stage('author', 'project', ('HEIGHT_SCALE', 'ROAD_JOIN', 'ROAD_MITER_LIMIT', 'MERGE_ROADS', 'INSTANCE_REPEATS',
+                             'INSTANCE_TOLERANCE', 'INSTANCE_MIN_COPIES', 'LOD_TOLERANCES', 'POINT_CLASSES',
+                             'POINT_PROTOTYPES', 'MATERIAL_COLORS', 'LAND_COLORS', 'ROAD_COLORS',
+                             'EXPORT_CATEGORIES'), False),
+    Stage('texture', 'project', ('FETCH_GROUND_TEXTURE', 'GROUND_TEXTURE_SOURCE', 'GROUND_TEXTURE_ZOOM',
+                                 'GROUND_TEXTURE_TILED', 'GROUND_TEXTURE_MIN_ZOOM', 'TILE_URL', 'TILE_OFFLINE',
+                                 'TEXTURE_FORMAT', 'TEXTURE_COMPRESSION', 'TEXTURE_QUALITY',
+                                 'RASTER_METERS_PER_PIXEL', 'RASTER_COLORS'), False),
+)
+STAGE_NAMES = tuple(stage.name for stage in STAGES)
+
+def file_digest(path: str) -> str:
+    """Hash the content of an input file."""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(2 ** 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def file_signature(path: str) -> Optional[List[int]]:
+    """Return the size and modification time of an output file, or None if it is missing."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return [stat.st_size, stat.st_mtime_ns]
+
+class Pipeline:
+    """Convert OSM XML/PBF or Overpass JSON files to USD in cacheable stages.
+
+    Stages run in the order of ``STAGES``: ingest parses the inputs without
+    an area filter, filter crops them to the area of interest, classify
+    sorts land and water, project fixes the local frame, author meshes the
+    features and writes their layer, and texture writes the ground texture
+    and the root stage that sublayers the features. Both write next to
+    ``output_path``, in ``<name>_layers``; triangulations are reused across
+    runs through the handler's ``TriangulationCache``. Every stage is keyed
+    by a hash of its inputs (the key of the stage it consumes) and the
+    settings it reads, and skipped when ``cache_dir`` holds a result for
+    that key; changing only material colors, for example, reruns only the
+    author stage.
+    """
+    def __init__(self, inputs: Sequence[str], output_path: str, handler: JsonHandler, fmt: str = None,
+                 cache_dir: Optional[str] = None):
+        self.inputs = [os.path.abspath(path) for path in inputs]
+        self.output_path = os.path.abspath(format_path(output_path, fmt))
+        self.handler = handler
+        self.fmt = fmt
+        current_dir = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+        self.cache_dir = cache_dir or os.path.join(current_dir, 'output', 'cache', 'pipeline')
+        stem, extension = os.path.splitext(os.path.basename(self.output_path))
+        self.features_path = os.path.join(os.path.dirname(self.output_path), f'{stem}_layers', f'features{extension}')
+        # Ground textures belong to this output, not the shared output/ directory
+        handler.texture_dir = os.path.dirname(self.features_path)
+        self.center = None
+        self.keys: Dict[str, str] = {}
+        self.loaded = None  # key of the state currently held by the handler
+        self.report: List[dict] = []
+
+    def stage_key(self, stage: Stage) -> str:
+        digest = hashlib.blake2b(digest_size=16)
+        upstream = self.keys[stage.after] if stage.after else None
+        settings = {name: getattr(self.handler, name) for name in stage.settings}
+        digest.update(repr((PIPELINE_VERSION, stage.name, upstream, settings, self.stage_inputs(stage))).encode())
+        return digest.hexdigest()
+
+    def stage_inputs(self, stage: Stage):
+        """Return what a stage depends on beyond its upstream key and handler settings."""
+        if stage.name == 'ingest':
+            return [(path, file_digest(path)) for path in self.inputs]
+        if stage.name == 'classify':
+            # Sorted, as set order changes with the string hash seed
+            return [{key: sorted(values or ()) for key, values in rules.items()} for rules in (LAND_TAGS, WATER_TAGS)]
+        if stage.name == 'author':
+            return self.features_path
+        if stage.name == 'texture':
+            return self.output_path, os.path.relpath(self.features_path, os.path.dirname(self.output_path))
+        return None
+
+    def state_key(self, stage: Stage) -> str:
+        """Return the key of the cached state a stage produces or passes through."""
+        while not stage.state:
+            stage = next(s for s in STAGES if s.name == stage.after)
+        return self.keys[stage.name]
+
+    def cache_path(self, name: str, key: str, extension: str) -> str:
+        return os.path.join(self.cache_dir, f'{name}-{key}.{extension}')
+
+    def is_cached(self, stage: Stage) -> bool:
+        try:
+            with open(self.cache_path(stage.name, self.keys[stage.name], 'json'), 'r', encoding='utf-8') as f:
+                record = json.load(f)
+        except (OSError, ValueError):
+            return False
+        # Written files must still be there as they were left, not rewritten by another run
+        return all(file_signature(path) == signature for path, signature in record['outputs'])
+
+    @instrument.timed('load_state')
+    def load_state(self, key: str):
+        if self.loaded == key:
+            return
+        with open(self.cache_path('state', key, 'pkl'), 'rb') as f:
+            state = pickle.load(f)
+        for name in STATE_ATTRIBUTES:
+            setattr(self.handler, name, state[name])
+        self.center = state['center']
+        self.loaded = key
+
+    @instrument.timed('save_state')
+    def save_state(self, key: str):
+        state = {name: getattr(self.handler, name) for name in STATE_ATTRIBUTES}
+        state['center'] = self.center
+        path = self.cache_path('state', key, 'pkl')
+        temp_path = f'{path}.{os.getpid()}.tmp'
+        with open(temp_path, 'wb') as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, path)
+        self.loaded = key
+
+    def run(self, force: Sequence[str] = ()) -> List[dict]:
+        """Run every stage whose result is not cached (or is named in ``force``).
+
+        Returns one ``{'stage', 'key', 'cached', 'seconds'}`` record per stage.
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.report = []
+        for stage in STAGES:
+            self.keys[stage.name] = self.stage_key(stage)
+
+        for stage in STAGES:
+            key = self.keys[stage.name]
+            cached = stage.name not in force and self.is_cached(stage)
+            start = time.perf_counter()
+            outputs = []
+            if cached:
+                instrument.count('pipeline.stages_cached')
+            else:
+                with instrument.stage(stage.name):
+                    if stage.after:
+                        self.load_state(self.state_key(next(s for s in STAGES if s.name == stage.after)))
+                    outputs = getattr(self, f'run_{stage.name}')() or []
+                    if stage.state:
+                        self.save_state(key)
+                        # Later stages load it, so a deleted state invalidates the stage
+                        outputs.append(self.cache_path('state', key, 'pkl'))
+                    with open(self.cache_path(stage.name, key, 'json'), 'w', encoding='utf-8') as f:
+                        json.dump({'stage': stage.name,
+                                   'outputs': [(path, file_signature(path)) for path in outputs]}, f)
+            seconds = time.perf_counter() - start
+            print(f"[{stage.name}] {'cached' if cached else f'done in {seconds:.2f}s'} ({key[:12]})")
+            self.report.append({'stage': stage.name, 'key': key, 'cached': cached, 'seconds': seconds})
+        return self.report
+
+    def run_ingest(self):
+        handler = self.handler
+        area = handler.min_lat, handler.max_lat, handler.min_lon, handler.max_lon
+        # Parse everything; the filter stage applies the area so changing it keeps this stage cached
+        handler.min_lat, handler.max_lat, handler.min_lon, handler.max_lon = -90.0, 90.0, -180.0, 180.0
+        try:
+            for path in self.inputs:
+                if path.endswith('.json'):
+                    with open(path, 'r', encoding='utf-8') as f:
+                        handler.process_json(json.load(f), classify=False)
+                else:
+                    handler.process_osm_file(path, classify=False)
+        finally:
+            handler.min_lat, handler.max_lat, handler.min_lon, handler.max_lon = area
+        print(f"Ingested {len(handler.nodes)} nodes, {len(handler.ways)} buildings, {len(handler.roads)} roads")
+
+    def run_filter(self):
+        self.handler.crop_to_area()
+
+    def run_classify(self):
+        self.handler.classify_features()
+        print(f"Classified {len(self.handler.water_features)} water and {len(self.handler.land_features)} land features")
+
+    def run_project(self):
+        if not self.handler.all_coords:
+            raise ValueError("No coordinates inside the area of interest")
+        self.center = self.handler.compute_center()
+        print(f"Center coordinates: {self.center[0]}, {self.center[1]}")
+
+    def run_author(self):
+        os.makedirs(os.path.dirname(self.features_path), exist_ok=True)
+        if os.path.exists(self.features_path):
+            os.remove(self.features_path)
+        self.handler.write_layer(self.features_path, None, None, *self.center)
+        cache = self.handler.triangulation_cache
+        print(f"Triangulation cache: {cache.hits} hits, {cache.misses} misses")
+        return [self.features_path]
+
+    def run_texture(self):
+        os.makedirs(os.path.dirname(self.output_path), exist_ok=True)
+        if os.path.exists(self.output_path):
+            os.remove(self.output_path)
+        stage = self.handler.create_root_stage(self.output_path, *self.center)
+        stage.GetRootLayer().subLayerPaths = [
+            './' + os.path.relpath(self.features_path, os.path.dirname(self.output_path)).replace(os.sep, '/')]
+        save_stage(stage)
+        return [self.output_path] + self.handler.texture_files
+
+def as_tuples(value):
+    """Turn JSON lists into tuples, the form handler settings such as colors take."""
+    if isinstance(value, list):
+        return tuple(as_tuples(item) for item in value)
+    if isinstance(value, dict):
+        return {key: as_tuples(item) for key, item in value.items()}
+    return value
+
+def parse_setting(assignment: str):
+    """Parse a ``NAME=VALUE`` override; VALUE is JSON where it parses, a string otherwise."""
+    name, _, value = assignment.partition('=')
+    try:
+        return name, as_tuples(json.loads(value))
+    except ValueError:
+        return name, value
+
+def main():
+    current_dir = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+    parser = argparse.ArgumentParser(description="Convert OSM XML/PBF or Overpass JSON to USD in cached stages")
+    parser.add_argument('inputs', nargs='+', help="Input files, parsed in order (.json is Overpass JSON)")
+    parser.add_argument('-o', '--output', default=os.path.join(current_dir, 'output', 'osm2usd'),
+                        help="Root USD file (usdc without an extension); features and ground textures go to "
+                             "<name>_layers next to it")
+    parser.add_argument('--aoi', nargs=4, type=float, metavar=('MIN_LAT', 'MAX_LAT', 'MIN_LON', 'MAX_LON'),
+                        help="Area of interest (default: the handler's Den Helder area)")
+    parser.add_argument('--zoom', type=int, default=None, help="Zoom level of the ground texture tiles")
+    parser.add_argument('--ground', choices=('tiles', 'raster', 'none'), default=None,
+                        help="Ground texture from map tiles, rasterized features, or a plain plane")
+    parser.add_argument('--set', action='append', default=[], metavar='NAME=VALUE', dest='settings',
+                        help="Override a handler setting, e.g. MATERIAL_COLORS='{\"building\": [0.9, 0.5, 0.4]}'")
+    parser.add_argument('--cache-dir', default=None, help="Stage cache directory (default: output/cache/pipeline)")
+    parser.add_argument('--force', nargs='*', choices=STAGE_NAMES, default=(),
+                        help="Rerun these stages (all when given without names) even if cached")
+    parser.add_argument('--report', help="Optional JSON file for the per-stage report")
+    add_format_argument(parser)
+    add_texture_argument(parser)
+    instrument.add_instrument_arguments(parser)
+    args = parser.parse_args()
+
+    handler = JsonHandler()
+    if args.aoi:
+        handler.min_lat, handler.max_lat, handler.min_lon, handler.max_lon = args.aoi
+    if args.zoom is not None:
+        handler.GROUND_TEXTURE_ZOOM = args.zoom
+    if args.ground == 'none':
+        handler.FETCH_GROUND_TEXTURE = False
+    elif args.ground:
+        handler.GROUND_TEXTURE_SOURCE = args.ground
+    if args.texture:
+        handler.use_texture_preset(args.texture)
+    for name, value in map(parse_setting, args.settings):
+        if not hasattr(handler, name):
+            parser.error(f"Unknown setting '{name}'")
+        current = getattr(handler, name)
+        # Dictionaries are updated, so one color can change without repeating the others
+        if isinstance(current, dict) and isinstance(value, dict):
+            value = {**current, **value}
+        setattr(handler, name, value)
+
+    output = output_format_path(parser, args.output, args.format)
+    pipeline = Pipeline(args.inputs, output, handler, args.format, args.cache_dir)
+    force = STAGE_NAMES if args.force == [] else args.force
+    with instrument.instrumented(args.metrics, args.trace, args.trace_memory):
+        report = pipeline.run(force)
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
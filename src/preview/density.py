@@ -0,0 +1,229 @@
+import math
+from typing import Dict, Optional, Sequence, Tuple
+import numpy as np
+import osmium
+from src.profiling import instrument
+from src.tiles.mosaic import StreamingPngWriter
+
+Bounds = Tuple[float, float, float, float]  # (min_lon, min_lat, max_lon, max_lat)
+
+# Feature classes of the per-class preview and their colors; ways take the first key they have
+DENSITY_CLASSES: Dict[str, Tuple[int, int, int]] = {
+    'nodes': (120, 160, 255),
+    'building': (255, 140, 60),
+    'highway': (255, 255, 255),
+    'railway': (200, 120, 255),
+    'waterway': (60, 160, 255),
+    'natural': (80, 220, 100),
+    'landuse': (200, 220, 80),
+    'other': (255, 80, 80),
+}
+BACKGROUND = (0, 0, 0)
+
+class DensityGrid:
+    """Counts of points per pixel over a lon/lat box, optionally one channel per class.
+
+    Points are binned chunk by chunk, so memory is the grid plus one chunk
+    whatever the number of points added.
+    """
+    def __init__(self, bounds: Bounds, width: int, height: Optional[int] = None,
+                 classes: Sequence[str] = ('all',)):
+        min_lon, min_lat, max_lon, max_lat = bounds
+        if height is None:
+            # Keep pixels roughly square on the ground
+            aspect = (max_lat - min_lat) / ((max_lon - min_lon) * math.cos(math.radians((min_lat + max_lat) / 2)))
+            height = max(1, int(round(width * aspect)))
+        self.bounds = bounds
+        self.width = width
+        self.height = height
+        self.classes = list(classes)
+        self.counts = np.zeros((len(self.classes), height, width), dtype=np.uint32)
+
+    def to_pixels(self, coords: np.ndarray) -> np.ndarray:
+        """Return fractional ``(x, y)`` pixel positions of ``(lon, lat)`` coordinates, y pointing south."""
+        min_lon, min_lat, max_lon, max_lat = self.bounds
+        scale = np.array([self.width / (max_lon - min_lon), -self.height / (max_lat - min_lat)])
+        return (np.asarray(coords, dtype=np.float64) - (min_lon, max_lat)) * scale
+
+    def add_pixels(self, pixels: np.ndarray, class_index=0):
+        """Count fractional pixel positions; ``class_index`` is a scalar or one index per point."""
+        columns = np.floor(pixels[:, 0]).astype(np.int64)
+        rows = np.floor(pixels[:, 1]).astype(np.int64)
+        inside = (columns >= 0) & (columns < self.width) & (rows >= 0) & (rows < self.height)
+        classes = np.broadcast_to(np.asarray(class_index, dtype=np.int64), rows.shape)[inside]
+        flat = (classes * self.height + rows[inside]) * self.width + columns[inside]
+        # Sorting the chunk keeps the update proportional to the chunk, not the grid
+        cells, hits = np.unique(flat, return_counts=True)
+        self.counts.reshape(-1)[cells] += hits.astype(np.uint32)
+
+    def add_points(self, coords: np.ndarray, class_index=0):
+        """Count ``(lon, lat)`` points."""
+        if len(coords):
+            self.add_pixels(self.to_pixels(coords), class_index)
+
+    def add_segments(self, coords: np.ndarray, offsets: np.ndarray, class_index=0):
+        """Count CSR polylines, sampled about once per pixel along every segment.
+
+        ``class_index`` is a scalar or one index per polyline.
+        """
+        pixels = self.to_pixels(coords)
+        items = np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+        segment = np.flatnonzero(items[1:] == items[:-1])
+        if not len(segment):
+            return
+        start, delta = pixels[segment], pixels[segment + 1] - pixels[segment]
+        samples = np.maximum(np.ceil(np.hypot(delta[:, 0], delta[:, 1])), 1).astype(np.int64)
+        owner = np.repeat(np.arange(len(segment)), samples)
+        step = np.arange(len(owner)) - np.repeat(np.cumsum(samples) - samples, samples)
+        t = (step / samples[owner])[:, None]
+        classes = np.asarray(class_index, dtype=np.int64)
+        if classes.ndim:
+            classes = classes[items[segment]][owner]
+        self.add_pixels(start[owner] + t * delta[owner], classes)
+
+def tone_map(counts: np.ndarray, scale: float) -> np.ndarray:
+    """Map counts to ``[0, 1]`` on a log scale where ``scale`` counts are full intensity."""
+    return np.minimum(np.log1p(counts) / math.log1p(max(scale, 1.0)), 1.0)
+
+def write_density_png(grid: DensityGrid, path: str, palette: Optional[Sequence[Tuple[int, int, int]]] = None,
+                      background=BACKGROUND, percentile: float = 99.9, band_rows: int = 256) -> str:
+    """Tone-map a grid and stream it to a PNG, blending class colors by their share of each pixel.
+
+    Intensity saturates at the ``percentile`` of the non-empty pixel totals,
+    so a few very dense pixels do not darken the rest. Returns ``path``.
+    """
+    palette = np.array(palette if palette is not None else [(255, 255, 255)] * len(grid.classes), dtype=np.float64)
+    background = np.asarray(background, dtype=np.float64)
+    totals = grid.counts.sum(axis=0, dtype=np.uint64)
+    nonzero = totals[totals > 0]
+    scale = float(np.percentile(nonzero, percentile)) if len(nonzero) else 1.0
+
+    with StreamingPngWriter(path, grid.width, grid.height) as writer:
+        for top in range(0, grid.height, band_rows):
+            counts = grid.counts[:, top:top + band_rows].astype(np.float64)
+            total = counts.sum(axis=0)
+            share = counts / np.maximum(total, 1.0)
+            color = np.einsum('chw,ck->hwk', share, palette)
+            intensity = tone_map(total, scale)[..., None]
+            band = background * (1 - intensity) + color * intensity
+            writer.write_rows(np.clip(np.rint(band), 0, 255).astype(np.uint8))
+    return path
+
+class DensityHandler(osmium.SimpleHandler):
+    """Stream nodes and way segments of an OSM file into a ``DensityGrid``.
+
+    Coordinates are buffered up to ``chunk_size`` points and then binned in
+    one vectorized pass. With ``per_class`` the grid channels follow
+    ``DENSITY_CLASSES``.
+    """
+    def __init__(self, grid: DensityGrid, per_class: bool = False, chunk_size: int = 1 << 18):
+        super(DensityHandler, self).__init__()
+        self.grid = grid
+        self.per_class = per_class
+        self.chunk_size = chunk_size
+        self.way_keys = [name for name in grid.classes if name not in ('nodes', 'other')]
+        self.node_class = grid.classes.index('nodes') if per_class else 0
+        self.other_class = grid.classes.index('other') if per_class else 0
+        self.node_buffer = np.empty((chunk_size, 2), dtype=np.float64)
+        self.node_count = 0
+        self.way_coords = []
+        self.way_counts = []
+        self.way_classes = []
+        self.way_points = 0
+        self.nodes = 0
+        self.ways = 0
+
+    def node(self, n):
+        self.node_buffer[self.node_count] = (n.location.lon, n.location.lat)
+        self.node_count += 1
+        self.nodes += 1
+        if self.node_count == self.chunk_size:
+            self.flush_nodes()
+
+    def way(self, w):
+        coords = [(n.location.lon, n.location.lat) for n in w.nodes if n.location.valid()]
+        if len(coords) < 2:
+            return
+        class_index = 0
+        if self.per_class:
+            class_index = next((self.grid.classes.index(key) for key in self.way_keys if key in w.tags),
+                               self.other_class)
+        self.way_coords.extend(coords)
+        self.way_counts.append(len(coords))
+        self.way_classes.append(class_index)
+        self.way_points += len(coords)
+        self.ways += 1
+        if self.way_points >= self.chunk_size:
+            self.flush_ways()
+
+    def flush_nodes(self):
+        self.grid.add_points(self.node_buffer[:self.node_count], self.node_class)
+        self.node_count = 0
+
+    def flush_ways(self):
+        if self.way_counts:
+            offsets = np.zeros(len(self.way_counts) + 1, dtype=np.int64)
+            np.cumsum(self.way_counts, out=offsets[1:])
+            self.grid.add_segments(np.array(self.way_coords, dtype=np.float64), offsets,
+                                   np.array(self.way_classes, dtype=np.int64))
+        self.way_coords, self.way_counts, self.way_classes, self.way_points = [], [], [], 0
+
+    def flush(self):
+        self.flush_nodes()
+        self.flush_ways()
+
+def file_bounds(osm_path: str) -> Optional[Bounds]:
+    """Return the bounding box from an OSM file header, or None if it has none."""
+    reader = osmium.io.Reader(osm_path, osmium.osm.osm_entity_bits.NOTHING)
+    try:
+        box = reader.header().box()
+    finally:
+        reader.close()
+    if not box.valid():
+        return None
+    return box.bottom_left.lon, box.bottom_left.lat, box.top_right.lon, box.top_right.lat
+
+class BoundsHandler(osmium.SimpleHandler):
+    """Find the bounding box of all nodes, for files without a header box."""
+    def __init__(self):
+        super(BoundsHandler, self).__init__()
+        self.bounds = [math.inf, math.inf, -math.inf, -math.inf]
+
+    def node(self, n):
+        lon, lat = n.location.lon, n.location.lat
+        bounds = self.bounds
+        if lon < bounds[0]: bounds[0] = lon
+        if lat < bounds[1]: bounds[1] = lat
+        if lon > bounds[2]: bounds[2] = lon
+        if lat > bounds[3]: bounds[3] = lat
+
+@instrument.timed('density_preview')
+def density_preview(osm_path: str, output_path: str, width: int = 2048, per_class: bool = False,
+                    bounds: Optional[Bounds] = None, chunk_size: int = 1 << 18,
+                    index: str = 'flex_mem') -> DensityGrid:
+    """Render a density preview of an OSM file to a PNG without a display.
+
+    Nodes and way segments are streamed into a ``width`` pixel wide count
+    grid over ``bounds`` (the file header box, or a first pass over the
+    nodes if it has none) and tone-mapped. ``index`` is the osmium node
+    location index; use a file-backed one such as 'dense_file_array' for
+    planet-scale extracts.
+    """
+    bounds = bounds or file_bounds(osm_path)
+    if bounds is None:
+        scan = BoundsHandler()
+        scan.apply_file(osm_path)
+        bounds = tuple(scan.bounds)
+    classes = list(DENSITY_CLASSES) if per_class else ['all']
+    grid = DensityGrid(bounds, width, classes=classes)
+
+    handler = DensityHandler(grid, per_class, chunk_size)
+    handler.apply_file(osm_path, locations=True, idx=index)
+    handler.flush()
+    print(f"Binned {handler.nodes} nodes and {handler.ways} ways into a {grid.width}x{grid.height} grid")
+    instrument.count('osm.nodes', handler.nodes)
+    instrument.count('osm.ways', handler.ways)
+
+    palette = [DENSITY_CLASSES[name] for name in classes] if per_class else None
+    write_density_png(grid, output_path, palette)
+    return grid
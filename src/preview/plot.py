@@ -0,0 +1,82 @@
+import numpy as np
+from typing import Optional, Sequence
+from matplotlib.collections import LineCollection, PolyCollection
+
+# Annotations are slow to lay out and unreadable in bulk, so only this many are drawn by default
+MAX_ANNOTATIONS = 25
+
+def split_items(coords: np.ndarray, offsets: np.ndarray, min_points: int = 1):
+    """Return the items of a CSR layout as a list of (n, 2) views, dropping short ones."""
+    counts = np.diff(offsets)
+    keep = counts >= min_points
+    items = np.split(coords, offsets[1:-1])
+    return [item for item, kept in zip(items, keep) if kept], keep
+
+def add_lines(ax, coords: np.ndarray, offsets: np.ndarray, colors=None, **style) -> Optional[LineCollection]:
+    """Draw every CSR polyline as one ``LineCollection``.
+
+    ``colors`` optionally holds one color per item; ``style`` is shared.
+    """
+    lines, keep = split_items(coords, offsets, 2)
+    if not lines:
+        return None
+    if colors is not None:
+        style['colors'] = np.asarray(colors)[keep]
+    collection = LineCollection(lines, **style)
+    ax.add_collection(collection)
+    return collection
+
+def add_polygons(ax, coords: np.ndarray, offsets: np.ndarray, facecolors=None, **style) -> Optional[PolyCollection]:
+    """Fill every CSR ring as one ``PolyCollection``; rings are closed implicitly.
+
+    ``facecolors`` optionally holds one color per item; ``style`` is shared.
+    """
+    polygons, keep = split_items(coords, offsets, 3)
+    if not polygons:
+        return None
+    if facecolors is not None:
+        style['facecolors'] = np.asarray(facecolors)[keep]
+    collection = PolyCollection(polygons, **style)
+    ax.add_collection(collection)
+    return collection
+
+def item_centers(coords: np.ndarray, offsets: np.ndarray) -> np.ndarray:
+    """Return the mean point of every non-empty CSR item; empty items get NaN."""
+    counts = np.diff(offsets)
+    centers = np.full((len(counts), 2), np.nan)
+    nonempty = counts > 0
+    if nonempty.any():
+        sums = np.add.reduceat(coords, offsets[:-1][nonempty], axis=0)
+        centers[nonempty] = sums / counts[nonempty, None]
+    return centers
+
+def annotate_items(ax, coords: np.ndarray, offsets: np.ndarray, labels: Sequence[str],
+                   limit: Optional[int] = MAX_ANNOTATIONS, offset=(0.0005, 0.0005)) -> int:
+    """Annotate at most ``limit`` items at their centers; returns the number drawn."""
+    centers = item_centers(coords, offsets)
+    drawn = 0
+    for center, label in zip(centers, labels):
+        if limit is not None and drawn >= limit:
+            break
+        if np.isnan(center[0]):
+            continue
+        ax.annotate(label, xy=center, xytext=center + offset,
+                    bbox=dict(boxstyle="round,pad=0.3", fc="white", ec="gray", alpha=0.8),
+                    arrowprops=dict(arrowstyle="->"))
+        drawn += 1
+    return drawn
+
+def fit_view(ax, coords: np.ndarray, bounds=None):
+    """Fit the axes to ``bounds`` ``(min_lon, min_lat, max_lon, max_lat)`` or to the data.
+
+    Collections do not update the data limits, so this replaces autoscaling.
+    """
+    if bounds is None:
+        if not len(coords):
+            return
+        (min_lon, min_lat), (max_lon, max_lat) = coords.min(axis=0), coords.max(axis=0)
+    else:
+        min_lon, min_lat, max_lon, max_lat = bounds
+    ax.set_xlim(min_lon, max_lon)
+    ax.set_ylim(min_lat, max_lat)
+    ax.set_aspect('equal', adjustable='box')
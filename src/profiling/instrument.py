@@ -0,0 +1,217 @@
+import contextlib
+import functools
+import json
+import os
+import signal
+import sys
+import time
+import tracemalloc
+from typing import Dict, List, Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Allocation sites listed per top-level stage when memory is traced
+TOP_ALLOCATIONS = 5
+
+_recorder: Optional['Recorder'] = None
+_disabled_stage = contextlib.nullcontext()
+
+def max_rss_bytes() -> Optional[int]:
+    """Peak resident set size of this process so far, or None where it is unknown."""
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return rss if sys.platform == 'darwin' else rss * 1024
+
+class Recorder:
+    """Stage timers, memory high-water marks and counters of one run.
+
+    Stages nest: a stage entered inside another is reported as
+    ``outer/inner``, and repeated stages add up their calls and seconds.
+    At every stage exit the peak RSS so far is recorded and, with
+    ``trace_memory``, the tracemalloc peak during the stage. Record from
+    the main thread; worker processes keep their own (disabled) recorder.
+    """
+    def __init__(self, trace_memory: bool = False):
+        self.trace_memory = trace_memory
+        self.started = time.perf_counter()
+        self.stages: Dict[str, dict] = {}
+        self.counters: Dict[str, int] = {}
+        self.events: List[dict] = []
+        self.stack: List[list] = []  # [path, start, peak of finished children]
+        self.traced_peak = 0
+        self.pid = os.getpid()
+        self.started_tracing = False
+
+    @contextlib.contextmanager
+    def stage(self, name: str):
+        if self.trace_memory:
+            self.fold_peak()
+        path = f'{self.stack[-1][0]}/{name}' if self.stack else name
+        entry = [path, time.perf_counter(), 0]
+        self.stack.append(entry)
+        failed = False
+        try:
+            yield
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            self.stack.pop()
+            self.finish_stage(path, entry, failed)
+
+    def fold_peak(self):
+        """Credit the tracemalloc peak so far to the enclosing stage and start a new one."""
+        peak = tracemalloc.get_traced_memory()[1]
+        if self.stack:
+            self.stack[-1][2] = max(self.stack[-1][2], peak)
+        self.traced_peak = max(self.traced_peak, peak)
+        tracemalloc.reset_peak()
+
+    def finish_stage(self, path: str, entry: list, failed: bool = False):
+        end = time.perf_counter()
+        record = self.stages.setdefault(path, {'name': path, 'calls': 0, 'seconds': 0.0})
+        record['calls'] += 1
+        if failed:
+            # Raised or interrupted: where a stalled run was stopped
+            record['failed'] = record.get('failed', 0) + 1
+        record['seconds'] += end - entry[1]
+        record['max_rss_bytes'] = max_rss_bytes()
+        memory = {'max_rss_bytes': record['max_rss_bytes']}
+        if self.trace_memory:
+            peak = max(tracemalloc.get_traced_memory()[1], entry[2])
+            self.fold_peak()
+            if self.stack:
+                self.stack[-1][2] = max(self.stack[-1][2], peak)
+            record['traced_peak_bytes'] = max(record.get('traced_peak_bytes', 0), peak)
+            memory['traced_peak_bytes'] = peak
+            if not self.stack:
+                record['top_allocations'] = top_allocations(tracemalloc.take_snapshot())
+
+        # Chrome trace: a complete event per stage, and counter tracks sampled at its end
+        ts = (entry[1] - self.started) * 1e6
+        self.events.append({'name': path.rsplit('/', 1)[-1], 'cat': 'stage', 'ph': 'X', 'ts': ts,
+                            'dur': (end - entry[1]) * 1e6, 'pid': self.pid, 'tid': 0, 'args': {'path': path}})
+        now = (end - self.started) * 1e6
+        if memory['max_rss_bytes'] is not None:
+            self.events.append({'name': 'memory', 'ph': 'C', 'ts': now, 'pid': self.pid, 'args': memory})
+        if self.counters:
+            self.events.append({'name': 'counters', 'ph': 'C', 'ts': now, 'pid': self.pid,
+                                'args': dict(self.counters)})
+
+    def count(self, name: str, value: int = 1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def report(self) -> dict:
+        """The run so far as a JSON-serializable dict; stages still open are listed under ``running``."""
+        now = time.perf_counter()
+        report = {
+            'wall_seconds': now - self.started,
+            'max_rss_bytes': max_rss_bytes(),
+            'stages': list(self.stages.values()),
+            'running': [{'name': name, 'seconds': now - start} for name, start, _ in self.stack],
+            'counters': dict(sorted(self.counters.items())),
+        }
+        if self.trace_memory and tracemalloc.is_tracing():
+            report['traced_peak_bytes'] = max(self.traced_peak, tracemalloc.get_traced_memory()[1])
+        return report
+
+    def write_report(self, path: str):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.report(), f, indent=2)
+
+    def write_trace(self, path: str):
+        """Write the stages as a Chrome trace, viewable in chrome://tracing or Perfetto."""
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'traceEvents': self.events, 'displayTimeUnit': 'ms'}, f)
+
+def top_allocations(snapshot, limit: int = TOP_ALLOCATIONS) -> List[dict]:
+    """The source lines holding the most traced memory in ``snapshot``."""
+    return [{'site': f'{stat.traceback[0].filename}:{stat.traceback[0].lineno}', 'bytes': stat.size,
+             'blocks': stat.count} for stat in snapshot.statistics('lineno')[:limit]]
+
+def enable(trace_memory: bool = False) -> Recorder:
+    """Start recording; ``trace_memory`` also runs tracemalloc, which slows allocation-heavy code."""
+    global _recorder
+    _recorder = Recorder(trace_memory)
+    if trace_memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+        _recorder.started_tracing = True
+    return _recorder
+
+def disable() -> Optional[Recorder]:
+    """Stop recording and return the recorder that was active, if any."""
+    global _recorder
+    recorder, _recorder = _recorder, None
+    if recorder is not None and recorder.started_tracing:
+        tracemalloc.stop()
+    return recorder
+
+def active() -> Optional[Recorder]:
+    """The active recorder, for work only worth doing when recording (e.g. counting prims)."""
+    return _recorder
+
+def stage(name: str):
+    """Time a block as a stage of the active recorder; a shared no-op context when disabled."""
+    if _recorder is None:
+        return _disabled_stage
+    return _recorder.stage(name)
+
+def timed(name: str):
+    """Decorate a function so every call runs as a stage named ``name``."""
+    def decorate(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if _recorder is None:
+                return function(*args, **kwargs)
+            with _recorder.stage(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorate
+
+def count(name: str, value: int = 1):
+    """Add ``value`` to a counter of the active recorder; does nothing when disabled."""
+    if _recorder is not None:
+        _recorder.count(name, value)
+
+def add_instrument_arguments(parser):
+    """Add the shared ``--metrics``, ``--trace`` and ``--trace-memory`` options to an argparse parser."""
+    parser.add_argument('--metrics', metavar='JSON', help="Write a run report of stage timings, memory and counters")
+    parser.add_argument('--trace', metavar='JSON', help="Write the stages as a Chrome trace (chrome://tracing)")
+    parser.add_argument('--trace-memory', action='store_true',
+                        help="Also record tracemalloc peaks and top allocation sites (slower)")
+
+@contextlib.contextmanager
+def instrumented(metrics_path: Optional[str] = None, trace_path: Optional[str] = None,
+                 trace_memory: bool = False):
+    """Record the block when a report or trace is asked for, and write them even if it fails.
+
+    While the block runs, ``kill -USR1 <pid>`` writes the report so far,
+    with the stages still open under ``running``, to see where a run stalls.
+    """
+    if not (metrics_path or trace_path):
+        yield None
+        return
+    recorder = enable(trace_memory)
+    previous = None
+    if metrics_path and hasattr(signal, 'SIGUSR1'):
+        try:
+            previous = signal.signal(signal.SIGUSR1, lambda *_: recorder.write_report(metrics_path))
+        except ValueError:  # not the main thread
+            pass
+    try:
+        yield recorder
+    finally:
+        if previous is not None:
+            signal.signal(signal.SIGUSR1, previous)
+        if metrics_path:
+            recorder.write_report(metrics_path)
+            print(f"Run report written to {metrics_path}")
+        if trace_path:
+            recorder.write_trace(trace_path)
+            print(f"Chrome trace written to {trace_path}")
+        disable()
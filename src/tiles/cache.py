@@ -0,0 +1,101 @@
+import json
+import os
+import threading
+import time
+from typing import NamedTuple, Optional
+
+class CachedTile(NamedTuple):
+    content: bytes
+    etag: Optional[str]
+    last_modified: Optional[str]
+    fetched_at: float
+
+class TileCache:
+    """Persistent ``z/x/y.<ext>`` tile store with HTTP validators and a size cap.
+
+    Every tile is stored next to a ``y.json`` sidecar holding its ETag,
+    Last-Modified and download time. Tiles older than ``max_age`` seconds
+    are stale and should be revalidated; reading a tile marks it as recently
+    used, and ``prune`` evicts the least recently used tiles until the store
+    fits in ``max_bytes``.
+    """
+    def __init__(self, cache_dir: str, max_age: float = 7 * 24 * 3600, max_bytes: int = 512 * 2 ** 20,
+                 extension: str = 'png'):
+        self.cache_dir = cache_dir
+        self.max_age = max_age
+        self.max_bytes = max_bytes
+        self.extension = extension
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def path(self, zoom: int, xtile: int, ytile: int) -> str:
+        return os.path.join(self.cache_dir, str(zoom), str(xtile), f'{ytile}.{self.extension}')
+
+    def meta_path(self, zoom: int, xtile: int, ytile: int) -> str:
+        return os.path.join(self.cache_dir, str(zoom), str(xtile), f'{ytile}.json')
+
+    def get(self, zoom: int, xtile: int, ytile: int) -> Optional[CachedTile]:
+        """Return a cached tile, fresh or stale, or None."""
+        path = self.path(zoom, xtile, ytile)
+        try:
+            with open(path, 'rb') as f:
+                content = f.read()
+            with open(self.meta_path(zoom, xtile, ytile), 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            # The tile's mtime is its last use for LRU eviction
+            os.utime(path)
+        except (OSError, ValueError):
+            with self.lock:
+                self.misses += 1
+            return None
+        with self.lock:
+            self.hits += 1
+        return CachedTile(content, meta.get('etag'), meta.get('last_modified'), meta.get('fetched_at', 0.0))
+
+    def is_fresh(self, tile: CachedTile) -> bool:
+        return time.time() - tile.fetched_at <= self.max_age
+
+    def put(self, zoom: int, xtile: int, ytile: int, content: bytes,
+            etag: Optional[str] = None, last_modified: Optional[str] = None):
+        """Store a downloaded tile and its validators."""
+        path = self.path(zoom, xtile, ytile)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._write(path, content)
+        self._write_meta(zoom, xtile, ytile, {'etag': etag, 'last_modified': last_modified,
+                                              'fetched_at': time.time()})
+
+    def refresh(self, zoom: int, xtile: int, ytile: int, tile: CachedTile):
+        """Mark a stale tile as fresh again after a 304 Not Modified."""
+        self._write_meta(zoom, xtile, ytile, {'etag': tile.etag, 'last_modified': tile.last_modified,
+                                              'fetched_at': time.time()})
+
+    def prune(self) -> int:
+        """Evict least recently used tiles until the store fits ``max_bytes``; returns bytes freed."""
+        entries = []
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if name.endswith(f'.{self.extension}'):
+                    path = os.path.join(root, name)
+                    stat = os.stat(path)
+                    entries.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        freed = 0
+        for _, size, path in sorted(entries):
+            if total - freed <= self.max_bytes:
+                break
+            for victim in (path, os.path.splitext(path)[0] + '.json'):
+                if os.path.exists(victim):
+                    os.remove(victim)
+            freed += size
+        return freed
+
+    def _write_meta(self, zoom, xtile, ytile, meta):
+        self._write(self.meta_path(zoom, xtile, ytile), json.dumps(meta).encode())
+
+    def _write(self, path, data):
+        # Write atomically so concurrent exporters never read a partial file
+        temp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, path)
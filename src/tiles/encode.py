@@ -0,0 +1,121 @@
+import hashlib
+import json
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import NamedTuple
+import numpy as np
+from PIL import Image
+
+# PIL encoder and file extension per texture format
+TEXTURE_FORMATS = {'png': ('PNG', 'png'), 'jpeg': ('JPEG', 'jpg'), 'webp': ('WEBP', 'webp')}
+
+class TextureOptions(NamedTuple):
+    """How textures are encoded: a format plus its compression settings.
+
+    ``compression`` is the PNG deflate level (1 is fast, 9 is smallest);
+    ``quality`` applies to the lossy JPEG and WebP formats.
+    """
+    format: str = 'png'
+    compression: int = 6
+    quality: int = 90
+
+    @property
+    def extension(self) -> str:
+        return TEXTURE_FORMATS[self.format][1]
+
+    def save_arguments(self) -> dict:
+        if self.format == 'png':
+            return {'compress_level': self.compression}
+        return {'quality': self.quality}
+
+# Fast PNG while iterating, smallest PNG or lossy formats for production
+TEXTURE_PRESETS = {
+    'fast': TextureOptions('png', compression=1),
+    'png': TextureOptions('png', compression=9),
+    'jpeg': TextureOptions('jpeg', quality=90),
+    'webp': TextureOptions('webp', quality=85),
+}
+
+def encode_texture(pixels: np.ndarray, path: str, options: TextureOptions) -> str:
+    """Encode an (h, w, 3) uint8 array to ``path``; returns ``path``."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Write atomically so readers never see a partial texture
+    temp_path = f'{path}.{os.getpid()}.tmp'
+    Image.fromarray(pixels, 'RGB').save(temp_path, TEXTURE_FORMATS[options.format][0],
+                                        **options.save_arguments())
+    os.replace(temp_path, path)
+    return path
+
+class TextureEncoder:
+    """Encode texture tiles in a process pool, skipping tiles that did not change.
+
+    Every tile is keyed by a hash of its pixels and the encoding options,
+    kept in ``textures.json`` under ``output_dir``; a tile whose file exists
+    with the same hash is not encoded again. At most ``2 * workers`` tiles
+    wait for the pool, so memory stays bounded however many are submitted.
+    """
+    MANIFEST = 'textures.json'
+
+    def __init__(self, output_dir: str, options: TextureOptions = TextureOptions(), workers: int = 1):
+        if options.format not in TEXTURE_FORMATS:
+            raise ValueError(f"Unknown texture format '{options.format}', expected one of {tuple(TEXTURE_FORMATS)}")
+        self.output_dir = output_dir
+        self.options = options
+        self.workers = max(1, workers)
+        self.encoded = 0
+        self.skipped = 0
+        self.pending = deque()
+        self.manifest_path = os.path.join(output_dir, self.MANIFEST)
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                self.hashes = json.load(f)
+        except (OSError, ValueError):
+            self.hashes = {}
+        self.pool = ProcessPoolExecutor(max_workers=self.workers) if self.workers > 1 else None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def digest(self, pixels: np.ndarray) -> str:
+        content = hashlib.blake2b(digest_size=16)
+        content.update(repr((pixels.shape, tuple(self.options))).encode())
+        content.update(np.ascontiguousarray(pixels).data)
+        return content.hexdigest()
+
+    def submit(self, pixels: np.ndarray, path: str):
+        """Encode ``pixels`` to ``path`` unless an identical tile is already there."""
+        key = os.path.relpath(path, self.output_dir).replace(os.sep, '/')
+        digest = self.digest(pixels)
+        if self.hashes.get(key) == digest and os.path.exists(path):
+            self.skipped += 1
+            return
+        self.hashes[key] = digest
+        self.encoded += 1
+        if self.pool is None:
+            encode_texture(pixels, path, self.options)
+            return
+        self.pending.append(self.pool.submit(encode_texture, pixels, path, self.options))
+        while len(self.pending) > 2 * self.workers:
+            self.pending.popleft().result()
+
+    def close(self):
+        """Wait for all tiles and save the hash manifest."""
+        while self.pending:
+            self.pending.popleft().result()
+        if self.pool:
+            self.pool.shutdown()
+            self.pool = None
+        os.makedirs(self.output_dir, exist_ok=True)
+        temp_path = f'{self.manifest_path}.{os.getpid()}.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.hashes, f, sort_keys=True)
+        os.replace(temp_path, self.manifest_path)
+
+def add_texture_argument(parser):
+    """Add the shared ``--texture`` preset option to an argparse parser."""
+    parser.add_argument('--texture', choices=tuple(TEXTURE_PRESETS), default=None,
+                        help="Texture encoding: 'fast' PNG for iteration, 'png', 'jpeg' or 'webp' for production")
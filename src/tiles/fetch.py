@@ -0,0 +1,138 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Optional, Tuple
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from .cache import TileCache
+from .tilemath import TILE_SIZE
+
+# Override with the OSM_TILE_URL environment variable, e.g. to use a local tile server
+DEFAULT_TILE_URL = 'https://tile.openstreetmap.org/{z}/{x}/{y}.png'
+USER_AGENT = 'OSM-to-USD-Converter/1.0'
+# OSM land color used to fill tiles that could not be downloaded
+MISSING_TILE_COLOR = (242, 239, 233)
+
+Tile = Tuple[int, int, int]
+
+class RateLimiter:
+    """Space requests to each host at least ``1 / requests_per_second`` apart."""
+    def __init__(self, requests_per_second: float):
+        self.interval = 1.0 / requests_per_second if requests_per_second > 0 else 0.0
+        self.next_slot: Dict[str, float] = {}
+        self.lock = threading.Lock()
+
+    def wait(self, host: str):
+        """Block until the next request to ``host`` may start."""
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot.get(host, now))
+            self.next_slot[host] = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+class TileFetcher:
+    """Download z/x/y map tiles concurrently over one pooled keep-alive session.
+
+    Requests are rate limited per host and retried with exponential backoff
+    on connection errors, 429 and 5xx responses. The defaults keep to the
+    OSM tile usage policy (two connections, identifying User-Agent).
+
+    With a ``cache``, fresh tiles are served without any request and stale
+    ones are revalidated with If-None-Match/If-Modified-Since. ``offline``
+    (or ``OSM_TILE_OFFLINE=1``) serves only from the cache, stale or not.
+    """
+    def __init__(self, url_template: Optional[str] = None, max_workers: int = 2,
+                 requests_per_second: float = 4.0, retries: int = 3, backoff: float = 0.5,
+                 timeout: float = 10.0, user_agent: str = USER_AGENT,
+                 cache: Optional[TileCache] = None, offline: Optional[bool] = None):
+        self.url_template = url_template or os.environ.get('OSM_TILE_URL', DEFAULT_TILE_URL)
+        self.cache = cache
+        self.offline = os.environ.get('OSM_TILE_OFFLINE') == '1' if offline is None else offline
+        self.requests = 0  # network round trips made
+        self.lock = threading.Lock()
+        self.max_workers = max(1, max_workers)
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.rate_limiter = RateLimiter(requests_per_second)
+
+        self.session = requests.Session()
+        self.session.headers['User-Agent'] = user_agent
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.session.close()
+        if self.cache:
+            self.cache.prune()
+
+    def url(self, zoom: int, xtile: int, ytile: int) -> str:
+        return self.url_template.format(z=zoom, x=xtile, y=ytile)
+
+    def fetch(self, zoom: int, xtile: int, ytile: int) -> Optional[bytes]:
+        """Return the encoded tile, or None once all retries have failed.
+
+        A stale cached copy is preferred over None when the server cannot be
+        reached. Tiles the server does not have are cached as empty entries
+        so warm runs do not ask for them again.
+        """
+        cached = self.cache.get(zoom, xtile, ytile) if self.cache else None
+        if cached and (self.offline or self.cache.is_fresh(cached)):
+            return cached.content or None
+        if self.offline:
+            print(f"Tile {zoom}/{xtile}/{ytile} is not cached (offline)")
+            return None
+
+        headers = {}
+        if cached and cached.etag:
+            headers['If-None-Match'] = cached.etag
+        if cached and cached.last_modified:
+            headers['If-Modified-Since'] = cached.last_modified
+
+        url = self.url(zoom, xtile, ytile)
+        host = urlsplit(url).netloc
+        for attempt in range(self.retries + 1):
+            delay = self.backoff * 2 ** attempt
+            self.rate_limiter.wait(host)
+            with self.lock:
+                self.requests += 1
+            try:
+                response = self.session.get(url, headers=headers, timeout=self.timeout)
+            except requests.RequestException as e:
+                print(f"Error downloading tile {zoom}/{xtile}/{ytile}: {e}")
+            else:
+                if response.status_code == 304 and cached:
+                    self.cache.refresh(zoom, xtile, ytile, cached)
+                    return cached.content or None
+                if response.status_code == 200:
+                    if self.cache:
+                        self.cache.put(zoom, xtile, ytile, response.content,
+                                       response.headers.get('ETag'), response.headers.get('Last-Modified'))
+                    return response.content
+                print(f"Failed to download tile {zoom}/{xtile}/{ytile}: {response.status_code}")
+                if response.status_code in (404, 410) and self.cache:
+                    self.cache.put(zoom, xtile, ytile, b'')
+                if response.status_code != 429 and response.status_code < 500:
+                    break
+                retry_after = response.headers.get('Retry-After', '')
+                if retry_after.isdigit():
+                    delay = max(delay, float(retry_after))
+            if attempt < self.retries:
+                time.sleep(delay)
+        return cached.content or None if cached else None
+
+    def fetch_many(self, tiles: Iterable[Tile]) -> Dict[Tile, Optional[bytes]]:
+        """Download many ``(zoom, x, y)`` tiles concurrently."""
+        tiles = list(tiles)
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            return dict(zip(tiles, pool.map(lambda tile: self.fetch(*tile), tiles)))
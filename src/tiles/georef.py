@@ -0,0 +1,112 @@
+import math
+import os
+from typing import NamedTuple, Optional, Tuple
+import numpy as np
+from .fetch import MISSING_TILE_COLOR, TILE_SIZE, TileFetcher
+from .mosaic import StreamingPngWriter, decode_tile
+from .tilemath import deg2pixel
+
+class GeoTexture(NamedTuple):
+    """A texture resampled onto a regular lon/lat grid.
+
+    ``geotransform`` follows the GDAL convention in EPSG:4326 degrees:
+    ``(min_lon, pixel_width, 0, max_lat, 0, -pixel_height)``, mapping pixel
+    corner ``(col, row)`` to ``(lon, lat)``.
+    """
+    path: str
+    width: int
+    height: int
+    geotransform: Tuple[float, float, float, float, float, float]
+
+def stream_georeferenced(fetcher: TileFetcher, zoom: int, min_lat: float, max_lat: float,
+                         min_lon: float, max_lon: float, output_path: str, scale: float = 1.0,
+                         compression: int = 6, workers: int = 1) -> GeoTexture:
+    """Stream a texture covering exactly the given bounds into a PNG.
+
+    The texture is a regular lon/lat grid, so it maps linearly onto a quad
+    spanning the bounds in local coordinates: columns are cropped to the
+    fractional pixel positions of the bounds and rows are resampled from Web
+    Mercator to linear latitude, both bilinearly. ``scale`` multiplies the
+    native resolution of ``zoom``. Source tiles arrive one row at a time and
+    at most two tile rows are buffered. ``compression`` and ``workers`` set
+    the deflate level and encoding threads of the PNG.
+    """
+    left, top = deg2pixel(max_lat, min_lon, zoom)
+    right, bottom = deg2pixel(min_lat, max_lon, zoom)
+    width = max(1, int(math.ceil((right - left) * scale)))
+    height = max(1, int(math.ceil((bottom - top) * scale)))
+
+    # Source pixel centres sampled by every output column and row
+    source_x = left + (np.arange(width) + 0.5) * (right - left) / width - 0.5
+    lats = max_lat - (np.arange(height) + 0.5) * (max_lat - min_lat) / height
+    source_y = deg2pixel(lats, np.zeros(height), zoom)[1] - 0.5
+
+    min_xtile = int(max(0.0, math.floor(source_x[0]))) // TILE_SIZE
+    max_xtile = int(math.floor(source_x[-1]) + 1) // TILE_SIZE
+    min_ytile = int(max(0.0, math.floor(source_y[0]))) // TILE_SIZE
+    max_ytile = int(math.floor(source_y[-1]) + 1) // TILE_SIZE
+    origin_x, origin_y = min_xtile * TILE_SIZE, min_ytile * TILE_SIZE
+    band_width = (max_xtile - min_xtile + 1) * TILE_SIZE
+
+    x0 = np.clip(np.floor(source_x).astype(np.int64) - origin_x, 0, band_width - 1)
+    x1 = np.minimum(x0 + 1, band_width - 1)
+    wx = np.clip(source_x - origin_x - x0, 0.0, 1.0)[:, None]
+    y_last = (max_ytile - min_ytile + 1) * TILE_SIZE - 1
+    y0 = np.clip(np.floor(source_y).astype(np.int64) - origin_y, 0, y_last)
+    y1 = np.minimum(y0 + 1, y_last)
+    wy = np.clip(source_y - origin_y - y0, 0.0, 1.0)
+
+    print(f"Streaming a {width}x{height} georeferenced texture from "
+          f"{(max_xtile - min_xtile + 1) * (max_ytile - min_ytile + 1)} tiles...")
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    buffer = np.zeros((0, band_width, 3), dtype=np.uint8)
+    buffer_start = 0  # source row of buffer[0], relative to origin_y
+    next_row = 0
+    with StreamingPngWriter(output_path, width, height, compression, workers) as writer:
+        for ytile in range(min_ytile, max_ytile + 1):
+            band = np.empty((TILE_SIZE, band_width, 3), dtype=np.uint8)
+            band[:] = MISSING_TILE_COLOR
+            row = [(zoom, xtile, ytile) for xtile in range(min_xtile, max_xtile + 1)]
+            for (_, xtile, _), content in fetcher.fetch_many(row).items():
+                pixels = decode_tile(content)
+                if pixels is not None:
+                    column = (xtile - min_xtile) * TILE_SIZE
+                    band[:, column:column + TILE_SIZE] = pixels
+
+            # Keep only the previous band for rows straddling the seam
+            if len(buffer) > TILE_SIZE:
+                buffer = buffer[-TILE_SIZE:]
+                buffer_start += TILE_SIZE
+            buffer = np.concatenate([buffer, band])
+            buffer_end = buffer_start + len(buffer)
+
+            ready = next_row + int(np.searchsorted(y1[next_row:], buffer_end))
+            if ytile == max_ytile:
+                ready = height
+            if ready > next_row:
+                rows = slice(next_row, ready)
+                top_rows = buffer[y0[rows] - buffer_start].astype(np.float32)
+                bottom_rows = buffer[y1[rows] - buffer_start].astype(np.float32)
+                weight = wy[rows, None, None]
+                blended = top_rows * (1 - weight) + bottom_rows * weight
+                sampled = blended[:, x0] * (1 - wx) + blended[:, x1] * wx
+                writer.write_rows(np.clip(np.rint(sampled), 0, 255).astype(np.uint8))
+                next_row = ready
+
+    geotransform = (min_lon, (max_lon - min_lon) / width, 0.0, max_lat, 0.0, -(max_lat - min_lat) / height)
+    return GeoTexture(output_path, width, height, geotransform)
+
+def geotexture_metadata(texture: GeoTexture, zoom: Optional[int] = None) -> dict:
+    """Describe a georeferenced texture for a layer's customLayerData.
+
+    ``zoom`` is the tile zoom it was resampled from, if any.
+    """
+    metadata = {
+        'file': os.path.basename(texture.path),
+        'crs': 'EPSG:4326',
+        'geoTransform': list(texture.geotransform),
+        'size': [texture.width, texture.height],
+    }
+    if zoom is not None:
+        metadata['sourceZoom'] = zoom
+    return metadata
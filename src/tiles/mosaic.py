@@ -0,0 +1,146 @@
+import os
+import struct
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+import numpy as np
+from PIL import Image
+from .fetch import MISSING_TILE_COLOR, TILE_SIZE, TileFetcher
+
+# Bands are split into pieces of this size so even one band keeps every worker busy
+CHUNK_BYTES = 4 * 2 ** 20
+
+def _deflate_chunk(data: bytes, level: int) -> bytes:
+    """Deflate one chunk as raw blocks ending on a byte boundary, so chunks concatenate."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+    return compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH)
+
+class StreamingPngWriter:
+    """Encode an RGB PNG band by band without holding the whole image.
+
+    Rows use the PNG 'Up' filter, computed with NumPy per band, and are fed
+    through one zlib stream that is flushed to IDAT chunks as it fills.
+    ``level`` is the deflate level (1 is fast, 9 is smallest).
+
+    With ``workers`` > 1 bands are cut into chunks that are deflated
+    independently on a thread pool (zlib releases the GIL) and joined into
+    one zlib stream, as pigz does; at most ``2 * workers`` chunks are in
+    flight.
+    """
+    def __init__(self, path: str, width: int, height: int, level: int = 6, workers: int = 1):
+        self.width = width
+        self.height = height
+        self.level = level
+        self.rows_written = 0
+        self.previous = np.zeros(width * 3, dtype=np.uint8)
+        self.compressor = zlib.compressobj(level)
+        self.workers = max(1, workers)
+        self.pool = ThreadPoolExecutor(max_workers=self.workers) if self.workers > 1 else None
+        self.pending = deque()
+        self.checksum = zlib.adler32(b'')
+        self.file = open(path, 'wb')
+        self.file.write(b'\x89PNG\r\n\x1a\n')
+        self._chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0))
+        if self.pool is not None:
+            # zlib header of the joined stream
+            self._chunk(b'IDAT', b'\x78\x9c')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _chunk(self, kind: bytes, data: bytes):
+        self.file.write(struct.pack('>I', len(data)) + kind + data)
+        self.file.write(struct.pack('>I', zlib.crc32(kind + data) & 0xffffffff))
+
+    def write_rows(self, band: np.ndarray):
+        """Append an (h, width, 3) uint8 band of rows."""
+        rows = np.ascontiguousarray(band, dtype=np.uint8).reshape(len(band), self.width * 3)
+        filtered = np.empty((len(rows), self.width * 3 + 1), dtype=np.uint8)
+        filtered[:, 0] = 2  # 'Up' filter: difference to the row above, modulo 256
+        filtered[:, 1:] = rows
+        filtered[0, 1:] -= self.previous
+        filtered[1:, 1:] -= rows[:-1]
+        self.previous = rows[-1].copy()
+        self.rows_written += len(rows)
+
+        data = filtered.tobytes()
+        if self.pool is None:
+            data = self.compressor.compress(data)
+            if data:
+                self._chunk(b'IDAT', data)
+            return
+        self.checksum = zlib.adler32(data, self.checksum)
+        for start in range(0, len(data), CHUNK_BYTES):
+            self.pending.append(self.pool.submit(_deflate_chunk, data[start:start + CHUNK_BYTES], self.level))
+            while len(self.pending) > 2 * self.workers:
+                self._chunk(b'IDAT', self.pending.popleft().result())
+
+    def close(self):
+        if self.file.closed:
+            return
+        if self.pool is not None:
+            while self.pending:
+                self._chunk(b'IDAT', self.pending.popleft().result())
+            self.pool.shutdown()
+        if self.rows_written != self.height:
+            self.file.close()
+            raise ValueError(f"PNG expects {self.height} rows, got {self.rows_written}")
+        if self.pool is None:
+            self._chunk(b'IDAT', self.compressor.flush())
+        else:
+            # An empty final block ends the joined stream, followed by its checksum
+            final = zlib.compressobj(self.level, zlib.DEFLATED, -zlib.MAX_WBITS).flush(zlib.Z_FINISH)
+            self._chunk(b'IDAT', final + struct.pack('>I', self.checksum & 0xffffffff))
+        self._chunk(b'IEND', b'')
+        self.file.close()
+
+def decode_tile(content) -> np.ndarray:
+    """Decode an encoded tile to a (TILE_SIZE, TILE_SIZE, 3) array, or None."""
+    if not content:
+        return None
+    try:
+        with Image.open(BytesIO(content)) as tile:
+            return np.asarray(tile.convert('RGB').resize((TILE_SIZE, TILE_SIZE)))
+    except OSError:
+        return None
+
+def stream_mosaic(fetcher: TileFetcher, zoom: int, min_xtile: int, max_xtile: int,
+                  min_ytile: int, max_ytile: int, output_path: str,
+                  compression: int = 6, workers: int = 1) -> int:
+    """Download an inclusive tile range and stream it into one PNG at ``output_path``.
+
+    Tiles are fetched and encoded one tile row at a time, so peak memory is
+    one band of ``TILE_SIZE`` pixel rows whatever the size of the range.
+    Tiles that cannot be downloaded or decoded are filled with
+    ``MISSING_TILE_COLOR``. ``compression`` and ``workers`` set the deflate
+    level and encoding threads of the PNG. Returns the number of tiles
+    drawn, so callers can tell a mosaic of missing tiles from a map.
+    """
+    columns = max_xtile - min_xtile + 1
+    rows = max_ytile - min_ytile + 1
+    width, height = columns * TILE_SIZE, rows * TILE_SIZE
+    print(f"Streaming {columns * rows} tiles into a {width}x{height} mosaic "
+          f"with {fetcher.max_workers} connection(s)...")
+
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    missing = 0
+    band = np.empty((TILE_SIZE, width, 3), dtype=np.uint8)
+    with StreamingPngWriter(output_path, width, height, compression, workers) as writer:
+        for ytile in range(min_ytile, max_ytile + 1):
+            band[:] = MISSING_TILE_COLOR
+            row = [(zoom, xtile, ytile) for xtile in range(min_xtile, max_xtile + 1)]
+            for (_, xtile, _), content in fetcher.fetch_many(row).items():
+                pixels = decode_tile(content)
+                if pixels is None:
+                    missing += 1
+                    continue
+                column = (xtile - min_xtile) * TILE_SIZE
+                band[:, column:column + TILE_SIZE] = pixels
+            writer.write_rows(band)
+    if missing:
+        print(f"Filled {missing} missing tile(s) of {columns * rows}")
+    return columns * rows - missing
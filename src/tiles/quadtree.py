@@ -0,0 +1,35 @@
+import numpy as np
+from typing import Dict, Tuple
+
+def partition_quadtree(xtiles: np.ndarray, ytiles: np.ndarray, max_zoom: int,
+                       min_zoom: int = 0, max_items: int = 500) -> Dict[Tuple[int, int, int], np.ndarray]:
+    """Partition items into web-Mercator quadtree tiles.
+
+    ``xtiles``/``ytiles`` are the integer tile coordinates of every item at
+    ``max_zoom`` (as returned by ``deg2num``); the tile of an item at a
+    coarser zoom ``z`` is found by shifting them right by ``max_zoom - z``.
+    Tiles holding more than ``max_items`` items are split into their four
+    children until ``max_zoom`` is reached. Returns ``{(z, x, y): item indices}``.
+    """
+    xtiles = np.asarray(xtiles, dtype=np.int64)
+    ytiles = np.asarray(ytiles, dtype=np.int64)
+    tiles = {}
+    pending = np.arange(len(xtiles))
+
+    for zoom in range(min_zoom, max_zoom + 1):
+        if not len(pending):
+            break
+        shift = max_zoom - zoom
+        keys = np.stack([xtiles[pending] >> shift, ytiles[pending] >> shift], axis=1)
+        unique, inverse, counts = np.unique(keys, axis=0, return_inverse=True, return_counts=True)
+        inverse = inverse.reshape(-1)
+
+        # Tiles that are small enough (or cannot be split further) are final
+        final = (counts <= max_items) | (zoom == max_zoom)
+        order = np.argsort(inverse, kind='stable')
+        groups = np.split(pending[order], np.cumsum(counts)[:-1])
+        for (x, y), items, done in zip(unique, groups, final):
+            if done:
+                tiles[(zoom, int(x), int(y))] = items
+        pending = pending[~final[inverse]]
+    return tiles
@@ -0,0 +1,186 @@
+import math
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, NamedTuple, Optional, Sequence, Tuple
+import numpy as np
+from src.geometry.csr import item_ids, segment_bounds
+from .fetch import MISSING_TILE_COLOR
+from .georef import GeoTexture
+from .mosaic import StreamingPngWriter
+
+# Meters per degree used to size the texture, as in the local projections elsewhere
+METERS_PER_DEGREE_LON = 111320.0
+METERS_PER_DEGREE_LAT = 110540.0
+
+class RasterLayer(NamedTuple):
+    """One color of features in CSR layout, drawn in list order.
+
+    ``widths`` holds the per-item line width for line layers (in meters
+    for ``rasterize_layers``, in pixels once projected); ``None`` fills the
+    items as closed polygons.
+    """
+    coords: np.ndarray
+    offsets: np.ndarray
+    color: Tuple[int, int, int]
+    widths: Optional[np.ndarray] = None
+
+def _scanline_spans(coords: np.ndarray, offsets: np.ndarray, width: int, height: int):
+    """Return the ``(rows, starts, ends)`` pixel spans covered by even-odd filled rings.
+
+    A pixel is inside when its centre is; every edge contributes one crossing
+    to each row whose centre lies in its half-open y range, so the crossings
+    of a ring pair up on every row.
+    """
+    empty = np.zeros(0, dtype=np.int64)
+    counts = np.diff(offsets)
+    if not len(coords):
+        return empty, empty, empty
+    following = np.arange(1, len(coords) + 1)
+    following[offsets[1:][counts > 0] - 1] = offsets[:-1][counts > 0]
+    x0, y0 = coords[:, 0], coords[:, 1]
+    x1, y1 = coords[following, 0], coords[following, 1]
+
+    first = np.clip(np.ceil(np.minimum(y0, y1) - 0.5), 0, height).astype(np.int64)
+    last = np.clip(np.ceil(np.maximum(y0, y1) - 0.5), 0, height).astype(np.int64)
+    rows_per_edge = last - first
+    edges = np.repeat(np.arange(len(coords)), rows_per_edge)
+    if not len(edges):
+        return empty, empty, empty
+    starts = np.cumsum(rows_per_edge) - rows_per_edge
+    rows = first[edges] + np.arange(len(edges)) - np.repeat(starts, rows_per_edge)
+
+    # Horizontal edges span no rows, so the division is safe
+    t = (rows + 0.5 - y0[edges]) / (y1[edges] - y0[edges])
+    xs = x0[edges] + t * (x1[edges] - x0[edges])
+    order = np.lexsort((xs, rows, item_ids(offsets)[edges]))
+    xs, rows = xs[order], rows[order]
+    columns = np.clip(np.ceil(xs - 0.5), 0, width).astype(np.int64)
+    return rows[0::2], columns[0::2], columns[1::2]
+
+def fill_polygons(buffer: np.ndarray, coords: np.ndarray, offsets: np.ndarray, color):
+    """Fill CSR rings given in pixel coordinates into an (h, w, 3) buffer, in place."""
+    height, width = buffer.shape[:2]
+    rows, starts, ends = _scanline_spans(np.asarray(coords, dtype=np.float64), offsets, width, height)
+    keep = ends > starts
+    if not keep.any():
+        return
+    # Coverage per row is the running sum of +1 at span starts and -1 at span ends
+    stride = width + 1
+    size = height * stride
+    delta = (np.bincount(rows[keep] * stride + starts[keep], minlength=size)
+             - np.bincount(rows[keep] * stride + ends[keep], minlength=size))
+    mask = np.cumsum(delta.reshape(height, stride), axis=1)[:, :width] > 0
+    buffer[mask] = color
+
+def line_quads(coords: np.ndarray, offsets: np.ndarray, widths: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Return one square-capped quad per polyline segment, in CSR layout.
+
+    Caps extend each segment by half its width, which also closes the gaps
+    at polyline joins. Lines are at least one pixel wide.
+    """
+    ids = item_ids(offsets)
+    segment = np.flatnonzero(ids[1:] == ids[:-1]) if len(ids) > 1 else np.zeros(0, dtype=np.int64)
+    start, end = coords[segment], coords[segment + 1]
+    half = np.maximum(np.asarray(widths, dtype=np.float64)[ids[segment]], 1.0)[:, None] / 2
+    direction = end - start
+    length = np.hypot(direction[:, 0], direction[:, 1])[:, None]
+    # Degenerate segments become squares
+    direction = np.where(length > 0, direction / np.where(length > 0, length, 1.0), (1.0, 0.0))
+    normal = np.stack([-direction[:, 1], direction[:, 0]], axis=1)
+    start = start - direction * half
+    end = end + direction * half
+    quads = np.stack([start + normal * half, end + normal * half,
+                      end - normal * half, start - normal * half], axis=1)
+    return quads.reshape(-1, 2), np.arange(0, 4 * len(segment) + 1, 4, dtype=np.int64)
+
+def draw_lines(buffer: np.ndarray, coords: np.ndarray, offsets: np.ndarray, widths: np.ndarray, color):
+    """Draw CSR polylines given in pixel coordinates with per-item widths in pixels."""
+    quads, quad_offsets = line_quads(np.asarray(coords, dtype=np.float64), offsets, widths)
+    fill_polygons(buffer, quads, quad_offsets, color)
+
+def render_window(layers: Sequence[RasterLayer], left: int, top: int, width: int, height: int,
+                  background=MISSING_TILE_COLOR) -> np.ndarray:
+    """Render the pixel window at ``(left, top)`` of layers in pixel coordinates."""
+    buffer = np.empty((height, width, 3), dtype=np.uint8)
+    buffer[:] = background
+    for layer in layers:
+        # Cull items whose bounds (grown by half their width) miss the window
+        mins, maxs = segment_bounds(layer.coords, layer.offsets)
+        margin = 0.0 if layer.widths is None else np.maximum(layer.widths, 1.0)[:, None] / 2
+        visible = ((mins - margin <= (left + width, top + height)).all(axis=1)
+                   & (maxs + margin >= (left, top)).all(axis=1))
+        if not visible.any():
+            continue
+        keep = visible[item_ids(layer.offsets)]
+        coords = layer.coords[keep] - (left, top)
+        offsets = np.zeros(visible.sum() + 1, dtype=np.int64)
+        np.cumsum(np.diff(layer.offsets)[visible], out=offsets[1:])
+        if layer.widths is None:
+            fill_polygons(buffer, coords, offsets, layer.color)
+        else:
+            draw_lines(buffer, coords, offsets, layer.widths[visible], layer.color)
+    return buffer
+
+# Projected layers inherited by rasterizing worker processes
+_raster_layers = None
+
+def _init_raster_worker(layers):
+    global _raster_layers
+    _raster_layers = layers
+
+def _render_task(task):
+    return render_window(_raster_layers, *task)
+
+def rasterize_layers(layers: Sequence[RasterLayer], min_lat: float, max_lat: float, min_lon: float,
+                     max_lon: float, meters_per_pixel: float, output_path: str, tile_size: int = 1024,
+                     workers: int = 1, background=MISSING_TILE_COLOR, compression: int = 6) -> GeoTexture:
+    """Render lon/lat layers into a PNG covering exactly the given bounds.
+
+    The texture is a regular lon/lat grid at ``meters_per_pixel``, like the
+    one ``stream_georeferenced`` produces, so either maps onto the same
+    ground quad. Windows of ``tile_size`` pixels are rendered in worker
+    processes when ``workers`` > 1 and streamed to disk one row of windows
+    at a time, deflated at ``compression`` on as many threads.
+    """
+    meters_x = (max_lon - min_lon) * METERS_PER_DEGREE_LON * math.cos(math.radians((min_lat + max_lat) / 2))
+    meters_y = (max_lat - min_lat) * METERS_PER_DEGREE_LAT
+    width = max(1, int(math.ceil(meters_x / meters_per_pixel)))
+    height = max(1, int(math.ceil(meters_y / meters_per_pixel)))
+    pixel_size = np.array([(max_lon - min_lon) / width, (max_lat - min_lat) / height])
+
+    projected: List[RasterLayer] = []
+    for layer in layers:
+        if len(layer.offsets) < 2:
+            continue
+        pixels = (np.asarray(layer.coords, dtype=np.float64) - (min_lon, max_lat)) / pixel_size * (1, -1)
+        widths = None if layer.widths is None else np.asarray(layer.widths, dtype=np.float64) / meters_per_pixel
+        projected.append(RasterLayer(pixels, np.asarray(layer.offsets), layer.color, widths))
+
+    columns = range(0, width, tile_size)
+    print(f"Rasterizing a {width}x{height} texture at {meters_per_pixel} m/px in "
+          f"{len(columns) * math.ceil(height / tile_size)} window(s)...")
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+
+    pool = None
+    if workers > 1:
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context('fork' if 'fork' in methods else None)
+        pool = ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                                   initializer=_init_raster_worker, initargs=(projected,))
+    try:
+        with StreamingPngWriter(output_path, width, height, compression, workers) as writer:
+            for top in range(0, height, tile_size):
+                rows = min(tile_size, height - top)
+                tasks = [(left, top, min(tile_size, width - left), rows, background) for left in columns]
+                if pool:
+                    windows = list(pool.map(_render_task, tasks))
+                else:
+                    windows = [render_window(projected, *task) for task in tasks]
+                writer.write_rows(np.concatenate(windows, axis=1))
+    finally:
+        if pool:
+            pool.shutdown()
+
+    geotransform = (min_lon, pixel_size[0], 0.0, max_lat, 0.0, -pixel_size[1])
+    return GeoTexture(output_path, width, height, tuple(float(v) for v in geotransform))
@@ -0,0 +1,71 @@
+import os
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from .encode import TextureEncoder
+from .fetch import MISSING_TILE_COLOR, TILE_SIZE, TileFetcher
+from .mosaic import decode_tile
+
+TexturePyramid = Dict[int, List[Tuple[int, int, str]]]
+
+def tile_path(output_dir: str, zoom: int, xtile: int, ytile: int, extension: str = 'png') -> str:
+    return os.path.join(output_dir, str(zoom), str(xtile), f'{ytile}.{extension}')
+
+def downsample(block: np.ndarray) -> np.ndarray:
+    """Average a (2n, 2n, 3) block of 2x2 child tiles down to one (n, n, 3) tile."""
+    size = block.shape[0] // 2
+    mean = block.reshape(size, 2, size, 2, 3).mean(axis=(1, 3))
+    return np.rint(mean).astype(np.uint8)
+
+def build_texture_pyramid(fetcher: TileFetcher, zoom: int, min_xtile: int, max_xtile: int,
+                          min_ytile: int, max_ytile: int, encoder: TextureEncoder,
+                          min_zoom: Optional[int] = None) -> TexturePyramid:
+    """Write the tiles of a range plus a mip pyramid of parent tiles through ``encoder``.
+
+    Tiles are stored as ``<z>/<x>/<y>.<ext>`` under ``encoder.output_dir``.
+    The base level is downloaded one tile row at a time and every parent
+    tile is the 2x2 block of its children averaged down to one tile, down
+    to ``min_zoom``. A parent row is finished as soon as both of its child
+    rows are known, so at most one row of blocks per level is held in
+    memory, whatever the size of the range. Returns ``{zoom: [(x, y, path)]}``.
+
+    Base tiles that could not be fetched are neither written nor listed,
+    and a parent is only written when at least one of its children was;
+    its missing quadrants are filled with ``MISSING_TILE_COLOR``. Callers
+    compare the listed base tiles with the range to find the failures.
+    """
+    min_zoom = zoom if min_zoom is None else min(min_zoom, zoom)
+    levels: TexturePyramid = {level: [] for level in range(zoom, min_zoom - 1, -1)}
+    pending = {}  # level -> (parent row, {parent x: block of children})
+
+    def flush(level):
+        if level in pending:
+            row, blocks = pending.pop(level)
+            for xtile in sorted(blocks):
+                emit(level - 1, xtile, row, downsample(blocks[xtile]))
+
+    def emit(level, xtile, ytile, pixels):
+        path = tile_path(encoder.output_dir, level, xtile, ytile, encoder.options.extension)
+        encoder.submit(pixels, path)
+        levels[level].append((xtile, ytile, path))
+        if level == min_zoom:
+            return
+        if level in pending and pending[level][0] != ytile >> 1:
+            flush(level)
+        blocks = pending.setdefault(level, (ytile >> 1, {}))[1]
+        if xtile >> 1 not in blocks:
+            blocks[xtile >> 1] = np.empty((2 * TILE_SIZE, 2 * TILE_SIZE, 3), dtype=np.uint8)
+            blocks[xtile >> 1][:] = MISSING_TILE_COLOR
+        top, left = (ytile & 1) * TILE_SIZE, (xtile & 1) * TILE_SIZE
+        blocks[xtile >> 1][top:top + TILE_SIZE, left:left + TILE_SIZE] = pixels
+
+    for ytile in range(min_ytile, max_ytile + 1):
+        row = [(zoom, xtile, ytile) for xtile in range(min_xtile, max_xtile + 1)]
+        for (_, xtile, _), content in fetcher.fetch_many(row).items():
+            pixels = decode_tile(content)
+            if pixels is not None:
+                emit(zoom, xtile, ytile, pixels)
+
+    # Finish the last rows, finest level first so each flush feeds the next
+    for level in range(zoom, min_zoom, -1):
+        flush(level)
+    return levels
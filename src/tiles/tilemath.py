@@ -0,0 +1,69 @@
+import math
+from typing import Tuple
+import numpy as np
+
+TILE_SIZE = 256
+# Latitude limit of the square Web Mercator world
+MAX_LATITUDE = math.degrees(math.atan(math.sinh(math.pi)))
+
+def _unwrap(*arrays):
+    """Return Python scalars for 0-d inputs so scalar callers get plain numbers."""
+    return tuple(a.item() if a.ndim == 0 else a for a in arrays)
+
+def deg2tile(lat_deg, lon_deg, zoom: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Convert latitude/longitude to fractional Web Mercator tile coordinates ``(x, y)``.
+
+    Accepts scalars or arrays; the integer part is the tile and the
+    fraction the position inside it.
+    """
+    lat_rad = np.radians(np.clip(np.asarray(lat_deg, dtype=np.float64), -MAX_LATITUDE, MAX_LATITUDE))
+    n = float(1 << zoom)
+    x = (np.asarray(lon_deg, dtype=np.float64) + 180.0) / 360.0 * n
+    y = (1.0 - np.arcsinh(np.tan(lat_rad)) / math.pi) / 2.0 * n
+    return _unwrap(x, y)
+
+def deg2pixel(lat_deg, lon_deg, zoom: int, tile_size: int = TILE_SIZE) -> Tuple[np.ndarray, np.ndarray]:
+    """Convert latitude/longitude to fractional global pixel coordinates ``(x, y)`` at ``zoom``."""
+    x, y = deg2tile(lat_deg, lon_deg, zoom)
+    return _unwrap(np.asarray(x) * tile_size, np.asarray(y) * tile_size)
+
+def deg2num(lat_deg, lon_deg, zoom: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Convert latitude/longitude to the integer tile ``(x, y)`` containing them."""
+    x, y = deg2tile(lat_deg, lon_deg, zoom)
+    last = (1 << zoom) - 1
+    return _unwrap(np.clip(np.floor(x), 0, last).astype(np.int64),
+                   np.clip(np.floor(y), 0, last).astype(np.int64))
+
+def num2deg(xtile, ytile, zoom: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Convert (fractional) tile coordinates to ``(lat, lon)``; the inverse of ``deg2tile``.
+
+    Integer tile coordinates give the north-west corner of the tile.
+    """
+    n = float(1 << zoom)
+    lon = np.asarray(xtile, dtype=np.float64) / n * 360.0 - 180.0
+    lat = np.degrees(np.arctan(np.sinh(math.pi * (1.0 - 2.0 * np.asarray(ytile, dtype=np.float64) / n))))
+    return _unwrap(lat, lon)
+
+def pixel2deg(xpixel, ypixel, zoom: int, tile_size: int = TILE_SIZE) -> Tuple[np.ndarray, np.ndarray]:
+    """Convert global pixel coordinates at ``zoom`` to ``(lat, lon)``."""
+    return num2deg(np.asarray(xpixel, dtype=np.float64) / tile_size,
+                   np.asarray(ypixel, dtype=np.float64) / tile_size, zoom)
+
+def tile_bounds(zoom: int, xtile: int, ytile: int) -> Tuple[float, float, float, float]:
+    """Return ``(min_lon, min_lat, max_lon, max_lat)`` covered by a tile."""
+    max_lat, min_lon = num2deg(xtile, ytile, zoom)
+    min_lat, max_lon = num2deg(xtile + 1, ytile + 1, zoom)
+    return min_lon, min_lat, max_lon, max_lat
+
+def tile_range(min_lat: float, max_lat: float, min_lon: float, max_lon: float,
+               zoom: int) -> Tuple[int, int, int, int]:
+    """Return the inclusive ``(min_x, max_x, min_y, max_y)`` tile range covering a bounding box."""
+    min_xtile, max_ytile = deg2num(min_lat, min_lon, zoom)
+    max_xtile, min_ytile = deg2num(max_lat, max_lon, zoom)
+    return min_xtile, max_xtile, min_ytile, max_ytile
+
+def bbox_tiles(min_lat: float, max_lat: float, min_lon: float, max_lon: float, zoom: int) -> np.ndarray:
+    """Return the ``(N, 2)`` ``(x, y)`` tiles covering a bounding box, row by row from the north."""
+    min_xtile, max_xtile, min_ytile, max_ytile = tile_range(min_lat, max_lat, min_lon, max_lon, zoom)
+    ys, xs = np.mgrid[min_ytile:max_ytile + 1, min_xtile:max_xtile + 1]
+    return np.stack([xs.ravel(), ys.ravel()], axis=1)
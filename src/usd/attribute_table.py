@@ -0,0 +1,56 @@
+import numpy as np
+from typing import Dict, List
+from pxr import Sdf, Vt
+
+class FeatureTable:
+    """Columnar store of OSM tags for many features, authored on one prim.
+
+    Tags are dictionary-encoded and stored as a sparse CSR table instead of
+    one attribute per tag per feature:
+
+    - ``osm:ids``         int64[]  feature ids (join key with ``osm:id`` on meshes)
+    - ``osm:tagOffsets``  int[]    row ``i`` owns entries ``tagOffsets[i]:tagOffsets[i + 1]``
+    - ``osm:tagKeys``     int[]    index of each entry's key in ``osm:keys``
+    - ``osm:tagValues``   int[]    index of each entry's value in ``osm:values``
+    - ``osm:keys``        token[]  key dictionary
+    - ``osm:values``      string[] value dictionary
+    """
+    def __init__(self):
+        self.ids: List[int] = []
+        self.tags: List[dict] = []
+
+    def add(self, osm_id: int, tags: dict):
+        """Append one feature row."""
+        self.ids.append(osm_id)
+        self.tags.append(tags)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def encode(self):
+        """Dictionary-encode the rows into flat arrays."""
+        keys: Dict[str, int] = {}
+        values: Dict[str, int] = {}
+        key_index, value_index = [], []
+        counts = np.zeros(len(self.tags), dtype=np.int64)
+        for i, tags in enumerate(self.tags):
+            counts[i] = len(tags)
+            for key, value in tags.items():
+                key_index.append(keys.setdefault(key, len(keys)))
+                value_index.append(values.setdefault(str(value), len(values)))
+        offsets = np.zeros(len(self.tags) + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+        return (np.asarray(self.ids, dtype=np.int64), offsets,
+                np.asarray(key_index, dtype=np.int32), np.asarray(value_index, dtype=np.int32),
+                list(keys), list(values))
+
+    def author(self, prim):
+        """Write the table as array attributes on ``prim``."""
+        ids, offsets, key_index, value_index, keys, values = self.encode()
+        prim.CreateAttribute('osm:ids', Sdf.ValueTypeNames.Int64Array).Set(Vt.Int64Array.FromNumpy(ids))
+        prim.CreateAttribute('osm:tagOffsets', Sdf.ValueTypeNames.IntArray).Set(
+            Vt.IntArray.FromNumpy(offsets.astype(np.int32)))
+        prim.CreateAttribute('osm:tagKeys', Sdf.ValueTypeNames.IntArray).Set(Vt.IntArray.FromNumpy(key_index))
+        prim.CreateAttribute('osm:tagValues', Sdf.ValueTypeNames.IntArray).Set(Vt.IntArray.FromNumpy(value_index))
+        prim.CreateAttribute('osm:keys', Sdf.ValueTypeNames.TokenArray).Set(keys)
+        prim.CreateAttribute('osm:values', Sdf.ValueTypeNames.StringArray).Set(values)
@@ -0,0 +1,28 @@
+import numpy as np
+from pxr import UsdGeom, Vt
+
+# Shared normal of flat features lying in the XZ plane
+UP_NORMAL = np.array([[0.0, 1.0, 0.0]])
+
+def author_mesh(stage, path: str, points: np.ndarray, counts: np.ndarray, indices: np.ndarray,
+                extent: np.ndarray = None, normals: np.ndarray = None,
+                normals_interpolation: str = UsdGeom.Tokens.uniform) -> UsdGeom.Mesh:
+    """Define a polygonal mesh from NumPy arrays.
+
+    ``extent`` is the (2, 3) bounding box and ``normals`` are authored with
+    ``normals_interpolation`` (per face by default; use ``UP_NORMAL`` with
+    ``constant`` for flat features). Precomputed values spare consumers from
+    deriving bounds and smooth normals at load time. Subdivision is disabled
+    so renderers use the faceted geometry and its normals as authored.
+    """
+    mesh = UsdGeom.Mesh.Define(stage, path)
+    mesh.CreateSubdivisionSchemeAttr(UsdGeom.Tokens.none)
+    mesh.CreatePointsAttr(Vt.Vec3fArray.FromNumpy(np.asarray(points, dtype=np.float32)))
+    mesh.CreateFaceVertexCountsAttr(Vt.IntArray.FromNumpy(np.asarray(counts, dtype=np.int32)))
+    mesh.CreateFaceVertexIndicesAttr(Vt.IntArray.FromNumpy(np.asarray(indices, dtype=np.int32).reshape(-1)))
+    if extent is not None:
+        mesh.CreateExtentAttr(Vt.Vec3fArray.FromNumpy(np.asarray(extent, dtype=np.float32).reshape(2, 3)))
+    if normals is not None:
+        mesh.CreateNormalsAttr(Vt.Vec3fArray.FromNumpy(np.asarray(normals, dtype=np.float32).reshape(-1, 3)))
+        mesh.SetNormalsInterpolation(normals_interpolation)
+    return mesh
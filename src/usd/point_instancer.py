@@ -0,0 +1,32 @@
+import numpy as np
+from typing import Sequence
+from pxr import UsdGeom, Vt
+
+def yaw_orientations(angles: np.ndarray) -> Vt.QuathArray:
+    """Build half-precision quaternions for rotations about +Y (radians)."""
+    angles = np.asarray(angles, dtype=np.float64)
+    # Vt quaternion arrays are laid out as (i, j, k, real)
+    quats = np.zeros((len(angles), 4), dtype=np.float16)
+    quats[:, 1] = np.sin(angles / 2)
+    quats[:, 3] = np.cos(angles / 2)
+    return Vt.QuathArray.FromNumpy(quats)
+
+def author_point_instancer(stage, path: str, prototype_paths: Sequence[str], positions: np.ndarray,
+                           proto_indices: np.ndarray, orientations: np.ndarray = None,
+                           scales: np.ndarray = None, ids: np.ndarray = None) -> UsdGeom.PointInstancer:
+    """Define a PointInstancer whose per-instance arrays come straight from NumPy.
+
+    ``positions``/``scales`` are (N, 3), ``orientations`` are yaw angles in
+    radians and ``ids`` are stable instance ids (e.g. OSM node ids).
+    """
+    instancer = UsdGeom.PointInstancer.Define(stage, path)
+    instancer.CreatePrototypesRel().SetTargets(list(prototype_paths))
+    instancer.CreatePositionsAttr(Vt.Vec3fArray.FromNumpy(np.asarray(positions, dtype=np.float32)))
+    instancer.CreateProtoIndicesAttr(Vt.IntArray.FromNumpy(np.asarray(proto_indices, dtype=np.int32)))
+    if orientations is not None:
+        instancer.CreateOrientationsAttr(yaw_orientations(orientations))
+    if scales is not None:
+        instancer.CreateScalesAttr(Vt.Vec3fArray.FromNumpy(np.asarray(scales, dtype=np.float32)))
+    if ids is not None:
+        instancer.CreateIdsAttr(Vt.Int64Array.FromNumpy(np.asarray(ids, dtype=np.int64)))
+    return instancer
@@ -0,0 +1,57 @@
+import os
+from pxr import Sdf, Usd
+from src.profiling import instrument
+
+# Binary crate files are the default; usda is kept for readable debug output
+USD_FORMATS = ('usdc', 'usda')
+DEFAULT_FORMAT = 'usdc'
+
+def format_path(path: str, fmt: str = None) -> str:
+    """Return ``path`` with the extension of the given USD format.
+
+    Without ``fmt`` the extension of ``path`` is kept, and ``DEFAULT_FORMAT``
+    added when it has none. A ``fmt`` contradicting a usda/usdc extension of
+    ``path`` is an error rather than a silent rename.
+    """
+    stem, extension = os.path.splitext(path)
+    if fmt is None:
+        return path if extension else f'{path}.{DEFAULT_FORMAT}'
+    if fmt not in USD_FORMATS:
+        raise ValueError(f"Unknown USD format '{fmt}', expected one of {USD_FORMATS}")
+    if extension[1:] in USD_FORMATS and extension[1:] != fmt:
+        raise ValueError(f"'{path}' is not a {fmt} file")
+    return f'{stem}.{fmt}'
+
+def create_stage(path: str, fmt: str = None) -> Usd.Stage:
+    """Create a new stage, writing crate or text depending on ``fmt``.
+
+    USD picks the file format from the extension, so ``fmt`` only sets
+    the extension of ``path``, as ``format_path`` does.
+    """
+    return Usd.Stage.CreateNew(format_path(path, fmt))
+
+def save_stage(stage: Usd.Stage):
+    """Save ``stage``, recorded as a 'save' stage with the prims and bytes it wrote when instrumented."""
+    with instrument.stage('save'):
+        stage.Save()
+    if instrument.active():
+        # Prim specs of this layer only, variants included, so sublayers are not counted twice
+        layer = stage.GetRootLayer()
+        prims = []
+        layer.Traverse(Sdf.Path.absoluteRootPath, lambda path: prims.append(path.IsPrimPath()))
+        instrument.count('usd.prims', sum(prims))
+        if layer.realPath and os.path.exists(layer.realPath):
+            instrument.count('usd.bytes_written', os.path.getsize(layer.realPath))
+
+def add_format_argument(parser):
+    """Add the shared ``--format`` option to an argparse parser."""
+    parser.add_argument('--format', choices=USD_FORMATS, default=None,
+                        help="USD output format: binary 'usdc' or text 'usda' for debugging "
+                             "(default: the output's extension, usdc without one)")
+
+def output_format_path(parser, path: str, fmt: str = None) -> str:
+    """Apply ``--format`` to an output path given on the command line, as a parser error if they disagree."""
+    try:
+        return format_path(path, fmt)
+    except ValueError as e:
+        parser.error(f"--format {fmt} does not match the output: {e}")
@@ -0,0 +1,12 @@
+import pytest
+from src.geometry import accel
+
+@pytest.fixture
+def without_numba(monkeypatch):
+    """Run the NumPy fallbacks of the geometry kernels, as with ``OSM_NUMBA=0``."""
+    monkeypatch.setattr(accel, '_numba', None)
+    monkeypatch.setattr(accel, '_numba_checked', True)
+
+def assert_batches_equal(a, b):
+    for name in a._fields:
+        assert (getattr(a, name) == getattr(b, name)).all(), name
@@ -0,0 +1,11 @@
+from src.osm.classify import LAND, OTHER, PREVIEW_LAND_TAGS, WATER, TagTable, classify_tags
+
+def test_built_up_landuse_is_land_only_in_the_preview():
+    table = TagTable.from_tags([{'landuse': 'residential'}, {'landuse': 'grass'}, {'building': 'yes'}])
+    assert list(classify_tags(table)) == [OTHER, LAND, OTHER]
+    assert list(classify_tags(table, land=PREVIEW_LAND_TAGS)) == [LAND, LAND, OTHER]
+
+def test_water_wins_over_land_in_any_tag_order():
+    table = TagTable.from_tags([[('leisure', 'park'), ('natural', 'water')],
+                                [('natural', 'water'), ('leisure', 'park')]])
+    assert list(classify_tags(table)) == [WATER, WATER]
@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+from conftest import assert_batches_equal
+from src.geometry import accel
+from src.geometry.extrude import extrude_footprints
+from src.geometry.triangulate import triangulate_polygons
+
+# Closed unit square with a collinear point on its first edge, and a clockwise triangle
+SQUARE = [[0, 0], [0.5, 0], [1, 0], [1, 1], [0, 1], [0, 0]]
+TRIANGLE = [[3, 0], [3, 1], [4, 0], [3, 0]]
+
+def footprints(*rings):
+    coords = np.array([p for ring in rings for p in ring], dtype=np.float64)
+    offsets = np.concatenate([[0], np.cumsum([len(ring) for ring in rings])])
+    return coords, offsets
+
+def extrude(*rings, heights=None):
+    coords, offsets = footprints(*rings)
+    heights = np.full(len(rings), 2.0) if heights is None else heights
+    return extrude_footprints(coords, offsets, heights, triangulate_polygons(coords, offsets))
+
+def face_normals(batch):
+    """Newell normal of every face."""
+    offsets = batch.index_offsets()
+    normals = []
+    for start, end in zip(offsets[:-1], offsets[1:]):
+        ring = batch.points[batch.face_vertex_indices[start:end]]
+        following = np.roll(ring, -1, axis=0)
+        normals.append(np.cross(ring, following).sum(axis=0))
+    return np.array(normals)
+
+def test_closing_points_are_dropped_and_collinear_points_kept():
+    batch = extrude(SQUARE)
+    # Five footprint points, each with a ground and a roof vertex
+    assert len(batch.points) == 10
+    counts = batch.face_vertex_counts
+    assert (counts == 4).sum() == 5
+    # Floor and roof each cover the unit square
+    areas = np.linalg.norm(face_normals(batch)[counts == 3], axis=1) / 2
+    assert np.isclose(areas.sum(), 2.0)
+
+@pytest.mark.parametrize('ring', [SQUARE, SQUARE[::-1], TRIANGLE, TRIANGLE[::-1]])
+def test_every_face_points_outward(ring):
+    batch = extrude(ring)
+    centre = batch.points.mean(axis=0)
+    offsets = batch.index_offsets()
+    for normal, start, end in zip(face_normals(batch), offsets[:-1], offsets[1:]):
+        face_centre = batch.points[batch.face_vertex_indices[start:end]].mean(axis=0)
+        assert np.dot(normal, face_centre - centre) > 0
+
+def test_prisms_own_contiguous_ranges():
+    batch = extrude(SQUARE, TRIANGLE, heights=np.array([2.0, 5.0]))
+    assert list(batch.point_offsets) == [0, 10, 16]
+    triangle = batch.points[10:16]
+    assert set(triangle[:, 1]) == {0.0, 5.0}
+    faces = batch.face_offsets
+    offsets = batch.index_offsets()
+    first, last = offsets[faces[1]], offsets[faces[2]]
+    assert batch.face_vertex_indices[first:last].min() >= 10
+
+@pytest.mark.skipif(accel.numba_module() is None, reason="Numba is not installed")
+def test_numba_matches_numpy(request):
+    rings = (SQUARE, TRIANGLE[::-1], SQUARE)
+    compiled = extrude(*rings)
+    request.getfixturevalue('without_numba')
+    assert_batches_equal(compiled, extrude(*rings))
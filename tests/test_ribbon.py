@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+from conftest import assert_batches_equal
+from src.geometry import accel
+from src.geometry.ribbon import build_ribbons
+
+def ribbons(lines, half_widths=1.0, **options):
+    coords = np.array([p for line in lines for p in line], dtype=np.float64).reshape(-1, 2)
+    offsets = np.concatenate([[0], np.cumsum([len(line) for line in lines])]).astype(np.int64)
+    return build_ribbons(coords, offsets, half_widths, **options)
+
+def test_straight_segment_is_one_quad_of_full_width():
+    batch = ribbons([[[0, 0], [4, 0]]], 1.5)
+    assert list(batch.face_vertex_counts) == [4]
+    assert np.ptp(batch.points[:, 1]) == pytest.approx(3.0)
+    assert np.ptp(batch.points[:, 0]) == pytest.approx(4.0)
+
+def test_duplicate_and_collinear_points():
+    plain = ribbons([[[0, 0], [2, 0]]])
+    repeated = ribbons([[[0, 0], [0, 0], [1, 0], [1, 0], [2, 0]]], join='bevel')
+    # The collinear middle point adds a welded pair but no bevel
+    assert len(repeated.points) == 6
+    assert list(repeated.face_vertex_counts) == [4, 4]
+    assert np.ptp(repeated.points, axis=0) == pytest.approx(np.ptp(plain.points, axis=0))
+
+def test_zero_length_and_empty_polylines_yield_empty_meshes():
+    batch = ribbons([[[1, 1], [1, 1]], [], [[0, 0], [1, 0]], [[5, 5]]])
+    assert list(batch.point_offsets) == [0, 0, 0, 4, 4]
+    assert list(batch.face_offsets) == [0, 0, 0, 1, 1]
+
+def test_closed_ring_wraps_without_end_caps():
+    square = [[0, 0], [2, 0], [2, 2], [0, 2], [0, 0]]
+    batch = ribbons([square], 0.5)
+    # Four mitred corners, one welded pair each, and a quad per side
+    assert len(batch.points) == 8
+    assert list(batch.face_vertex_counts) == [4] * 4
+    assert batch.face_vertex_indices.max() == 7
+    assert batch.points.min() == pytest.approx(-0.5)
+    assert batch.points.max() == pytest.approx(2.5)
+
+def test_sharp_corners_are_bevelled_past_the_miter_limit():
+    spike = [[[0, 0], [10, 0], [0, 0.5]]]
+    mitred = ribbons(spike, miter_limit=100.0)
+    bevelled = ribbons(spike, miter_limit=4.0)
+    assert list(mitred.face_vertex_counts) == [4, 4]
+    assert list(bevelled.face_vertex_counts) == [4, 3, 4]
+
+def test_faces_are_wound_up():
+    batch = ribbons([[[0, 0], [3, 0], [3, 3], [6, 1]]], join='bevel')
+    offsets = batch.index_offsets()
+    for start, end in zip(offsets[:-1], offsets[1:]):
+        ring = batch.points[batch.face_vertex_indices[start:end]]
+        following = np.roll(ring, -1, axis=0)
+        # Clockwise in (x, z) faces +Y once lifted onto the ground plane
+        assert np.sum(ring[:, 0] * following[:, 1] - following[:, 0] * ring[:, 1]) < 0
+
+@pytest.mark.skipif(accel.numba_module() is None, reason="Numba is not installed")
+def test_numba_matches_numpy(request):
+    lines = [[[0, 0], [3, 0], [3, 3], [6, 1]], [[0, 0], [0, 0]], [[0, 0], [2, 0], [2, 2], [0, 0]]]
+    options = {'half_widths': np.array([1.0, 2.0, 0.5]), 'join': 'bevel'}
+    compiled = ribbons(lines, **options)
+    request.getfixturevalue('without_numba')
+    assert_batches_equal(compiled, ribbons(lines, **options))
@@ -0,0 +1,38 @@
+import numpy as np
+from PIL import Image
+from pxr import Usd, UsdGeom
+from src.examples.parse_json import JsonHandler
+from src.tiles.raster import METERS_PER_DEGREE_LAT
+
+def east_west_road(highway):
+    """A handler holding one straight east-west road across a small area."""
+    handler = JsonHandler()
+    handler.min_lon, handler.max_lon = 4.750, 4.752
+    handler.min_lat, handler.max_lat = 52.9600, 52.9604
+    handler.process_road({'nodes': [[4.7505, 52.9602], [4.7515, 52.9602]], 'tags': {'highway': highway}})
+    return handler
+
+def raster_road_width(handler, tmp_path):
+    """Width in meters of the road painted into the ground raster, measured down its middle column."""
+    path = str(tmp_path / 'ground.png')
+    handler.rasterize_ground_texture(path)
+    pixels = np.asarray(Image.open(path).convert('RGB'))
+    column = pixels[:, pixels.shape[1] // 2]
+    painted = np.all(column == handler.RASTER_COLORS['road'], axis=1).sum()
+    return painted * handler.RASTER_METERS_PER_PIXEL
+
+def ribbon_road_width(handler):
+    """Width in meters of the road ribbon authored to USD, across the road."""
+    stage = Usd.Stage.CreateInMemory()
+    center = ((handler.min_lon + handler.max_lon) / 2, (handler.min_lat + handler.max_lat) / 2)
+    handler.create_roads(stage, *center)
+    points = np.asarray(UsdGeom.Mesh(stage.GetPrimAtPath('/World/Roads/road_0')).GetPointsAttr().Get())
+    across = np.ptp(points[:, 2])
+    return across / handler.SCALE * METERS_PER_DEGREE_LAT
+
+def test_raster_and_ribbon_roads_are_equally_wide(tmp_path):
+    for highway in ('primary', 'residential', 'footway'):
+        handler = east_west_road(highway)
+        meters = handler.roads[0][2]
+        assert np.isclose(ribbon_road_width(handler), meters)
+        assert abs(raster_road_width(handler, tmp_path) - meters) <= handler.RASTER_METERS_PER_PIXEL
@@ -0,0 +1,40 @@
+import numpy as np
+from src.geometry.simplify import simplify_mask
+
+def pack(lines):
+    coords = np.array([p for line in lines for p in line], dtype=np.float64).reshape(-1, 2)
+    offsets = np.concatenate([[0], np.cumsum([len(line) for line in lines])]).astype(np.int64)
+    return coords, offsets
+
+def test_collinear_and_duplicate_points_are_dropped():
+    coords, offsets = pack([[[0, 0], [0, 0], [1, 0], [2, 0.01], [3, 0]]])
+    assert list(simplify_mask(coords, offsets, 0.1)) == [True, False, False, False, True]
+
+def test_points_beyond_the_tolerance_are_kept():
+    coords, offsets = pack([[[0, 0], [1, 1], [2, 0], [3, 0.05], [4, 0]]])
+    assert list(simplify_mask(coords, offsets, 0.5)) == [True, True, True, False, True]
+
+def test_zero_tolerance_keeps_everything():
+    coords, offsets = pack([[[0, 0], [1, 0], [2, 0]]])
+    assert simplify_mask(coords, offsets, 0.0).all()
+
+def test_empty_single_point_and_zero_length_lines():
+    coords, offsets = pack([[], [[5, 5]], [[1, 1], [1, 1], [1, 1]], [[0, 0], [1, 0]]])
+    assert list(simplify_mask(coords, offsets, 1.0)) == [True, True, False, True, True, True]
+
+def test_closed_rings_keep_a_triangle_or_stay_untouched():
+    square = [[0, 0], [1, 0], [1, 1], [0, 1], [0, 0]]
+    coords, offsets = pack([square])
+    # Douglas-Peucker from the closing point keeps the far corner only, which would collapse the ring
+    assert simplify_mask(coords, offsets, 5.0).all()
+    notched = [[0, 0], [2, 0], [2, 0.01], [2, 2], [0, 2], [0, 0]]
+    coords, offsets = pack([notched])
+    assert list(simplify_mask(coords, offsets, 0.1)) == [True, True, False, True, True, True]
+
+def test_batch_matches_lines_one_at_a_time():
+    rng = np.random.default_rng(0)
+    lines = [np.cumsum(rng.normal(size=(n, 2)), axis=0) for n in (0, 1, 2, 7, 40, 3)]
+    coords, offsets = pack(lines)
+    batched = simplify_mask(coords, offsets, 0.8)
+    single = np.concatenate([simplify_mask(*pack([line]), 0.8) for line in lines])
+    assert np.array_equal(batched, single)
@@ -0,0 +1,45 @@
+import numpy as np
+from src.geometry.triangulate import TriangulationCache, triangulate_polygon, triangulate_polygons
+
+# Concave L shape, counter-clockwise, with its closing point; area 3
+L_SHAPE = np.array([[0, 0], [2, 0], [2, 1], [1, 1], [1, 2], [0, 2], [0, 0]], dtype=np.float64)
+
+def triangle_areas(points, triangles):
+    a, b, c = points[triangles[:, 0]], points[triangles[:, 1]], points[triangles[:, 2]]
+    return 0.5 * ((b[:, 0] - a[:, 0]) * (c[:, 1] - a[:, 1]) - (b[:, 1] - a[:, 1]) * (c[:, 0] - a[:, 0]))
+
+def test_concave_ring_either_winding():
+    for ring in (L_SHAPE, L_SHAPE[::-1]):
+        triangles = triangulate_polygon(ring)
+        assert triangles.shape == (4, 3)
+        areas = triangle_areas(ring, triangles)
+        assert np.all(areas > 0)
+        assert np.isclose(areas.sum(), 3.0)
+
+def test_repeated_and_collinear_points():
+    square = np.array([[0, 0], [1, 0], [1, 0], [2, 0], [2, 2], [0, 2], [0, 0]], dtype=np.float64)
+    triangles = triangulate_polygon(square)
+    assert np.isclose(triangle_areas(square, triangles).sum(), 4.0)
+    assert len(triangulate_polygon(square[:2])) == 0
+
+def test_cache_returns_int64_on_hits_and_misses(tmp_path):
+    miss = TriangulationCache(str(tmp_path)).triangulate(L_SHAPE)
+    hit = TriangulationCache(str(tmp_path)).triangulate(L_SHAPE)
+    assert miss.dtype == hit.dtype == np.int64
+    assert np.array_equal(miss, hit)
+
+def test_batch_indexes_shared_coords():
+    coords = np.vstack([L_SHAPE, L_SHAPE + 10])
+    batch = triangulate_polygons(coords, np.array([0, 7, 14]))
+    triangles = batch.face_vertex_indices.reshape(-1, 3)
+    assert len(triangles) == 8
+    assert np.isclose(triangle_areas(coords, triangles).sum(), 6.0)
+    assert triangles[4:].min() >= 7
+
+def test_empty_and_zero_area_rings_in_a_batch():
+    point = np.array([[5, 5], [5, 5], [5, 5]], dtype=np.float64)
+    line = np.array([[0, 0], [1, 0], [2, 0], [0, 0]], dtype=np.float64)
+    coords = np.vstack([point, line, L_SHAPE])
+    batch = triangulate_polygons(coords, np.array([0, 0, 3, 7, 14]))
+    assert list(batch.face_offsets) == [0, 0, 0, 0, 4]
+    assert batch.face_vertex_indices.min() >= 7
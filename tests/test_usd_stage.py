@@ -0,0 +1,14 @@
+import pytest
+from src.usd.stage import format_path
+
+def test_format_path_keeps_or_sets_the_extension():
+    assert format_path('out/den.usda') == 'out/den.usda'
+    assert format_path('out/den') == 'out/den.usdc'
+    assert format_path('out/den', 'usda') == 'out/den.usda'
+    assert format_path('out/den.usda', 'usda') == 'out/den.usda'
+
+def test_format_path_rejects_a_contradicting_format():
+    with pytest.raises(ValueError):
+        format_path('out/den.usda', 'usdc')
+    with pytest.raises(ValueError):
+        format_path('out/den', 'usdz')